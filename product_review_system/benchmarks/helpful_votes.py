@@ -0,0 +1,117 @@
+"""
+Concurrent helpful-vote benchmark.
+
+Spawns writer threads that all vote for the same review (each vote from a
+distinct user) and reports throughput, latency percentiles and failed
+writes for each shard count, then folds the shards and checks that
+``helpful_count`` matches the number of votes.
+
+    python benchmarks/helpful_votes.py --threads 16 --votes 200 --shards 1 --shards 16
+
+It runs against a throwaway test database created from the configured
+``default`` database. SQLite serializes all writers on its database lock, so
+shard counts only make a difference on a server database such as
+PostgreSQL, where ``--shards 1`` reproduces the single hot counter row.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_DIR))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'product_review_system.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.db import OperationalError, connection  # noqa: E402
+from django.test.runner import DiscoverRunner  # noqa: E402
+from django.test.utils import override_settings  # noqa: E402
+
+from reviews.models import Product, Review  # noqa: E402
+from reviews.votes import cast_vote, fold_helpful_counts  # noqa: E402
+from users.models import User  # noqa: E402
+
+
+def run(review, voters, threads, shards):
+    latencies = []
+    failures = []
+    lock = threading.Lock()
+    chunks = [voters[i::threads] for i in range(threads)]
+
+    def writer(user_ids):
+        local_latencies, local_failures = [], 0
+        for user_id in user_ids:
+            start = time.perf_counter()
+            try:
+                cast_vote(review.pk, user_id, using=review._state.db)
+            except OperationalError:
+                local_failures += 1
+            local_latencies.append(time.perf_counter() - start)
+        connection.close()
+        with lock:
+            latencies.extend(local_latencies)
+            failures.append(local_failures)
+
+    with override_settings(HELPFUL_COUNTER_SHARDS=shards):
+        workers = [threading.Thread(target=writer, args=(chunk,)) for chunk in chunks]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+
+    fold_helpful_counts()
+    review.refresh_from_db()
+    latencies.sort()
+    print(
+        f"shards={shards:>3}: {len(voters) / elapsed:8.0f} votes/s, "
+        f"p50 {statistics.median(latencies) * 1000:6.2f} ms, "
+        f"p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:6.2f} ms, "
+        f"failed {sum(failures)}, helpful_count {review.helpful_count}/{len(voters)}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--votes', type=int, default=100, help='votes per thread')
+    parser.add_argument('--shards', type=int, action='append')
+    args = parser.parse_args()
+
+    database = settings.DATABASES['default']
+    if database['ENGINE'].endswith('sqlite3'):
+        # Threads need a shared on-disk database rather than in-memory.
+        database.setdefault('TEST', {})['NAME'] = os.path.join(tempfile.mkdtemp(), 'bench.sqlite3')
+        database.setdefault('OPTIONS', {})['timeout'] = 60
+
+    runner = DiscoverRunner(verbosity=0, interactive=False)
+    old_config = runner.setup_databases()
+    try:
+        author = User.objects.create_user(email='author@bench.local')
+        product = Product.objects.create(name='Benchmark product', price='1.00')
+        total = args.threads * args.votes
+        for shards in args.shards or [1, 16]:
+            review = Review.objects.create(product=product, user=author, rating=5)
+            User.objects.bulk_create(
+                User(email=f'voter-{review.pk}-{i}@bench.local') for i in range(total)
+            )
+            voters = list(
+                User.objects.filter(email__startswith=f'voter-{review.pk}-').values_list('pk', flat=True)
+            )
+            run(review, voters, args.threads, shards)
+            review.delete()
+    finally:
+        runner.teardown_databases(old_config)
+
+
+if __name__ == '__main__':
+    main()
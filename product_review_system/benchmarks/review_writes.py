@@ -0,0 +1,157 @@
+"""
+Concurrent review write benchmark.
+
+Spawns writer threads, each authenticated as its own user, that create,
+update and delete one review per product through the API views, and reports
+throughput, latency percentiles, statements per request and failed writes
+for each mode:
+
+- ``current``: the write paths as they are.
+- ``lookups``: the same requests preceded by the lookups the write paths used
+  to make (loading the product, checking for an existing review and reloading
+  the author on create; reloading the review and its author on update and
+  delete), to show what dropping them gains.
+
+    python benchmarks/review_writes.py --threads 8 --products 50
+
+It runs against a throwaway test database created from the configured
+``default`` database. SQLite serializes all writers on its database lock, so
+the numbers under contention are only representative on a server database
+such as PostgreSQL.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_DIR))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'product_review_system.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.db import OperationalError, connection  # noqa: E402
+from django.test.runner import DiscoverRunner  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from reviews.models import Product, Review  # noqa: E402
+from users.models import User  # noqa: E402
+
+OPERATIONS = ('create', 'update', 'delete')
+MODES = ('current', 'lookups')
+
+
+def old_lookups(operation, product_id, user_id):
+    """Run the lookups the write paths made before they were trimmed."""
+    if operation == 'create':
+        Product.objects.get(pk=product_id)
+        Review.objects.filter(product_id=product_id, user_id=user_id).exists()
+        User.objects.get(pk=user_id)
+    else:
+        review = Review.objects.get(product_id=product_id, user_id=user_id)
+        User.objects.get(pk=review.user_id)
+
+
+def write(client, operation, product_id, user_id, review_ids):
+    url = f'/api/products/{product_id}/reviews/'
+    if operation == 'create':
+        response = client.post(url, {'rating': 4, 'comment': 'Benchmark review'}, format='json')
+        if response.status_code == 201:
+            review_ids[product_id] = response.data['id']
+        return response.status_code == 201
+    url += f'{review_ids[product_id]}/'
+    if operation == 'update':
+        return client.patch(url, {'rating': 2}, format='json').status_code == 200
+    return client.delete(url).status_code == 204
+
+
+def run(mode, users, product_ids):
+    latencies = {operation: [] for operation in OPERATIONS}
+    failures = []
+    statements = {}
+    lock = threading.Lock()
+
+    def writer(user, record_statements):
+        client = APIClient()
+        client.force_authenticate(user)
+        local = {operation: [] for operation in OPERATIONS}
+        local_failures = 0
+        review_ids = {}
+        for operation in OPERATIONS:
+            for product_id in product_ids:
+                start = time.perf_counter()
+                with CaptureQueriesContext(connection) as queries:
+                    try:
+                        if mode == 'lookups':
+                            old_lookups(operation, product_id, user.pk)
+                        ok = write(client, operation, product_id, user.pk, review_ids)
+                    except (OperationalError, KeyError, Review.DoesNotExist):
+                        ok = False
+                local[operation].append(time.perf_counter() - start)
+                local_failures += not ok
+                if record_statements:
+                    with lock:
+                        statements.setdefault(operation, len(queries.captured_queries))
+        connection.close()
+        with lock:
+            for operation in OPERATIONS:
+                latencies[operation].extend(local[operation])
+            failures.append(local_failures)
+
+    workers = [threading.Thread(target=writer, args=(user, i == 0)) for i, user in enumerate(users)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+
+    total = sum(len(values) for values in latencies.values())
+    print(f"{mode:>8}: {total / elapsed:8.0f} writes/s, failed {sum(failures)}")
+    for operation in OPERATIONS:
+        values = sorted(latencies[operation])
+        print(
+            f"          {operation:<7} {statements.get(operation, 0):>2} statements, "
+            f"p50 {statistics.median(values) * 1000:6.2f} ms, "
+            f"p99 {values[int(len(values) * 0.99) - 1] * 1000:6.2f} ms"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--products', type=int, default=50, help='reviews written per thread')
+    parser.add_argument('--mode', action='append', choices=MODES)
+    args = parser.parse_args()
+
+    database = settings.DATABASES['default']
+    if database['ENGINE'].endswith('sqlite3'):
+        # Threads need a shared on-disk database rather than in-memory.
+        database.setdefault('TEST', {})['NAME'] = os.path.join(tempfile.mkdtemp(), 'bench.sqlite3')
+        database.setdefault('OPTIONS', {}).update(timeout=60, transaction_mode='IMMEDIATE')
+    settings.ALLOWED_HOSTS = ['testserver']
+
+    runner = DiscoverRunner(verbosity=0, interactive=False)
+    old_config = runner.setup_databases()
+    try:
+        for mode in args.mode or MODES:
+            users = [User.objects.create_user(email=f'{mode}-{i}@bench.local') for i in range(args.threads)]
+            product_ids = [
+                Product.objects.create(name=f'Benchmark product {i}', price='1.00').pk
+                for i in range(args.products)
+            ]
+            run(mode, users, product_ids)
+    finally:
+        runner.teardown_databases(old_config)
+
+
+if __name__ == '__main__':
+    main()
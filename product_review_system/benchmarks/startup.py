@@ -0,0 +1,68 @@
+"""
+Measure worker startup cost per settings profile.
+
+Each run starts a fresh interpreter that imports the WSGI application and
+resolves the URLconf (what a gunicorn worker does before serving its first
+request) and reports the elapsed time and resident memory.
+
+    python benchmarks/startup.py --profile dev --profile prod --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+
+CHILD = r'''
+import json, resource, sys, time
+start = time.perf_counter()
+from product_review_system.wsgi import application
+from django.urls import get_resolver
+get_resolver().url_patterns
+elapsed = time.perf_counter() - start
+rss_kb = None
+try:
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmRSS:'):
+                rss_kb = int(line.split()[1])
+except OSError:
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({'seconds': elapsed, 'rss_kb': rss_kb, 'modules': len(sys.modules)}))
+'''
+
+
+def run_once(profile):
+    env = dict(os.environ, DJANGO_ENV=profile)
+    env.setdefault('SECRET_KEY', 'startup-benchmark')
+    env.pop('DJANGO_SETTINGS_MODULE', None)
+    output = subprocess.run(
+        [sys.executable, '-W', 'ignore', '-c', CHILD],
+        cwd=PROJECT_DIR, env=env, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--profile', action='append', dest='profiles', choices=('dev', 'prod'))
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    for profile in args.profiles or ['dev', 'prod']:
+        samples = [run_once(profile) for _ in range(args.runs)]
+        seconds = [sample['seconds'] for sample in samples]
+        rss = [sample['rss_kb'] for sample in samples]
+        print(
+            f"{profile:>5}: startup median {statistics.median(seconds) * 1000:.0f} ms "
+            f"(min {min(seconds) * 1000:.0f} ms), RSS median {statistics.median(rss) / 1024:.1f} MiB, "
+            f"{samples[0]['modules']} modules"
+        )
+
+
+if __name__ == '__main__':
+    main()
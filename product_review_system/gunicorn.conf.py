@@ -0,0 +1,29 @@
+"""
+Gunicorn configuration for the prod settings profile.
+
+    DJANGO_ENV=prod gunicorn product_review_system.wsgi:application
+
+The application is preloaded in the master process so workers fork with
+Django, the URLconf and the models already imported and share those pages
+copy-on-write.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 0))
+preload_app = True
+
+
+def when_ready(server):
+    # Resolve the URLconf in the master so workers inherit the imported views.
+    from django.urls import get_resolver
+    get_resolver().url_patterns
+
+
+def post_fork(server, worker):
+    # Database connections must never be shared across forked workers.
+    from django.db import connections
+    connections.close_all()
@@ -0,0 +1,244 @@
+"""
+On-demand sampled profiling of live requests.
+
+``RequestProfilingMiddleware`` profiles a request when it carries a valid
+``X-Profile`` header (signed with ``SECRET_KEY``, see ``manage.py
+profile_token``) or when it wins the draw for its URL name in
+``REQUEST_PROFILING['SAMPLE_RATES']``. A profiled request is sampled from a
+background thread every ``INTERVAL`` seconds, so the stacks cover everything
+below the middleware: the view, the ORM, serializers and rendering. Each
+profile is written as one JSON file to ``REQUEST_PROFILING['DIR']``, which
+keeps only the newest ``MAX_PROFILES``; ``manage.py collapse_profiles``
+merges them into flamegraph collapsed stacks.
+
+Requests that are not profiled cost one header lookup, plus one random draw
+when sampling is configured. The middleware is async-capable, so under ASGI
+they, and the event streams, pass through without a thread of their own.
+"""
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import ExitStack
+from pathlib import Path
+
+from asgiref.sync import async_to_sync, iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.urls import Resolver404, resolve
+from django.utils import timezone
+
+HEADER = 'X-Profile'
+META_KEY = 'HTTP_X_PROFILE'
+TOKEN_SALT = 'product_review_system.profiling'
+
+DEFAULTS = {
+    'ENABLED': False,
+    'DIR': None,
+    'MAX_PROFILES': 200,
+    'SAMPLE_RATES': {},
+    'INTERVAL': 0.005,
+    'TOKEN_MAX_AGE': 3600,
+}
+
+# Where a sample's time goes, by the module of its innermost matching frame.
+CATEGORIES = (
+    ('orm', ('django.db.',)),
+    ('serializers', ('rest_framework.serializers', 'rest_framework.fields', 'rest_framework.relations')),
+    ('rendering', ('rest_framework.renderers', 'django.template.', 'json:', 'json.')),
+)
+
+
+def profiling_setting(name):
+    return getattr(settings, 'REQUEST_PROFILING', {}).get(name, DEFAULTS[name])
+
+
+def profile_dir():
+    return Path(profiling_setting('DIR') or Path(settings.BASE_DIR) / 'profiles')
+
+
+def make_token(label):
+    """Return an ``X-Profile`` header value that turns profiling on."""
+    return signing.TimestampSigner(salt=TOKEN_SALT).sign(label)
+
+
+def _token_label(token):
+    try:
+        return signing.TimestampSigner(salt=TOKEN_SALT).unsign(
+            token, max_age=profiling_setting('TOKEN_MAX_AGE')
+        )
+    except signing.BadSignature:
+        return None
+
+
+def _frame_name(frame):
+    return f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}"
+
+
+def stack_category(stack):
+    """Return the CATEGORIES name a collapsed stack is counted under, or 'other'."""
+    for frame in reversed(stack.split(';')):
+        for category, prefixes in CATEGORIES:
+            if frame.startswith(prefixes):
+                return category
+    return 'other'
+
+
+class _Sampler(threading.Thread):
+    """Count the stacks of another thread below ``base`` every ``interval``."""
+
+    def __init__(self, thread_id, base, interval):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.base = base
+        self.interval = interval
+        self.stacks = Counter()
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None and frame is not self.base:
+                names.append(_frame_name(frame))
+                frame = frame.f_back
+            if frame is self.base and names:
+                self.stacks[';'.join(reversed(names))] += 1
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+
+class _QueryTimer:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+def _write_profile(profile):
+    """Write ``profile`` to the ring directory and drop the oldest beyond the limit."""
+    directory = profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{profile['started_at'].replace(':', '')}-{profile['id']}.json"
+    tmp_path = path.with_name(f'.{path.name}.tmp')
+    tmp_path.write_text(json.dumps(profile))
+    os.replace(tmp_path, path)
+
+    # File names start with the timestamp, so name order is age order.
+    paths = sorted(directory.glob('*.json'))
+    for old in paths[:max(len(paths) - profiling_setting('MAX_PROFILES'), 0)]:
+        old.unlink(missing_ok=True)
+    return path
+
+
+def load_profiles():
+    """Yield the stored profiles, oldest first."""
+    for path in sorted(profile_dir().glob('*.json')):
+        try:
+            yield json.loads(path.read_text())
+        except (OSError, ValueError):
+            # Pruned or half-written by another worker.
+            continue
+
+
+class RequestProfilingMiddleware:
+    """Profile requests asked for with a signed header or picked by sampling."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not profiling_setting('ENABLED'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rates = dict(profiling_setting('SAMPLE_RATES'))
+        self.max_rate = max(self.sample_rates.values(), default=0)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        trigger = self._trigger(request)
+        if trigger is None:
+            return self.get_response(request)
+        return self._profile(request, *trigger, self.get_response)
+
+    async def __acall__(self, request):
+        trigger = self._trigger(request)
+        if trigger is None:
+            return await self.get_response(request)
+        # Profile from a worker thread: asgiref runs the sync views below in
+        # that same thread, where they are sampled and their queries timed.
+        return await sync_to_async(self._profile)(request, *trigger, async_to_sync(self.get_response))
+
+    def _trigger(self, request):
+        """Return ``(trigger, label)`` if the request is to be profiled, else None."""
+        token = request.META.get(META_KEY)
+        if token is not None:
+            label = _token_label(token)
+            if label is not None:
+                return 'header', label
+        elif self.max_rate and random.random() < self.max_rate:
+            # Only the requests that pass the cheapest draw pay for resolving
+            # the URL name; the second draw brings them down to its own rate.
+            view_name = self._view_name(request)
+            if random.random() * self.max_rate < self.sample_rates.get(view_name, 0):
+                return 'sample', ''
+        return None
+
+    @staticmethod
+    def _view_name(request):
+        try:
+            return resolve(request.path_info).view_name
+        except Resolver404:
+            return None
+
+    def _profile(self, request, trigger, label, get_response):
+        timer = _QueryTimer()
+        sampler = _Sampler(threading.get_ident(), sys._getframe(), profiling_setting('INTERVAL'))
+        started_at = timezone.now()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            started = time.perf_counter()
+            sampler.start()
+            try:
+                response = get_response(request)
+            finally:
+                duration = time.perf_counter() - started
+                sampler.stop()
+
+        match = request.resolver_match
+        profile = {
+            'id': uuid.uuid4().hex[:12],
+            'started_at': started_at.isoformat(timespec='milliseconds'),
+            'trigger': trigger,
+            'label': label,
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 2),
+            'queries': timer.count,
+            'query_ms': round(timer.seconds * 1000, 2),
+            'interval': sampler.interval,
+            'stacks': dict(sampler.stacks),
+        }
+        _write_profile(profile)
+        response['X-Profile-Id'] = profile['id']
+        return response
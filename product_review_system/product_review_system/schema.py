@@ -0,0 +1,156 @@
+"""
+OpenAPI schema generation and the prebuilt schema artifact.
+
+Generating the schema introspects every view and serializer, so it is done
+once per code version: ``manage.py build_schema`` writes
+``<API_SCHEMA_DIR>/openapi-<version>.{json,yaml}`` (plus gzipped copies) at
+deploy time, and ``schema_artifact_view`` serves those bytes with an ETag,
+building them on first hit if the deploy step was skipped.
+"""
+import gzip
+import hashlib
+import os
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+
+SCHEMA_FORMATS = {
+    'json': 'application/json',
+    'yaml': 'application/yaml',
+}
+
+_build_lock = threading.Lock()
+
+
+def get_api_info():
+    from drf_yasg import openapi
+
+    return openapi.Info(
+       title="Product Review System API",
+       default_version='v1',
+       description="API documentation for Product Review System",
+       terms_of_service="https://www.google.com/policies/terms/",
+       contact=openapi.Contact(email="contact@productreview.local"),
+       license=openapi.License(name="BSD License"),
+    )
+
+
+@lru_cache(maxsize=None)
+def get_schema_view():
+    """
+    Build the drf_yasg schema view on first use, so worker startup does not
+    pay for importing the OpenAPI generator.
+    """
+    from rest_framework import permissions
+    from drf_yasg.views import get_schema_view
+
+    return get_schema_view(
+       get_api_info(),
+       public=True,
+       permission_classes=(permissions.AllowAny,),
+    )
+
+
+@lru_cache(maxsize=None)
+def code_version():
+    """
+    Identify the code the schema is generated from.
+
+    Uses the ``CODE_VERSION`` environment variable when the deploy sets one,
+    otherwise a hash of the local apps' sources and the API library versions.
+    """
+    version = os.environ.get('CODE_VERSION')
+    if version:
+        return version
+
+    import drf_yasg
+    import rest_framework
+
+    digest = hashlib.sha256()
+    digest.update(f'{rest_framework.VERSION}:{drf_yasg.__version__}'.encode())
+    base_dir = Path(settings.BASE_DIR).resolve()
+    roots = {Path(__file__).resolve().parent}
+    roots.update(
+        Path(app.path).resolve() for app in apps.get_app_configs()
+        if Path(app.path).resolve().is_relative_to(base_dir)
+    )
+    for root in sorted(roots):
+        for source in sorted(root.rglob('*.py')):
+            digest.update(str(source.relative_to(base_dir)).encode())
+            digest.update(source.read_bytes())
+    return digest.hexdigest()[:12]
+
+
+def schema_path(fmt, version=None):
+    return Path(settings.API_SCHEMA_DIR) / f'openapi-{version or code_version()}.{fmt}'
+
+
+def _write_atomic(path, data):
+    tmp_path = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+
+def build_schema(force=False):
+    """
+    Write the schema artifacts for the current code version and return their
+    paths. Existing artifacts are kept unless ``force`` is set.
+    """
+    from drf_yasg.codecs import OpenAPICodecJson, OpenAPICodecYaml
+    from drf_yasg.generators import OpenAPISchemaGenerator
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+
+    paths = [schema_path(fmt) for fmt in SCHEMA_FORMATS]
+    if not force and all(path.exists() for path in paths):
+        return paths
+
+    # Views inspect request.method while being introspected, so generate
+    # against a synthetic request; an empty URL keeps the host out of the
+    # artifact so clients resolve paths against whichever host served it.
+    request = Request(APIRequestFactory().get('/swagger.json'))
+    generator = OpenAPISchemaGenerator(get_api_info(), url='')
+    schema = generator.get_schema(request=request, public=True)
+    codecs = {'json': OpenAPICodecJson([]), 'yaml': OpenAPICodecYaml([])}
+    Path(settings.API_SCHEMA_DIR).mkdir(parents=True, exist_ok=True)
+    for fmt, path in zip(SCHEMA_FORMATS, paths):
+        data = codecs[fmt].encode(schema)
+        _write_atomic(path, data)
+        _write_atomic(path.with_name(path.name + '.gz'), gzip.compress(data, mtime=0))
+    return paths
+
+
+@lru_cache(maxsize=None)
+def _load_artifact(fmt, version):
+    path = schema_path(fmt, version)
+    if not path.exists():
+        with _build_lock:
+            build_schema()
+    data = path.read_bytes()
+    gz_path = path.with_name(path.name + '.gz')
+    compressed = gz_path.read_bytes() if gz_path.exists() else gzip.compress(data, mtime=0)
+    etag = '"%s"' % hashlib.sha256(data).hexdigest()[:32]
+    return data, compressed, etag
+
+
+def schema_artifact_view(request, format):
+    """Serve the prebuilt schema for ``/swagger.json`` and ``/swagger.yaml``."""
+    fmt = format.lstrip('.')
+    data, compressed, etag = _load_artifact(fmt, code_version())
+
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+    else:
+        use_gzip = 'gzip' in request.headers.get('Accept-Encoding', '')
+        response = HttpResponse(compressed if use_gzip else data, content_type=SCHEMA_FORMATS[fmt])
+        if use_gzip:
+            response['Content-Encoding'] = 'gzip'
+    response['ETag'] = etag
+    response['Cache-Control'] = f'public, max-age={settings.API_SCHEMA_MAX_AGE}'
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
@@ -0,0 +1,24 @@
+"""
+Settings package for product_review_system.
+
+The profile is chosen by the ``DJANGO_ENV`` environment variable (``dev`` by
+default, or ``prod``), which may also be set in a ``.env`` file at the project
+root. Alternatively point ``DJANGO_SETTINGS_MODULE`` straight at
+``product_review_system.settings.dev`` or ``product_review_system.settings.prod``.
+"""
+import os
+from pathlib import Path
+
+from django.core.exceptions import ImproperlyConfigured
+from dotenv import load_dotenv
+
+load_dotenv(Path(__file__).resolve().parent.parent.parent / '.env')
+
+DJANGO_ENV = os.environ.get('DJANGO_ENV', 'dev')
+
+if DJANGO_ENV == 'dev':
+    from .dev import *  # noqa: F401,F403
+elif DJANGO_ENV == 'prod':
+    from .prod import *  # noqa: F401,F403
+else:
+    raise ImproperlyConfigured(f"Unknown DJANGO_ENV {DJANGO_ENV!r}, expected 'dev' or 'prod'.")
@@ -1,5 +1,6 @@
 """
-Django settings for product_review_system project.
+Base Django settings for product_review_system project, shared by the dev
+and prod profiles in this package.
 
 Generated by 'django-admin startproject' using Django 5.2.3.
 
@@ -10,22 +11,26 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
-BASE_DIR = Path(__file__).resolve().parent.parent
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
 
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
 
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = 'django-insecure-z$c7xsa@=vjlg*+ivug%$&msq52$i4i%dz3a0ckftbx&(62$g*'
+SECRET_KEY = os.environ.get(
+    'SECRET_KEY',
+    'django-insecure-z$c7xsa@=vjlg*+ivug%$&msq52$i4i%dz3a0ckftbx&(62$g*'
+)
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = False
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = [host for host in os.environ.get('ALLOWED_HOSTS', '').split(',') if host]
 
 
 # Application definition
@@ -44,7 +49,6 @@ INSTALLED_APPS = [
     'rest_framework_simplejwt.token_blacklist',
     'corsheaders',
     'drf_yasg',
-    'debug_toolbar',
     
     # Local apps
     'users.apps.UsersConfig',
@@ -52,6 +56,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'product_review_system.profiling.RequestProfilingMiddleware',
+    'product_review_system.traffic.TrafficCaptureMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -60,7 +66,6 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
 ROOT_URLCONF = 'product_review_system.urls'
@@ -93,6 +98,13 @@ DATABASES = {
     }
 }
 
+# Database aliases the reviews are spread over by a hash of their product ID
+# (see reviews.sharding); empty keeps all reviews in the default database.
+# Every alias must also be in DATABASES and migrated.
+REVIEW_SHARDS = []
+
+DATABASE_ROUTERS = ['reviews.sharding.ReviewShardRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -182,39 +194,49 @@ SIMPLE_JWT = {
 }
 
 # CORS settings
-# CORS settings
-CORS_ALLOW_ALL_ORIGINS = True  # For development only
+CORS_ALLOWED_ORIGINS = [origin for origin in os.environ.get('CORS_ALLOWED_ORIGINS', '').split(',') if origin]
 CORS_ALLOW_CREDENTIALS = True
 
-# Debug Toolbar settings
-INTERNAL_IPS = [
-    '127.0.0.1',
-]
+# Hold new reviews as pending until a moderator approves them
+REVIEWS_REQUIRE_APPROVAL = False
+
+# Age after which `manage.py archive_reviews` moves reviews to the archive
+# table (soft-deleted reviews are always archived)
+REVIEW_ARCHIVE_AFTER_DAYS = 730
+
+# Maximum number of IDs accepted by /api/products/batch/
+PRODUCT_BATCH_MAX_SIZE = 100
+
+# Maximum number of points returned by /api/products/<id>/price-history/
+PRICE_HISTORY_MAX_POINTS = 500
+
+# Per-process cache: invalidation does not reach other worker processes, so
+# the prod profile replaces it with a shared one
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Seconds /api/products/<id>/page/ is cached: server-side for every viewer,
+# and by browsers and proxies for anonymous ones
+PRODUCT_PAGE_CACHE_SECONDS = 60
+
+# Counter rows per review that helpful votes are spread over
+HELPFUL_COUNTER_SHARDS = 16
+
+# Server-Sent Events stream of product stats (reviews.views.product_stats_stream)
+REVIEW_STREAM = {
+    'MAX_SUBSCRIBERS': 5000,  # open streams per worker process
+    'MAX_PRODUCTS': 50,  # products per multi-product stream
+    'HEARTBEAT_SECONDS': 15,
+    'COALESCE_SECONDS': 0.5,
+}
 
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
-# Email settings (development only)
-EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
-
-# Debug Toolbar panels
-DEBUG_TOOLBAR_PANELS = [
-    'debug_toolbar.panels.history.HistoryPanel',
-    'debug_toolbar.panels.versions.VersionsPanel',
-    'debug_toolbar.panels.timer.TimerPanel',
-    'debug_toolbar.panels.settings.SettingsPanel',
-    'debug_toolbar.panels.headers.HeadersPanel',
-    'debug_toolbar.panels.request.RequestPanel',
-    'debug_toolbar.panels.sql.SQLPanel',
-    'debug_toolbar.panels.staticfiles.StaticFilesPanel',
-    'debug_toolbar.panels.templates.TemplatesPanel',
-    'debug_toolbar.panels.cache.CachePanel',
-    'debug_toolbar.panels.signals.SignalsPanel',
-    'debug_toolbar.panels.redirects.RedirectsPanel',
-    'debug_toolbar.panels.profiling.ProfilingPanel',
-]
-
 # DRF-YASG Settings
 SWAGGER_SETTINGS = {
     'SECURITY_DEFINITIONS': {
@@ -227,6 +249,47 @@ SWAGGER_SETTINGS = {
     'USE_SESSION_AUTH': False,
     'JSON_EDITOR': True,
     'DEFAULT_MODEL_RENDERING': 'example',
+    # Point the UIs at the prebuilt schema artifact instead of regenerating it.
+    'SPEC_URL': ('schema-json', {'format': '.json'}),
+}
+
+REDOC_SETTINGS = {
+    'SPEC_URL': ('schema-json', {'format': '.json'}),
+}
+
+# Prebuilt OpenAPI schema artifacts (see `manage.py build_schema`)
+API_SCHEMA_DIR = BASE_DIR / 'schema'
+API_SCHEMA_MAX_AGE = 300
+
+# On-demand request profiling (product_review_system.profiling): requests with
+# an X-Profile header from `manage.py profile_token`, and the given share of
+# requests per URL name, are profiled; DIR keeps the newest MAX_PROFILES.
+# Off unless REQUEST_PROFILING=1 (always on in the dev profile)
+REQUEST_PROFILING = {
+    'ENABLED': os.environ.get('REQUEST_PROFILING') == '1',
+    'DIR': BASE_DIR / 'profiles',
+    'MAX_PROFILES': 200,
+    'SAMPLE_RATES': {},  # e.g. {'reviews:product-list': 0.001}
+    'INTERVAL': 0.005,  # seconds between stack samples
+    'TOKEN_MAX_AGE': 3600,
+}
+
+# Capture of sanitized request metadata for `manage.py replay_traffic`
+# (product_review_system.traffic), one rotating log per worker process in DIR
+TRAFFIC_CAPTURE = {
+    'ENABLED': os.environ.get('TRAFFIC_CAPTURE') == '1',
+    'DIR': BASE_DIR / 'traffic',
+    'MAX_BYTES': 50 * 1024 * 1024,  # per log file before it is rotated
+    'BACKUP_COUNT': 5,
+    'MAX_BODY_BYTES': 4096,  # larger JSON bodies are not recorded
+    # JSON body fields recorded per URL name; other bodies and fields (review
+    # text among them) are dropped, emails and names always redacted
+    'BODY_FIELDS': {
+        'reviews:review-list': ['rating'],
+        'reviews:review-detail': ['rating'],
+        'reviews:product-batch': ['ids'],
+        'reviews:moderation-bulk': ['action', 'ids'],
+    },
 }
 
 # Logging configuration
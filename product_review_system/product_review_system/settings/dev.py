@@ -0,0 +1,53 @@
+"""
+Development settings: DEBUG, the debug toolbar and permissive CORS.
+"""
+import os
+
+from .base import *  # noqa: F401,F403
+
+DEBUG = True
+
+ALLOWED_HOSTS = ALLOWED_HOSTS or ['localhost', '127.0.0.1', '[::1]']
+
+INSTALLED_APPS = INSTALLED_APPS + ['debug_toolbar']
+
+MIDDLEWARE = MIDDLEWARE + ['debug_toolbar.middleware.DebugToolbarMiddleware']
+
+# Local review shards as extra SQLite files, e.g. REVIEW_SHARD_COUNT=4 (then
+# run `manage.py migrate --database reviews_<n>` for each)
+for index in range(int(os.environ.get('REVIEW_SHARD_COUNT', 0))):
+    DATABASES[f'reviews_{index}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / f'db_reviews_{index}.sqlite3',
+    }
+    REVIEW_SHARDS = REVIEW_SHARDS + [f'reviews_{index}']
+
+REQUEST_PROFILING = {**REQUEST_PROFILING, 'ENABLED': True}
+
+# CORS settings
+CORS_ALLOW_ALL_ORIGINS = True  # For development only
+
+# Debug Toolbar settings
+INTERNAL_IPS = [
+    '127.0.0.1',
+]
+
+# Email settings (development only)
+EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+
+# Debug Toolbar panels
+DEBUG_TOOLBAR_PANELS = [
+    'debug_toolbar.panels.history.HistoryPanel',
+    'debug_toolbar.panels.versions.VersionsPanel',
+    'debug_toolbar.panels.timer.TimerPanel',
+    'debug_toolbar.panels.settings.SettingsPanel',
+    'debug_toolbar.panels.headers.HeadersPanel',
+    'debug_toolbar.panels.request.RequestPanel',
+    'debug_toolbar.panels.sql.SQLPanel',
+    'debug_toolbar.panels.staticfiles.StaticFilesPanel',
+    'debug_toolbar.panels.templates.TemplatesPanel',
+    'debug_toolbar.panels.cache.CachePanel',
+    'debug_toolbar.panels.signals.SignalsPanel',
+    'debug_toolbar.panels.redirects.RedirectsPanel',
+    'debug_toolbar.panels.profiling.ProfilingPanel',
+]
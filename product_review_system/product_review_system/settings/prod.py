@@ -0,0 +1,35 @@
+"""
+Production settings: no dev-only apps or middleware, secrets from the
+environment.
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .base import *  # noqa: F401,F403
+
+if not os.environ.get('SECRET_KEY'):
+    raise ImproperlyConfigured('SECRET_KEY must be set in the environment for the prod profile.')
+
+DEBUG = False
+
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# Keep database connections open across requests in long-lived workers.
+DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('CONN_MAX_AGE', 60))
+
+# One cache for all workers, so a write drops the cached product page
+# everywhere; create the table with `manage.py createcachetable`.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'django_cache',
+    }
+}
+
+SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
+SESSION_COOKIE_SECURE = True
+CSRF_COOKIE_SECURE = True
+
+LOGGING['root']['level'] = 'WARNING'
+LOGGING['loggers']['django']['level'] = 'WARNING'
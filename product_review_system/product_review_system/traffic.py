@@ -0,0 +1,360 @@
+"""
+Capture of live API traffic and its replay against a test server.
+
+``TrafficCaptureMiddleware`` appends one JSON line per request to a rotating
+log per worker process in ``TRAFFIC_CAPTURE['DIR']``: the method, path, query
+parameters, URL name, authentication class, an opaque actor ID, the status
+and the time taken. Nothing that could grant access or identify a person is
+kept: headers and cookies are dropped, query parameters and JSON body fields
+whose names look like credentials, emails or names are replaced by
+``[redacted]``, and users are recorded as a keyed hash of their ID. Of the
+JSON bodies of writes (up to ``MAX_BODY_BYTES``), only the fields listed for
+the URL name in ``BODY_FIELDS`` are kept, so that writes can be replayed
+without recording review text; other bodies are not recorded at all.
+
+``replay`` sends a captured log to a running server, spaced as it was
+recorded (or ``speed`` times faster) from a pool of worker threads, and
+``summarize``/``compare`` turn the results into per-endpoint latency and
+error figures; ``manage.py replay_traffic`` ties these together.
+"""
+import http.client
+import json
+import logging
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from urllib.parse import urlencode, urlsplit
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.urls import reverse
+from django.utils.crypto import salted_hmac
+
+DEFAULTS = {
+    'ENABLED': False,
+    'DIR': None,
+    'MAX_BYTES': 50 * 1024 * 1024,
+    'BACKUP_COUNT': 5,
+    'MAX_BODY_BYTES': 4096,
+    'BODY_FIELDS': {},
+}
+REDACTED = '[redacted]'
+# Query parameters and body fields whose lower-cased name contains one of
+# these: credentials, and personal data such as emails and names.
+SECRET_NAMES = (
+    'password', 'token', 'secret', 'key', 'signature', 'refresh', 'access', 'session', 'csrf',
+    'email', 'name',
+)
+WRITE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+
+def traffic_setting(name):
+    return getattr(settings, 'TRAFFIC_CAPTURE', {}).get(name, DEFAULTS[name])
+
+
+def traffic_dir():
+    return Path(traffic_setting('DIR') or Path(settings.BASE_DIR) / 'traffic')
+
+
+def _is_secret(name):
+    name = str(name).lower()
+    return any(secret in name for secret in SECRET_NAMES)
+
+
+def _sanitize(value):
+    """Return ``value`` with credential-like fields redacted, and whether any were."""
+    if isinstance(value, dict):
+        clean, redacted = {}, False
+        for name, item in value.items():
+            if _is_secret(name):
+                clean[name], redacted = REDACTED, True
+            else:
+                clean[name], item_redacted = _sanitize(item)
+                redacted = redacted or item_redacted
+        return clean, redacted
+    if isinstance(value, list):
+        items = [_sanitize(item) for item in value]
+        return [item for item, _ in items], any(redacted for _, redacted in items)
+    return value, False
+
+
+def _auth_class(request, response):
+    # DRF keeps the authenticator on its own request, reachable from the response.
+    drf_request = (getattr(response, 'renderer_context', None) or {}).get('request')
+    authenticator = getattr(drf_request, 'successful_authenticator', None)
+    if authenticator is not None:
+        return type(authenticator).__name__
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return 'session'
+    return None
+
+
+class TrafficCaptureMiddleware:
+    """Record sanitized request metadata to a rotating JSON Lines log."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not traffic_setting('ENABLED'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.max_body_bytes = traffic_setting('MAX_BODY_BYTES')
+        self.body_fields = traffic_setting('BODY_FIELDS')
+        self._handler = None
+        self._pid = None
+        self._lock = threading.Lock()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        body = self._body(request)
+        started_at = time.time()
+        started = time.perf_counter()
+        response = self.get_response(request)
+        self._record(request, response, body, started_at, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        body = self._body(request)
+        started_at = time.time()
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        # Off the event loop: resolving request.user may query the session,
+        # and the log is written with blocking file I/O.
+        await sync_to_async(self._record)(request, response, body, started_at, time.perf_counter() - started)
+        return response
+
+    def _record(self, request, response, body, started_at, duration):
+        query, redacted = [], False
+        for name, values in request.GET.lists():
+            for value in values:
+                if _is_secret(name):
+                    value, redacted = REDACTED, True
+                query.append([name, value])
+        view = request.resolver_match.view_name if request.resolver_match else None
+        record = {
+            'ts': round(started_at, 4),
+            'method': request.method,
+            'path': request.path,
+            'query': query,
+            'view': view,
+            'auth': _auth_class(request, response),
+            'actor': None,
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 2),
+        }
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            record['actor'] = salted_hmac('traffic-capture', str(user.pk)).hexdigest()[:16]
+        # The URL name is only known once the request has been resolved.
+        fields = self.body_fields.get(view)
+        if isinstance(body, dict) and fields:
+            body = {name: value for name, value in body.items() if name in fields}
+            record['body'], body_redacted = _sanitize(body)
+            redacted = redacted or body_redacted
+        elif body is not None:
+            redacted = True
+        if redacted:
+            # Replaying a request without its credentials or body would only measure the rejection.
+            record['redacted'] = True
+        self._write(json.dumps(record, separators=(',', ':'), default=str))
+
+    def _body(self, request):
+        """Return the parsed JSON body of a write, or None; it is filtered once the view is known."""
+        if request.method not in WRITE_METHODS or request.content_type != 'application/json':
+            return None
+        try:
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            return None
+        if not 0 < length <= self.max_body_bytes:
+            return None
+        # Read before the view does, after which the body can no longer be read.
+        try:
+            return json.loads(request.body)
+        except ValueError:
+            return None
+
+    def _write(self, line):
+        with self._lock:
+            # One log per process: forked workers must not rotate each other's file.
+            if self._pid != os.getpid():
+                directory = traffic_dir()
+                directory.mkdir(parents=True, exist_ok=True)
+                self._handler = RotatingFileHandler(
+                    directory / f'traffic-{os.getpid()}.jsonl',
+                    maxBytes=traffic_setting('MAX_BYTES'),
+                    backupCount=traffic_setting('BACKUP_COUNT'),
+                )
+                self._handler.setFormatter(logging.Formatter('%(message)s'))
+                self._pid = os.getpid()
+            self._handler.handle(logging.makeLogRecord({'msg': line}))
+
+
+def load_traffic(paths):
+    """Return the records of the given log files or directories, oldest first."""
+    files = []
+    for path in map(Path, paths):
+        files.extend(sorted(path.glob('traffic-*.jsonl*')) if path.is_dir() else [path])
+    records = []
+    for file in files:
+        with open(file) as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # The last line of a log being written may be incomplete.
+                    continue
+    records.sort(key=lambda record: record['ts'])
+    return records
+
+
+class _Client:
+    """
+    Send requests to a target server, one connection per request: gunicorn's
+    sync workers close every connection, and keep-alive against the
+    development server adds delayed-ACK stalls that are not the app's.
+    """
+
+    def __init__(self, target, timeout):
+        parts = urlsplit(target)
+        self.connection_class = (
+            http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        )
+        self.netloc = parts.netloc
+        self.prefix = parts.path.rstrip('/')
+        self.timeout = timeout
+
+    def request(self, method, url, body=None, headers=None):
+        """Return the response status and body."""
+        connection = self.connection_class(self.netloc, timeout=self.timeout)
+        try:
+            connection.request(method, self.prefix + url, body=body, headers=headers or {})
+            response = connection.getresponse()
+            return response.status, response.read()
+        finally:
+            connection.close()
+
+
+def login(target, credentials, timeout=10):
+    """Return an access token per ``(email, password)`` from the target's login endpoint."""
+    client = _Client(target, timeout)
+    tokens = []
+    for email, password in credentials:
+        status, data = client.request(
+            'POST', reverse('users:token_obtain_pair'), json.dumps({'email': email, 'password': password}),
+            {'Content-Type': 'application/json'},
+        )
+        if status != 200:
+            raise ValueError(f'Login as {email} on {target} failed with status {status}')
+        tokens.append(json.loads(data)['access'])
+    return tokens
+
+
+def replay(records, target, speed=1.0, workers=8, tokens=(), timeout=10):
+    """
+    Send ``records`` to ``target``, ``speed`` times as fast as they were
+    captured (0 sends them back to back), and return one result per record:
+    ``{'endpoint', 'status', 'captured_status', 'latency_ms', 'error'}``.
+
+    Requests of an authenticated actor carry one of ``tokens``, the same for
+    every request of that actor.
+    """
+    client = _Client(target, timeout)
+    actors = sorted({record['actor'] for record in records if record.get('actor')})
+    actor_tokens = {actor: tokens[i % len(tokens)] for i, actor in enumerate(actors)} if tokens else {}
+
+    def send(record):
+        url = record['path']
+        if record['query']:
+            url += '?' + urlencode(record['query'])
+        headers = {}
+        body = None
+        if 'body' in record:
+            body = json.dumps(record['body'])
+            headers['Content-Type'] = 'application/json'
+        if record.get('actor'):
+            headers['Authorization'] = f"Bearer {actor_tokens[record['actor']]}"
+        result = {
+            'endpoint': f"{record['method']} {record['view'] or record['path']}",
+            'captured_status': record['status'],
+            'status': None,
+            'error': None,
+        }
+        started = time.perf_counter()
+        try:
+            result['status'], _ = client.request(record['method'], url, body, headers)
+        except (OSError, http.client.HTTPException) as error:
+            result['error'] = type(error).__name__
+        result['latency_ms'] = (time.perf_counter() - started) * 1000
+        return result
+
+    if not records:
+        return []
+    first_ts = records[0]['ts']
+    started = time.monotonic()
+    futures = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for record in records:
+            if speed:
+                delay = started + (record['ts'] - first_ts) / speed - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            futures.append(pool.submit(send, record))
+    return [future.result() for future in futures]
+
+
+def _percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def summarize(results):
+    """
+    Return ``{endpoint: stats}`` plus an ``'all'`` entry, where stats has the
+    request count, errors (no response or a 5xx), responses whose status
+    differs from the captured one, and latency percentiles in milliseconds.
+    """
+    groups = {'all': []}
+    for result in results:
+        groups.setdefault(result['endpoint'], []).append(result)
+        groups['all'].append(result)
+    summary = {}
+    for endpoint, rows in groups.items():
+        if not rows:
+            continue
+        latencies = [row['latency_ms'] for row in rows]
+        summary[endpoint] = {
+            'requests': len(rows),
+            'errors': sum(row['status'] is None or row['status'] >= 500 for row in rows),
+            'status_changed': sum(row['status'] != row['captured_status'] for row in rows),
+            'mean_ms': round(statistics.fmean(latencies), 2),
+            'p50_ms': round(_percentile(latencies, 0.5), 2),
+            'p95_ms': round(_percentile(latencies, 0.95), 2),
+            'p99_ms': round(_percentile(latencies, 0.99), 2),
+        }
+    return summary
+
+
+def compare(before, after):
+    """
+    Return ``(endpoint, before, after, p50 change, p95 change)`` for the
+    endpoints of two summaries, changes as fractions of the ``before`` value.
+    """
+    rows = []
+    for endpoint in sorted(set(before) | set(after), key=lambda name: (name != 'all', name)):
+        old, new = before.get(endpoint), after.get(endpoint)
+        changes = [
+            (new[key] - old[key]) / old[key] if old and new and old[key] else None
+            for key in ('p50_ms', 'p95_ms')
+        ]
+        rows.append((endpoint, old, new, *changes))
+    return rows
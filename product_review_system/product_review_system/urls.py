@@ -1,44 +1,49 @@
 """
 URL configuration for product_review_system project.
 """
+from functools import lru_cache
+
 from django.contrib import admin
 from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
-from rest_framework import permissions
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
-
-# Schema view for API documentation
-schema_view = get_schema_view(
-   openapi.Info(
-      title="Product Review System API",
-      default_version='v1',
-      description="API documentation for Product Review System",
-      terms_of_service="https://www.google.com/policies/terms/",
-      contact=openapi.Contact(email="contact@productreview.local"),
-      license=openapi.License(name="BSD License"),
-   ),
-   public=True,
-   permission_classes=(permissions.AllowAny,),
-)
+
+from .schema import get_schema_view, schema_artifact_view
+
+
+def lazy_schema_view(renderer):
+    """Return a view that delegates to the lazily built schema UI view."""
+    @lru_cache(maxsize=None)
+    def build():
+        return get_schema_view().with_ui(renderer, cache_timeout=0)
+
+    def view(request, *args, **kwargs):
+        # The UI pages load their spec from ``?format=openapi``; serve the
+        # prebuilt artifact instead of generating the schema per request.
+        if request.GET.get('format') == 'openapi':
+            return schema_artifact_view(request, '.json')
+        return build()(request, *args, **kwargs)
+    return view
+
 
 urlpatterns = [
     # Admin site
     path('admin/', admin.site.urls),
     
     # API Documentation
-    re_path(r'^swagger(?P<format>\.json|\.yaml)$', schema_view.without_ui(cache_timeout=0), name='schema-json'),
-    path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
-    path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
+    re_path(r'^swagger(?P<format>\.json|\.yaml)$', schema_artifact_view, name='schema-json'),
+    path('swagger/', lazy_schema_view('swagger'), name='schema-swagger-ui'),
+    path('redoc/', lazy_schema_view('redoc'), name='schema-redoc'),
     
     # API endpoints
     path('api/auth/', include('users.urls')),
     path('api/', include('reviews.urls')),
 ]
 
-# Serve media files in development
-if settings.DEBUG:
+if 'debug_toolbar' in settings.INSTALLED_APPS:
     import debug_toolbar
     urlpatterns += [path('__debug__/', include(debug_toolbar.urls))]
+
+# Serve media files in development
+if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -1,14 +1,92 @@
 from django.contrib import admin
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
 from django.utils.html import format_html
 from django.utils.translation import gettext_lazy as _
 
 from .models import Product, Review
+from .moderation import moderate_reviews
+from .sharding import review_databases, sharding_enabled
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that uses the planner's row estimate for unfiltered querysets
+    on large tables instead of running a full COUNT(*).
+
+    A queryset counts as unfiltered when it has no conditions beyond those of
+    its model's default manager, such as the soft-delete filter of
+    ``ReviewManager``; the estimate then also includes the rows that filter
+    hides. Only PostgreSQL exposes a cheap estimate (pg_class.reltuples);
+    other backends and filtered changelists fall back to an exact count.
+    """
+    estimate_threshold = 100000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if self._is_unfiltered(queryset):
+            estimate = self._estimated_count(queryset)
+            if estimate is not None and estimate > self.estimate_threshold:
+                return estimate
+        return super().count
+
+    @staticmethod
+    def _is_unfiltered(queryset):
+        base_where = queryset.model._default_manager.get_queryset().query.where
+        return not queryset.query.where or queryset.query.where == base_where
+
+    @staticmethod
+    def _estimated_count(queryset):
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE relname = %s',
+                [queryset.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        return row[0] if row else None
+
+
+class ReviewShardFilter(admin.SimpleListFilter):
+    """
+    Choose the shard the review changelist reads from (the first one by
+    default); a changelist can only page through one database.
+    """
+    title = _('shard')
+    parameter_name = 'shard'
+    
+    def _alias(self):
+        return self.value() if self.value() in review_databases() else review_databases()[0]
+    
+    def lookups(self, request, model_admin):
+        return [(alias, alias) for alias in review_databases()]
+    
+    def choices(self, changelist):
+        for alias, title in self.lookup_choices:
+            yield {
+                'selected': self._alias() == alias,
+                'query_string': changelist.get_query_string({self.parameter_name: alias}),
+                'display': title,
+            }
+    
+    def queryset(self, request, queryset):
+        return queryset.using(self._alias())
+
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     list_display = ('name', 'price', 'average_rating_display', 'review_count', 'created_by', 'created_at')
     list_filter = ('created_at', 'updated_at')
+    list_select_related = ('created_by',)
     search_fields = ('name', 'description')
+    autocomplete_fields = ('created_by',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     readonly_fields = ('created_at', 'updated_at', 'average_rating_display', 'review_count')
     fieldsets = (
         (None, {
@@ -24,9 +102,19 @@ class ProductAdmin(admin.ModelAdmin):
         }),
     )
     
+    def get_queryset(self, request):
+        # Annotate the aggregates once instead of running two queries per row.
+        return super().get_queryset(request).with_review_stats()
+    
     def average_rating_display(self, obj):
         return f"{obj.average_rating:.1f} / 5.0"
     average_rating_display.short_description = _('Average Rating')
+    average_rating_display.admin_order_field = '_average_rating'
+    
+    def review_count(self, obj):
+        return obj.review_count
+    review_count.short_description = _('Review Count')
+    review_count.admin_order_field = '_review_count'
     
     def save_model(self, request, obj, form, change):
         if not change:
@@ -35,13 +123,18 @@ class ProductAdmin(admin.ModelAdmin):
 
 @admin.register(Review)
 class ReviewAdmin(admin.ModelAdmin):
-    list_display = ('product', 'user', 'rating_stars', 'created_at', 'updated_at')
-    list_filter = ('rating', 'created_at', 'updated_at')
+    list_display = ('product', 'user', 'rating_stars', 'status', 'created_at', 'updated_at')
+    list_filter = ('status', 'rating', 'created_at', 'updated_at')
+    list_select_related = ('product', 'user')
     search_fields = ('product__name', 'user__email', 'comment')
-    readonly_fields = ('created_at', 'updated_at', 'rating_stars')
+    autocomplete_fields = ('product', 'user')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = ('approve_reviews', 'reject_reviews')
+    readonly_fields = ('created_at', 'updated_at', 'rating_stars', 'helpful_count')
     fieldsets = (
         (None, {
-            'fields': ('product', 'user', 'rating', 'rating_stars', 'comment')
+            'fields': ('product', 'user', 'rating', 'rating_stars', 'comment', 'status', 'helpful_count')
         }),
         (_('Metadata'), {
             'fields': ('created_at', 'updated_at'),
@@ -49,7 +142,49 @@ class ReviewAdmin(admin.ModelAdmin):
         }),
     )
     
+    def get_list_filter(self, request):
+        if sharding_enabled():
+            return (ReviewShardFilter,) + self.list_filter
+        return self.list_filter
+    
+    def get_search_fields(self, request):
+        # Products and users cannot be joined from a shard.
+        if sharding_enabled():
+            return ('comment',)
+        return self.search_fields
+    
+    def get_sortable_by(self, request):
+        if sharding_enabled():
+            return [name for name in self.list_display if name not in ('product', 'user')]
+        return super().get_sortable_by(request)
+    
+    def get_object(self, request, object_id, from_field=None):
+        if not sharding_enabled():
+            return super().get_object(request, object_id, from_field)
+        # Review IDs are unique across shards; look in each of them.
+        for queryset in self.get_queryset(request).per_shard():
+            try:
+                return queryset.get(pk=object_id)
+            except (Review.DoesNotExist, ValidationError, ValueError):
+                continue
+        return None
+    
     def rating_stars(self, obj):
         return '★' * obj.rating + '☆' * (5 - obj.rating)
     rating_stars.short_description = _('Rating')
     rating_stars.admin_order_field = 'rating'
+    
+    @admin.action(description=_('Approve selected reviews'))
+    def approve_reviews(self, request, queryset):
+        count = moderate_reviews(queryset, 'approve')
+        self.message_user(request, _('%(count)d reviews approved.') % {'count': count})
+    
+    @admin.action(description=_('Reject selected reviews'))
+    def reject_reviews(self, request, queryset):
+        count = moderate_reviews(queryset, 'reject')
+        self.message_user(request, _('%(count)d reviews rejected.') % {'count': count})
+    
+    def delete_queryset(self, request, queryset):
+        # Used by the "delete selected" action; soft-delete set-based and
+        # rebuild the affected rollups once.
+        moderate_reviews(queryset, 'delete')
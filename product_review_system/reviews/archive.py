@@ -0,0 +1,78 @@
+"""
+Archival of old and soft-deleted reviews.
+
+``archive_reviews`` copies a batch of reviews into ArchivedReview, adds the
+approved, live ones to the product's ArchivedProductRating totals and then
+deletes them from the Review table, in one transaction per batch (two when
+the reviews are in a shard). Helpful votes not folded yet are added to the
+archived helpful counts. The daily rating rollups are left untouched
+because archived reviews still count towards them.
+"""
+import operator
+from collections import defaultdict
+from functools import reduce
+
+from django.db import transaction
+from django.db.models import F, Q
+
+from .models import ArchivedProductRating, ArchivedReview, Review
+from .signals import suppress_review_signals
+from .votes import pending_helpful_deltas
+
+ARCHIVED_FIELDS = (
+    'id', 'product_id', 'user_id', 'rating', 'comment', 'helpful_count',
+    'status', 'created_at', 'updated_at', 'deleted_at',
+)
+
+
+def archive_candidates(older_than=None, include_deleted=True):
+    """Reviews created before ``older_than`` and/or soft-deleted."""
+    conditions = []
+    if older_than is not None:
+        conditions.append(Q(created_at__lt=older_than))
+    if include_deleted:
+        conditions.append(Q(deleted_at__isnull=False))
+    if not conditions:
+        return Review.all_objects.none()
+    return Review.all_objects.filter(reduce(operator.or_, conditions))
+
+
+def _add_archived_totals(totals):
+    for product_id, counts in totals.items():
+        increments = {f'rating_{rating}': F(f'rating_{rating}') + count for rating, count in counts.items()}
+        increments['review_count'] = F('review_count') + sum(counts.values())
+        increments['rating_sum'] = F('rating_sum') + sum(rating * count for rating, count in counts.items())
+        ArchivedProductRating.objects.get_or_create(product_id=product_id)
+        ArchivedProductRating.objects.filter(product_id=product_id).update(**increments)
+
+
+def archive_batch(queryset, batch_size=1000):
+    """
+    Archive up to ``batch_size`` reviews from ``queryset`` (which must read
+    from a single shard); return how many were moved.
+    """
+    with transaction.atomic(using=queryset.db), suppress_review_signals():
+        rows = list(queryset.order_by('pk').values(*ARCHIVED_FIELDS)[:batch_size])
+        if not rows:
+            return 0
+        # The counter shards go with the reviews; keep their unfolded votes.
+        pending = pending_helpful_deltas([row['id'] for row in rows], using=queryset.db)
+        for row in rows:
+            row['helpful_count'] += pending.get(row['id'], 0)
+        
+        # With sharding the archive is in another database, so a run that
+        # stopped between the two commits may have archived some rows already.
+        with transaction.atomic():
+            archived = set(
+                ArchivedReview.objects.filter(pk__in=[row['id'] for row in rows]).values_list('pk', flat=True)
+            )
+            new_rows = [row for row in rows if row['id'] not in archived]
+            totals = defaultdict(lambda: defaultdict(int))
+            for row in new_rows:
+                if row['status'] == Review.Status.APPROVED and row['deleted_at'] is None:
+                    totals[row['product_id']][row['rating']] += 1
+            
+            ArchivedReview.objects.bulk_create(ArchivedReview(**row) for row in new_rows)
+            _add_archived_totals(totals)
+        Review.all_objects.using(queryset.db).filter(pk__in=[row['id'] for row in rows]).delete()
+    return len(rows)
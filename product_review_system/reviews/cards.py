@@ -0,0 +1,87 @@
+"""
+The product list read model.
+
+Each product's ``ProductListSerializer`` row is rendered to JSON once, when
+the product or its reviews change, and stored as a ProductCard together
+with the columns the list sorts and searches by. ``refresh_product_cards``
+is called on commit by the product and review signal handlers and by the
+bulk paths that bypass them (moderation, price sync, aggregate repairs);
+``product_list_page`` then answers ``/api/products/`` by joining the stored
+bytes of one page in index order, without serializing anything. A new
+product's card is inserted with it, in the same transaction, by
+``create_product_card``. Products written without signals (``bulk_create``,
+``QuerySet.update``, raw SQL) have a missing or stale card until
+``rebuild_product_cards`` runs.
+"""
+import json
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from rest_framework.renderers import JSONRenderer
+
+from .models import Product, ProductCard
+
+
+def render_card(product):
+    """Return the JSON bytes of a product annotated ``with_review_stats``."""
+    # Imported here: the serializers import moderation, which imports this module.
+    from .serializers import ProductListSerializer
+
+    return JSONRenderer().render(ProductListSerializer(product).data)
+
+
+def create_product_card(product, using=DEFAULT_DB_ALIAS):
+    """Store the card of a product that was just created, and so has no reviews yet."""
+    product.__dict__.update(_review_count=0, _average_rating=None)
+    ProductCard.objects.using(using).create(
+        product=product, name=product.name, created_at=product.created_at, data=render_card(product)
+    )
+
+
+def refresh_product_cards(product_ids, batch_size=500):
+    """Render and store the cards of ``product_ids``; IDs of deleted products are skipped."""
+    product_ids = sorted(set(product_ids))
+    for start in range(0, len(product_ids), batch_size):
+        batch = product_ids[start:start + batch_size]
+        products = Product.objects.with_review_stats().filter(pk__in=batch).order_by()
+        cards = [
+            ProductCard(product=product, name=product.name, created_at=product.created_at, data=render_card(product))
+            for product in products
+        ]
+        ProductCard.objects.bulk_create(
+            cards,
+            update_conflicts=True,
+            unique_fields=['product'],
+            update_fields=['name', 'created_at', 'data'],
+        )
+
+
+def refresh_product_cards_on_commit(product_ids, using=DEFAULT_DB_ALIAS):
+    """Refresh the cards of ``product_ids`` once the current transaction of ``using`` commits."""
+    product_ids = list(product_ids)
+    if product_ids:
+        transaction.on_commit(lambda: refresh_product_cards(product_ids), using=using)
+
+
+def rebuild_product_cards(batch_size=500):
+    """Render the card of every product and drop cards left without one; return how many were built."""
+    product_ids = list(Product.objects.order_by('pk').values_list('pk', flat=True))
+    refresh_product_cards(product_ids, batch_size=batch_size)
+    ProductCard.objects.exclude(product__in=Product.objects.all()).delete()
+    return len(product_ids)
+
+
+def product_list_page(paginator, request, search=None):
+    """
+    Return the JSON body of a page of the product list, byte for byte what
+    ``paginator.get_paginated_response`` would render.
+    """
+    cards = ProductCard.objects.all()
+    if search:
+        cards = cards.filter(name__icontains=search)
+    page = paginator.paginate_queryset(cards.values_list('data', flat=True), request)
+    return b''.join((
+        b'{"count":', str(paginator.page.paginator.count).encode(),
+        b',"next":', json.dumps(paginator.get_next_link()).encode(),
+        b',"previous":', json.dumps(paginator.get_previous_link()).encode(),
+        b',"results":[', b','.join(bytes(data) for data in page), b']}',
+    ))
@@ -0,0 +1,187 @@
+"""
+Consistency checks of the stored rating aggregates.
+
+``reconcile_partition`` recomputes the DailyProductRating rows and the
+ArchivedProductRating totals of a range of product IDs from the reviews,
+compares them with what is stored and, unless only checking, writes the
+corrections in bulk, in one transaction that holds the stored rows locked
+from before the reviews are counted. The rebuild_product_stats command runs it for every
+partition of the product ID space, in parallel worker processes.
+"""
+from collections import defaultdict
+from contextlib import nullcontext
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count
+
+from .cards import refresh_product_cards_on_commit
+from .models import ArchivedProductRating, ArchivedReview, DailyProductRating, Review
+from .rollups import daily_totals
+
+RATINGS = range(1, 6)
+
+
+def partitions(first_id, last_id, size):
+    """Split the product IDs ``first_id..last_id`` into ``(start, end)`` ranges of ``size`` IDs."""
+    return [(start, min(start + size - 1, last_id)) for start in range(first_id, last_id + 1, size)]
+
+
+def _in_range(id_range):
+    # ``__range`` is not supported on foreign keys.
+    return {'product_id__gte': id_range[0], 'product_id__lte': id_range[1]}
+
+
+def _expected_daily(id_range):
+    live = Review.objects.approved().filter(**_in_range(id_range)).per_shard()
+    archived = ArchivedReview.objects.filter(
+        **_in_range(id_range), status=Review.Status.APPROVED, deleted_at__isnull=True
+    )
+    totals = defaultdict(lambda: [0, 0])
+    for queryset in (*live, archived):
+        for product_id, day, review_count, rating_sum in daily_totals(queryset):
+            row = totals[product_id, day]
+            row[0] += review_count
+            row[1] += rating_sum
+    return totals
+
+
+def _expected_archived(id_range):
+    rows = (
+        ArchivedReview.objects.filter(
+            **_in_range(id_range), status=Review.Status.APPROVED, deleted_at__isnull=True
+        )
+        .order_by()
+        .values_list('product_id', 'rating')
+        .annotate(count=Count('id'))
+    )
+    totals = defaultdict(lambda: {f'rating_{rating}': 0 for rating in RATINGS})
+    for product_id, rating, count in rows:
+        totals[product_id][f'rating_{rating}'] = count
+    for counts in totals.values():
+        counts['review_count'] = sum(counts[f'rating_{rating}'] for rating in RATINGS)
+        counts['rating_sum'] = sum(rating * counts[f'rating_{rating}'] for rating in RATINGS)
+    return totals
+
+
+def _recount_daily(row):
+    """Set a rollup row, locked, to the totals of its product and day."""
+    row = DailyProductRating.objects.select_for_update().get(product_id=row.product_id, day=row.day)
+    row.review_count, row.rating_sum = _expected_daily((row.product_id, row.product_id)).get(
+        (row.product_id, row.day), (0, 0)
+    )
+    row.save(update_fields=['review_count', 'rating_sum'])
+
+
+def _recount_archived(row):
+    """Set an archived totals row, locked, to the totals of its product."""
+    row = ArchivedProductRating.objects.select_for_update().get(product_id=row.product_id)
+    totals = _expected_archived((row.product_id, row.product_id)).get(row.product_id)
+    for field in [f'rating_{rating}' for rating in RATINGS] + ['review_count', 'rating_sum']:
+        setattr(row, field, totals[field] if totals else 0)
+    row.save()
+
+
+def _create_missing(model, rows, recount):
+    """
+    Insert the missing rows; a review write may have created some of them
+    since they were found missing, in which case those are recounted.
+    """
+    if not rows:
+        return
+    try:
+        with transaction.atomic():
+            model.objects.bulk_create(rows, batch_size=1000)
+        return
+    except IntegrityError:
+        pass
+    for row in rows:
+        try:
+            with transaction.atomic():
+                model.objects.bulk_create([row])
+        except IntegrityError:
+            recount(row)
+
+
+def reconcile_partition(start_id, end_id, fix=True):
+    """
+    Compare the stored aggregates of products ``start_id..end_id`` with the
+    reviews and, if ``fix``, correct them.
+
+    Return a summary with the number of reviews counted, the IDs of the
+    products whose aggregates drifted and the rows created, updated and
+    deleted (or that would be, when only checking).
+    """
+    id_range = (start_id, end_id)
+    drifted = set()
+
+    with transaction.atomic() if fix else nullcontext():
+        daily_rows = DailyProductRating.objects.filter(**_in_range(id_range)).order_by('pk')
+        archived_rows = ArchivedProductRating.objects.filter(**_in_range(id_range)).order_by('pk')
+        if fix:
+            # Lock the stored rows before counting, so a review write that
+            # commits meanwhile applies its delta after the corrections
+            # instead of being overwritten by them.
+            daily_rows = daily_rows.select_for_update()
+            archived_rows = archived_rows.select_for_update()
+        daily_rows, archived_rows = list(daily_rows), list(archived_rows)
+
+        expected = _expected_daily(id_range)
+        review_total = sum(count for count, _ in expected.values())
+        stale_daily, changed_daily = [], []
+        for row in daily_rows:
+            totals = expected.pop((row.product_id, row.day), None)
+            if totals is None:
+                if row.review_count or row.rating_sum:
+                    drifted.add(row.product_id)
+                stale_daily.append(row.pk)
+            elif [row.review_count, row.rating_sum] != totals:
+                row.review_count, row.rating_sum = totals
+                changed_daily.append(row)
+                drifted.add(row.product_id)
+        missing_daily = [
+            DailyProductRating(product_id=product_id, day=day, review_count=count, rating_sum=total)
+            for (product_id, day), (count, total) in expected.items()
+        ]
+        drifted.update(row.product_id for row in missing_daily)
+
+        expected_archived = _expected_archived(id_range)
+        stale_archived, changed_archived = [], []
+        for row in archived_rows:
+            totals = expected_archived.pop(row.product_id, None)
+            if totals is None:
+                if row.review_count:
+                    drifted.add(row.product_id)
+                stale_archived.append(row.pk)
+            elif any(getattr(row, field) != value for field, value in totals.items()):
+                for field, value in totals.items():
+                    setattr(row, field, value)
+                changed_archived.append(row)
+                drifted.add(row.product_id)
+        missing_archived = [
+            ArchivedProductRating(product_id=product_id, **totals)
+            for product_id, totals in expected_archived.items()
+        ]
+        drifted.update(row.product_id for row in missing_archived)
+
+        if fix:
+            DailyProductRating.objects.filter(pk__in=stale_daily).delete()
+            DailyProductRating.objects.bulk_update(changed_daily, ['review_count', 'rating_sum'], batch_size=1000)
+            _create_missing(DailyProductRating, missing_daily, _recount_daily)
+            ArchivedProductRating.objects.filter(pk__in=stale_archived).delete()
+            ArchivedProductRating.objects.bulk_update(
+                changed_archived,
+                [f'rating_{rating}' for rating in RATINGS] + ['review_count', 'rating_sum'],
+                batch_size=1000
+            )
+            _create_missing(ArchivedProductRating, missing_archived, _recount_archived)
+            refresh_product_cards_on_commit(drifted)
+
+    return {
+        'start': start_id,
+        'end': end_id,
+        'reviews': review_total,
+        'drifted': sorted(drifted),
+        'created': len(missing_daily) + len(missing_archived),
+        'updated': len(changed_daily) + len(changed_archived),
+        'deleted': len(stale_daily) + len(stale_archived),
+    }
@@ -0,0 +1,117 @@
+"""
+In-process pub/sub for review changes.
+
+Review writes publish the affected product ID; every open stats stream that
+subscribed to that product is woken up. Notifications are coalesced per
+subscription into a set of dirty product IDs, so a burst of writes to one
+product costs a single stats refresh per subscriber and the memory held by
+an idle connection is bounded by the number of products it watches.
+
+The broker also remembers the latest payload built for each watched product,
+so one change fans out to many listeners at the cost of one stats query.
+
+The broker is per process: with several workers, each one only sees the
+writes it handles itself.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+
+
+class Subscription:
+    """A single listener interested in a fixed set of products."""
+
+    def __init__(self, product_ids, loop):
+        self.product_ids = frozenset(product_ids)
+        self._loop = loop
+        self._dirty = set()
+        self._event = asyncio.Event()
+
+    def notify(self, product_id):
+        """Mark a product as changed; safe to call from any thread."""
+        try:
+            self._loop.call_soon_threadsafe(self._mark_dirty, product_id)
+        except RuntimeError:
+            # The subscriber's event loop has already been closed.
+            pass
+
+    def _mark_dirty(self, product_id):
+        self._dirty.add(product_id)
+        self._event.set()
+
+    async def wait(self, timeout, coalesce_delay=0):
+        """
+        Wait up to ``timeout`` seconds for changes and return the set of
+        changed product IDs (empty on timeout). When something changed, keep
+        collecting for ``coalesce_delay`` seconds to fold bursts together.
+        """
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return set()
+        if coalesce_delay:
+            await asyncio.sleep(coalesce_delay)
+        self._event.clear()
+        dirty, self._dirty = self._dirty, set()
+        return dirty
+
+
+class ReviewEventBroker:
+    """Fan out product change notifications to subscriptions."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_product = defaultdict(set)
+        # product_id -> (version, cached payload or None); only kept while
+        # the product has at least one subscriber.
+        self._versions = {}
+        self._count = 0
+
+    @property
+    def subscriber_count(self):
+        return self._count
+
+    def subscribe(self, product_ids, loop=None):
+        subscription = Subscription(product_ids, loop or asyncio.get_running_loop())
+        with self._lock:
+            for product_id in subscription.product_ids:
+                self._by_product[product_id].add(subscription)
+            self._count += 1
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for product_id in subscription.product_ids:
+                subscribers = self._by_product.get(product_id)
+                if subscribers is None:
+                    continue
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._by_product[product_id]
+                    self._versions.pop(product_id, None)
+            self._count -= 1
+
+    def publish(self, product_id):
+        with self._lock:
+            subscribers = tuple(self._by_product.get(product_id, ()))
+            if subscribers:
+                version = self._versions.get(product_id, (0, None))[0]
+                self._versions[product_id] = (version + 1, None)
+        for subscription in subscribers:
+            subscription.notify(product_id)
+
+    def get_cached(self, product_id):
+        """Return ``(version, payload)``; payload is None if stale or missing."""
+        with self._lock:
+            return self._versions.get(product_id, (0, None))
+
+    def set_cached(self, product_id, version, payload):
+        """Cache ``payload`` if no change was published since ``version``."""
+        with self._lock:
+            if product_id not in self._by_product:
+                return
+            if self._versions.get(product_id, (0, None))[0] == version:
+                self._versions[product_id] = (version, payload)
+
+
+broker = ReviewEventBroker()
@@ -0,0 +1,41 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from reviews.archive import archive_batch, archive_candidates
+
+
+class Command(BaseCommand):
+    help = 'Move old and soft-deleted reviews into the archive table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-days', type=int, default=settings.REVIEW_ARCHIVE_AFTER_DAYS,
+            help='Archive reviews created more than this many days ago '
+                 '(default: REVIEW_ARCHIVE_AFTER_DAYS; 0 disables age-based archiving)'
+        )
+        parser.add_argument(
+            '--deleted-only', action='store_true',
+            help='Only archive soft-deleted reviews'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of reviews moved per transaction (default: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        older_than = None
+        if options['older_than_days'] and not options['deleted_only']:
+            older_than = timezone.now() - timedelta(days=options['older_than_days'])
+        total = 0
+        for queryset in archive_candidates(older_than=older_than).per_shard():
+            while True:
+                moved = archive_batch(queryset, batch_size=options['batch_size'])
+                if not moved:
+                    break
+                total += moved
+                self.stdout.write(f'Archived {total} reviews...')
+
+        self.stdout.write(self.style.SUCCESS(f'Successfully archived {total} reviews'))
@@ -0,0 +1,111 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.runner import DiscoverRunner
+
+from reviews.query_audit import PLAN_PATTERNS, audit_endpoints, finding_key, seed_audit_data
+
+
+class Command(BaseCommand):
+    help = (
+        'Replay requests to every API endpoint against a seeded throwaway database, report '
+        'query plans that scan tables or sort without an index, propose indexes and fail '
+        'when a finding is not in the baseline'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--baseline', default=os.path.join(settings.BASE_DIR, 'query_audit_baseline.json'),
+            help='JSON file of accepted findings (default: query_audit_baseline.json in the project directory)'
+        )
+        parser.add_argument(
+            '--update-baseline', action='store_true',
+            help='Accept the current findings by writing them to the baseline'
+        )
+        parser.add_argument(
+            '--products', type=int, default=20,
+            help='Number of products seeded (default: 20)'
+        )
+
+    def handle(self, *args, **options):
+        vendors = {connections[alias].vendor for alias in connections}
+        unsupported = vendors - set(PLAN_PATTERNS)
+        if unsupported:
+            raise CommandError(f'Query plans are not supported on {", ".join(sorted(unsupported))}')
+        vendor = connections['default'].vendor
+
+        runner = DiscoverRunner(verbosity=0, interactive=False)
+        runner.setup_test_environment()
+        old_config = runner.setup_databases()
+        try:
+            results = audit_endpoints(seed_audit_data(products=options['products']))
+        finally:
+            runner.teardown_databases(old_config)
+            runner.teardown_test_environment()
+
+        baseline_path = options['baseline']
+        baseline = {}
+        if os.path.exists(baseline_path):
+            with open(baseline_path) as f:
+                baseline = json.load(f)
+        accepted = set(baseline.get(vendor, []))
+
+        keys = set()
+        proposals = {}
+        new = set()
+        for result in results:
+            findings = result['findings']
+            if findings or options['verbosity'] >= 2:
+                self.stdout.write(
+                    f"{result['request']} ({result['endpoint']}): {result['status']}, "
+                    f"{result['queries']} queries, {len(findings)} findings"
+                )
+            for finding in findings:
+                key = finding_key(result['endpoint'], finding)
+                keys.add(key)
+                marker = ''
+                if key not in accepted:
+                    new.add(key)
+                    marker = ' [new]'
+                self.stdout.write(f"  {finding['kind']} on {finding['table']}: {finding['detail']}{marker}")
+                if finding['index']:
+                    index = finding['index']
+                    proposal = f"{index['model']}: models.Index(fields={index['fields']!r}, name='{index['name']}')"
+                    proposals[proposal] = proposals.get(proposal, 0) + 1
+                    self.stdout.write(f'    propose {proposal}')
+                else:
+                    self.stdout.write(f"    {finding['note']}")
+                if options['verbosity'] >= 2:
+                    self.stdout.write(f"    {finding['sql']}")
+
+        if proposals:
+            self.stdout.write('Proposed indexes (by number of findings they address):')
+            for proposal, count in sorted(proposals.items(), key=lambda item: -item[1]):
+                self.stdout.write(f'  {count:>3}  {proposal}')
+
+        if options['update_baseline']:
+            baseline[vendor] = sorted(keys)
+            with open(baseline_path, 'w') as f:
+                json.dump(baseline, f, indent=2)
+                f.write('\n')
+            self.stdout.write(self.style.SUCCESS(
+                f'Successfully wrote {len(keys)} accepted findings for {vendor} to {baseline_path}'
+            ))
+            return
+
+        fixed = accepted - keys
+        if fixed:
+            self.stdout.write(
+                f'{len(fixed)} baseline findings no longer occur; run with --update-baseline to drop them'
+            )
+        if new:
+            raise CommandError(
+                f'{len(new)} new unindexed query plans; add the proposed indexes or accept them '
+                f'with --update-baseline:\n  ' + '\n  '.join(sorted(new))
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Audited {len(results)} requests: {len(keys)} findings, none new'
+        ))
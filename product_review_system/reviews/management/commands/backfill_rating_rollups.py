@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from reviews.cards import refresh_product_cards
+from reviews.models import Product
+from reviews.rollups import rebuild_daily_ratings
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily product rating rollups from the Review table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--product', type=int, action='append', dest='product_ids',
+            help='Only rebuild the given product ID (may be repeated)'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Number of products rebuilt per transaction (default: 500)'
+        )
+
+    def handle(self, *args, **options):
+        products = Product.objects.order_by('pk').values_list('pk', flat=True)
+        if options['product_ids']:
+            products = products.filter(pk__in=options['product_ids'])
+
+        batch_size = options['batch_size']
+        batch = []
+        total = 0
+        for product_id in products.iterator(chunk_size=batch_size):
+            batch.append(product_id)
+            if len(batch) >= batch_size:
+                rebuild_daily_ratings(batch)
+                refresh_product_cards(batch)
+                total += len(batch)
+                self.stdout.write(f'Rebuilt rollups for {total} products...')
+                batch = []
+        if batch:
+            rebuild_daily_ratings(batch)
+            refresh_product_cards(batch)
+            total += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f'Successfully rebuilt rating rollups for {total} products'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from product_review_system.schema import build_schema, code_version
+
+
+class Command(BaseCommand):
+    help = 'Write the OpenAPI schema artifacts for the current code version'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Regenerate the artifacts even if they already exist for this version'
+        )
+
+    def handle(self, *args, **options):
+        paths = build_schema(force=options['force'])
+        for path in paths:
+            self.stdout.write(f'  {path}')
+        self.stdout.write(self.style.SUCCESS(f'Schema artifacts ready for version {code_version()}'))
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from reviews.similarity import build_similar_products
+
+
+class Command(BaseCommand):
+    help = 'Build the "customers also liked" similar products from co-review data'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Rebuild every product instead of only those affected by review changes since the last run'
+        )
+        parser.add_argument(
+            '--top-k', type=int, default=10,
+            help='Number of similar products stored per product (default: 10)'
+        )
+        parser.add_argument(
+            '--min-common', type=int, default=2,
+            help='Minimum number of shared reviewers for two products to be similar (default: 2)'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Number of products scored and written per transaction (default: 500)'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            import numpy  # noqa: F401
+            import scipy  # noqa: F401
+        except ImportError as exc:
+            raise CommandError(f'NumPy and SciPy are required to build similar products ({exc})')
+
+        rebuilt, changed = build_similar_products(
+            top_k=options['top_k'],
+            min_common=options['min_common'],
+            full=options['full'],
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully rebuilt similar products for {rebuilt} products ({changed} with changed reviews)'
+        ))
@@ -0,0 +1,68 @@
+from collections import Counter, defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+from product_review_system.profiling import CATEGORIES, load_profiles, profile_dir, stack_category
+
+
+class Command(BaseCommand):
+    help = (
+        'Merge the stored request profiles into flamegraph collapsed stacks, one root frame '
+        'per URL name, and summarize where each endpoint spends its time'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--view', action='append', help='Only profiles of this URL name (repeatable)')
+        parser.add_argument('--trigger', choices=('header', 'sample'), help='Only profiles taken this way')
+        parser.add_argument(
+            '--output', default='profiles.folded',
+            help="File the collapsed stacks are written to ('-' for stdout, default: profiles.folded)"
+        )
+
+    def handle(self, *args, **options):
+        views = set(options['view'] or ())
+        stacks = Counter()
+        summary = defaultdict(lambda: {'profiles': 0, 'duration_ms': 0.0, 'queries': 0, 'query_ms': 0.0,
+                                       'samples': Counter()})
+        for profile in load_profiles():
+            view = profile['view'] or 'unresolved'
+            if views and view not in views:
+                continue
+            if options['trigger'] and profile['trigger'] != options['trigger']:
+                continue
+            row = summary[view]
+            row['profiles'] += 1
+            row['duration_ms'] += profile['duration_ms']
+            row['queries'] += profile['queries']
+            row['query_ms'] += profile['query_ms']
+            for stack, count in profile['stacks'].items():
+                stacks[f'{view};{stack}'] += count
+                row['samples'][stack_category(stack)] += count
+        if not summary:
+            raise CommandError(f'No matching profiles in {profile_dir()}')
+
+        lines = [f'{stack} {count}\n' for stack, count in sorted(stacks.items())]
+        report = self.stdout
+        if options['output'] == '-':
+            self.stdout.write(''.join(lines), ending='')
+            report = self.stderr
+        else:
+            with open(options['output'], 'w') as f:
+                f.writelines(lines)
+
+        categories = [category for category, _ in CATEGORIES] + ['other']
+        for view, row in sorted(summary.items()):
+            n = row['profiles']
+            samples = sum(row['samples'].values())
+            shares = ', '.join(
+                f"{category} {row['samples'][category] / samples:.0%}" for category in categories
+            ) if samples else 'no samples'
+            report.write(
+                f"{view}: {n} profiles, {row['duration_ms'] / n:.1f} ms avg, "
+                f"{row['queries'] / n:.1f} queries ({row['query_ms'] / n:.1f} ms) avg; {shares}"
+            )
+        if options['output'] != '-':
+            self.stdout.write(self.style.SUCCESS(
+                f"Successfully wrote {len(lines)} stacks from "
+                f"{sum(row['profiles'] for row in summary.values())} profiles to {options['output']}"
+            ))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from reviews.votes import fold_helpful_counts
+
+
+class Command(BaseCommand):
+    help = 'Fold pending helpful-vote counter shards into Review.helpful_count'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Number of reviews folded per transaction (default: 500)'
+        )
+
+    def handle(self, *args, **options):
+        updated = fold_helpful_counts(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Successfully folded helpful votes for {updated} reviews'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from product_review_system.profiling import HEADER, make_token, profiling_setting
+
+
+class Command(BaseCommand):
+    help = f'Print a signed {HEADER} header value that makes the API profile a request'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--label', default='',
+            help='Text stored with the profiles taken with this token, e.g. who asked for them'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{HEADER}: {make_token(options['label'])}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Successfully signed a token valid for {profiling_setting('TOKEN_MAX_AGE')}s"
+        ))
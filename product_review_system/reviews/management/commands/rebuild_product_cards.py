@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from reviews.cards import rebuild_product_cards
+
+
+class Command(BaseCommand):
+    help = 'Render the prebuilt product list card of every product'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Number of products rendered per query (default: 500)'
+        )
+
+    def handle(self, *args, **options):
+        total = rebuild_product_cards(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Successfully rebuilt the cards of {total} products'))
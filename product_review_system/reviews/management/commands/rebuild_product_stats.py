@@ -0,0 +1,124 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Max, Min
+
+from reviews.consistency import partitions, reconcile_partition
+from reviews.models import Product
+
+
+def _init_worker():
+    # Workers started with the spawn method begin without a configured Django.
+    django.setup()
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the stored product rating aggregates (daily rollups and archived totals) '
+        'from the reviews in parallel, and correct or report drift'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Only report products whose aggregates drifted; exit with an error if any did'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=min(4, os.cpu_count() or 1),
+            help='Number of worker processes (default: up to 4; 1 runs in this process)'
+        )
+        parser.add_argument(
+            '--partition-size', type=int, default=10000,
+            help='Number of product IDs handled per partition (default: 10000)'
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='File recording finished partitions; rerun with the same file to resume after an interruption'
+        )
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1 or options['partition_size'] < 1:
+            raise CommandError('--workers and --partition-size must be positive')
+        fix = not options['check']
+        bounds = Product.objects.aggregate(first=Min('pk'), last=Max('pk'))
+        if bounds['first'] is None:
+            self.stdout.write(self.style.SUCCESS('No products to rebuild'))
+            return
+
+        ranges = partitions(bounds['first'], bounds['last'], options['partition_size'])
+        checkpoint = options['checkpoint']
+        state = self._load_checkpoint(checkpoint, fix, options['partition_size'])
+        pending = [(start, end) for start, end in ranges if start not in state['done']]
+        if len(pending) < len(ranges):
+            self.stdout.write(f'Resuming: {len(ranges) - len(pending)} of {len(ranges)} partitions already done')
+
+        self._started = time.monotonic()
+        self._reviews = 0
+        self._finished = len(ranges) - len(pending)
+        drifted = []
+        for result in self._run(pending, fix, options['workers']):
+            drifted.extend(result['drifted'])
+            self._report(result, len(ranges), fix)
+            if checkpoint:
+                state['done'].add(result['start'])
+                self._save_checkpoint(checkpoint, state)
+
+        if checkpoint and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        if not fix and drifted:
+            if options['verbosity'] >= 2:
+                self.stdout.write('Drifted products: ' + ', '.join(map(str, sorted(drifted))))
+            raise CommandError(f'Found drifted aggregates for {len(drifted)} products')
+        verb = 'Checked' if not fix else 'Rebuilt'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} aggregates for {len(ranges)} partitions; {len(drifted)} products '
+            f'{"drifted" if not fix else "corrected"}'
+        ))
+
+    def _run(self, pending, fix, workers):
+        if workers == 1 or len(pending) <= 1:
+            for start, end in pending:
+                yield reconcile_partition(start, end, fix)
+            return
+        # Each worker opens its own connections; do not share this process's.
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            futures = [pool.submit(reconcile_partition, start, end, fix) for start, end in pending]
+            for future in as_completed(futures):
+                yield future.result()
+
+    def _report(self, result, total, fix):
+        self._finished += 1
+        self._reviews += result['reviews']
+        elapsed = time.monotonic() - self._started
+        rate = self._reviews / elapsed if elapsed else 0
+        changes = f"{result['created']} created, {result['updated']} updated, {result['deleted']} deleted"
+        self.stdout.write(
+            f"[{self._finished}/{total}] products {result['start']}-{result['end']}: "
+            f"{result['reviews']} reviews, {len(result['drifted'])} drifted "
+            f"({changes}{'' if fix else ' needed'}); {rate:.0f} reviews/s"
+        )
+
+    def _load_checkpoint(self, path, fix, partition_size):
+        state = {'fix': fix, 'partition_size': partition_size, 'done': set()}
+        if not path or not os.path.exists(path):
+            return state
+        with open(path) as f:
+            saved = json.load(f)
+        if saved.get('fix') != fix or saved.get('partition_size') != partition_size:
+            raise CommandError(
+                f'{path} was written by a run with different --check/--partition-size options'
+            )
+        state['done'] = set(saved.get('done', []))
+        return state
+
+    def _save_checkpoint(self, path, state):
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({**state, 'done': sorted(state['done'])}, f)
+        os.replace(tmp_path, path)
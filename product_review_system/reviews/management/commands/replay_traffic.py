@@ -0,0 +1,125 @@
+import csv
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from product_review_system.traffic import (
+    WRITE_METHODS, compare, load_traffic, login, replay, summarize, traffic_dir,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Replay captured API traffic against one or two running servers and report latency '
+        'and errors per endpoint, comparing the two servers or a saved earlier run'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'logs', nargs='*',
+            help="Traffic log files or directories (default: TRAFFIC_CAPTURE['DIR'])"
+        )
+        parser.add_argument(
+            '--target', action='append',
+            help='Base URL of a server to replay against; give it twice to compare two builds '
+                 '(default: http://127.0.0.1:8000)'
+        )
+        parser.add_argument(
+            '--speed', type=float, default=1.0,
+            help='Replay this many times faster than captured; 0 sends requests back to back (default: 1)'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=8,
+            help='Number of concurrent connections (default: 8)'
+        )
+        parser.add_argument('--limit', type=int, help='Replay only the first N requests')
+        parser.add_argument('--read-only', action='store_true', help='Skip POST, PUT, PATCH and DELETE requests')
+        parser.add_argument(
+            '--credentials',
+            help='CSV file of email,password rows of users on the target; captured users are mapped '
+                 'onto them (without it, authenticated requests are skipped)'
+        )
+        parser.add_argument('--timeout', type=float, default=10, help='Seconds per request (default: 10)')
+        parser.add_argument('--save', help='Write the summary of the last target to this JSON file')
+        parser.add_argument('--compare', help='Compare against a summary written earlier with --save')
+
+    def handle(self, *args, **options):
+        targets = options['target'] or ['http://127.0.0.1:8000']
+        if len(targets) > 2 or (len(targets) == 2 and options['compare']):
+            raise CommandError('Compare at most two runs: two --target, or one --target and --compare')
+        if options['workers'] < 1 or options['speed'] < 0:
+            raise CommandError('--workers must be positive and --speed not negative')
+
+        records = load_traffic(options['logs'] or [traffic_dir()])
+        credentials = []
+        if options['credentials']:
+            with open(options['credentials'], newline='') as f:
+                credentials = [(row[0], row[1]) for row in csv.reader(f) if len(row) >= 2 and row[0] != 'email']
+        skipped = {'redacted': 0, 'authenticated': 0, 'write': 0}
+        kept = []
+        for record in records:
+            if record.get('redacted'):
+                skipped['redacted'] += 1
+            elif record.get('actor') and not credentials:
+                skipped['authenticated'] += 1
+            elif options['read_only'] and record['method'] in WRITE_METHODS:
+                skipped['write'] += 1
+            else:
+                kept.append(record)
+        records = kept[:options['limit']]
+        if not records:
+            raise CommandError('No requests to replay')
+        self.stdout.write(
+            f'Replaying {len(records)} requests over {records[-1]["ts"] - records[0]["ts"]:.0f}s of traffic; '
+            f'skipped {", ".join(f"{count} {reason}" for reason, count in skipped.items())}'
+        )
+
+        summaries = []
+        for target in targets:
+            try:
+                tokens = login(target, credentials, options['timeout']) if credentials else ()
+            except (OSError, ValueError) as error:
+                raise CommandError(str(error))
+            results = replay(records, target, options['speed'], options['workers'], tokens, options['timeout'])
+            summary = summarize(results)
+            summaries.append((target, summary))
+            self._report(target, summary)
+
+        if options['save']:
+            with open(options['save'], 'w') as f:
+                json.dump(summaries[-1][1], f, indent=2)
+        if options['compare']:
+            with open(options['compare']) as f:
+                summaries.insert(0, (options['compare'], json.load(f)))
+        if len(summaries) == 2:
+            self._compare(summaries[0], summaries[1])
+
+        self.stdout.write(self.style.SUCCESS(f'Successfully replayed {len(records)} requests'))
+
+    def _report(self, target, summary):
+        self.stdout.write(f'\n{target}')
+        for endpoint, stats in sorted(summary.items(), key=lambda item: (item[0] != 'all', item[0])):
+            self.stdout.write(
+                f"  {endpoint}: {stats['requests']} requests, {stats['errors']} errors, "
+                f"{stats['status_changed']} status changes; p50 {stats['p50_ms']:.1f} ms, "
+                f"p95 {stats['p95_ms']:.1f} ms, p99 {stats['p99_ms']:.1f} ms"
+            )
+
+    def _compare(self, before, after):
+        (before_name, before_summary), (after_name, after_summary) = before, after
+        self.stdout.write(f'\n{after_name} against {before_name}')
+        for endpoint, old, new, p50_change, p95_change in compare(before_summary, after_summary):
+            if old is None or new is None:
+                self.stdout.write(f"  {endpoint}: only in {before_name if new is None else after_name}")
+                continue
+            line = (
+                f"  {endpoint}: p50 {old['p50_ms']:.1f} -> {new['p50_ms']:.1f} ms ({self._change(p50_change)}), "
+                f"p95 {old['p95_ms']:.1f} -> {new['p95_ms']:.1f} ms ({self._change(p95_change)}), "
+                f"errors {old['errors']} -> {new['errors']}"
+            )
+            worse = new['errors'] > old['errors'] or (p95_change or 0) > 0.1
+            self.stdout.write(self.style.WARNING(line) if worse else line)
+
+    @staticmethod
+    def _change(fraction):
+        return 'n/a' if fraction is None else f'{fraction:+.0%}'
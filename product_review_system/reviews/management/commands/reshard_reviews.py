@@ -0,0 +1,102 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.db.models import Max
+
+from reviews.models import HelpfulCounterShard, Review, ReviewVote
+from reviews.sharding import advance_review_ids, review_databases, shard_for_product
+from reviews.signals import suppress_review_signals
+
+
+class Command(BaseCommand):
+    help = (
+        'Move reviews, with their votes and helpful counters, to the shard of their product '
+        'after REVIEW_SHARDS changed'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source', action='append', dest='sources', default=[],
+            help='Also move reviews out of this database, e.g. default when enabling sharding '
+                 'or a shard being retired (may be repeated)'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of reviews read per batch (default: 1000)'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report how many reviews would move'
+        )
+
+    def handle(self, *args, **options):
+        targets = review_databases()
+        sources = list(dict.fromkeys([*targets, *options['sources']]))
+        unknown = [alias for alias in sources if alias not in connections.databases]
+        if unknown:
+            raise CommandError(f'Unknown database aliases: {", ".join(unknown)}')
+
+        if not options['dry_run']:
+            # Reviews keep their IDs, so new ones must not collide with them.
+            last_ids = [Review.all_objects.using(alias).aggregate(last=Max('pk'))['last'] for alias in sources]
+            advance_review_ids(max(filter(None, last_ids), default=0))
+
+        total = 0
+        for source in sources:
+            last_pk = 0
+            scanned = moved = 0
+            while True:
+                batch = list(
+                    Review.all_objects.using(source).filter(pk__gt=last_pk)
+                    .order_by('pk').values_list('pk', 'product_id')[:options['batch_size']]
+                )
+                if not batch:
+                    break
+                last_pk = batch[-1][0]
+                moves = defaultdict(list)
+                for review_id, product_id in batch:
+                    target = shard_for_product(product_id, targets)
+                    if target != source:
+                        moves[target].append(review_id)
+                for target, review_ids in moves.items():
+                    if not options['dry_run']:
+                        self._move(source, target, review_ids)
+                    moved += len(review_ids)
+                scanned += len(batch)
+                self.stdout.write(f'{source}: scanned {scanned} reviews, {moved} to move...')
+            total += moved
+
+        verb = 'Would move' if options['dry_run'] else 'Successfully moved'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {total} reviews'))
+
+    def _move(self, source, target, review_ids):
+        reviews = list(Review.all_objects.using(source).filter(pk__in=review_ids))
+        votes = list(ReviewVote.objects.using(source).filter(review_id__in=review_ids))
+        counters = list(HelpfulCounterShard.objects.using(source).filter(review_id__in=review_ids))
+        # bulk_create stamps the auto_now(_add) fields, so the original
+        # timestamps are put back with bulk_update afterwards.
+        review_times = {review.pk: (review.created_at, review.updated_at) for review in reviews}
+        vote_times = {(vote.review_id, vote.user_id): vote.created_at for vote in votes}
+        for row in votes + counters:
+            # Votes and counters are only unique per review; the target
+            # assigns new IDs.
+            row.pk = None
+
+        with transaction.atomic(using=target):
+            # Conflicts are rows copied by a run that stopped before deleting them.
+            Review.all_objects.using(target).bulk_create(reviews, ignore_conflicts=True)
+            for review in reviews:
+                review.created_at, review.updated_at = review_times[review.pk]
+            Review.all_objects.using(target).bulk_update(reviews, ['created_at', 'updated_at'])
+
+            ReviewVote.objects.using(target).bulk_create(votes, ignore_conflicts=True)
+            copied = list(ReviewVote.objects.using(target).filter(review_id__in=review_ids))
+            for vote in copied:
+                vote.created_at = vote_times.get((vote.review_id, vote.user_id), vote.created_at)
+            ReviewVote.objects.using(target).bulk_update(copied, ['created_at'])
+
+            HelpfulCounterShard.objects.using(target).bulk_create(counters, ignore_conflicts=True)
+
+        with transaction.atomic(using=source), suppress_review_signals():
+            Review.all_objects.using(source).filter(pk__in=review_ids).delete()
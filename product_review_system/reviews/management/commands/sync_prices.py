@@ -0,0 +1,39 @@
+import csv
+import sys
+from decimal import InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+
+from reviews.prices import as_price, update_prices
+
+
+class Command(BaseCommand):
+    help = 'Update product prices from a CSV file of product_id,price rows, recording only changes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV file with product_id and price columns ('-' for stdin)")
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of products compared and updated per transaction (default: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        stream = sys.stdin if path == '-' else open(path, newline='')
+        prices = {}
+        try:
+            for line, row in enumerate(csv.DictReader(stream), start=2):
+                try:
+                    prices[int(row['product_id'])] = as_price(row['price'])
+                except (KeyError, TypeError, ValueError, InvalidOperation):
+                    raise CommandError(f'Invalid row on line {line}: expected product_id and price')
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        changed, missing = update_prices(prices, batch_size=options['batch_size'])
+        if missing:
+            self.stderr.write(f'Skipped {len(missing)} unknown product IDs')
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully synced {len(prices)} prices ({changed} changed)'
+        ))
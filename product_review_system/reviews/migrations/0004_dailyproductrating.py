@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0003_review_user_created_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyProductRating',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='day')),
+                ('review_count', models.IntegerField(default=0, verbose_name='review count')),
+                ('rating_sum', models.IntegerField(default=0, verbose_name='rating sum')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_ratings', to='reviews.product', verbose_name='product')),
+            ],
+            options={
+                'verbose_name': 'daily product rating',
+                'verbose_name_plural': 'daily product ratings',
+                'ordering': ['product', 'day'],
+                'constraints': [models.UniqueConstraint(fields=('product', 'day'), name='unique_product_day_rating')],
+            },
+        ),
+    ]
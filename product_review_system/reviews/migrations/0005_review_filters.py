@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+import reviews.search
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0004_dailyproductrating'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['product', 'rating', 'created_at'], name='review_product_rating_idx'),
+        ),
+        migrations.RunPython(
+            reviews.search.install_comment_index,
+            reviews.search.uninstall_comment_index,
+        ),
+    ]
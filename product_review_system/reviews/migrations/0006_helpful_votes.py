@@ -0,0 +1,76 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+import reviews.search
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0005_review_filters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HelpfulCounterShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveSmallIntegerField(verbose_name='shard')),
+                ('delta', models.IntegerField(default=0, verbose_name='delta')),
+            ],
+            options={
+                'verbose_name': 'helpful counter shard',
+                'verbose_name_plural': 'helpful counter shards',
+            },
+        ),
+        migrations.CreateModel(
+            name='ReviewVote',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='created at')),
+            ],
+            options={
+                'verbose_name': 'review vote',
+                'verbose_name_plural': 'review votes',
+            },
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='helpful_count',
+            field=models.PositiveIntegerField(default=0, help_text='Helpful votes folded in from the vote counter shards', verbose_name='helpful count'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['product', '-helpful_count'], name='review_product_helpful_idx'),
+        ),
+        migrations.AddField(
+            model_name='helpfulcountershard',
+            name='review',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='helpful_shards', to='reviews.review', verbose_name='review'),
+        ),
+        migrations.AddField(
+            model_name='reviewvote',
+            name='review',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='votes', to='reviews.review', verbose_name='review'),
+        ),
+        migrations.AddField(
+            model_name='reviewvote',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='review_votes', to=settings.AUTH_USER_MODEL, verbose_name='user'),
+        ),
+        migrations.AddConstraint(
+            model_name='helpfulcountershard',
+            constraint=models.UniqueConstraint(fields=('review', 'shard'), name='unique_review_counter_shard'),
+        ),
+        migrations.AddConstraint(
+            model_name='reviewvote',
+            constraint=models.UniqueConstraint(fields=('review', 'user'), name='unique_review_user_vote', violation_error_message='You have already voted for this review.'),
+        ),
+        # Adding helpful_count rebuilds reviews_review on SQLite, which drops
+        # the comment search triggers.
+        migrations.RunPython(reviews.search.install_comment_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:31
+
+from django.conf import settings
+from django.db import migrations, models
+
+import reviews.search
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0006_helpful_votes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('approved', 'Approved'), ('rejected', 'Rejected')], default='approved', help_text='Only approved reviews are shown publicly and counted in ratings', max_length=10, verbose_name='status'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(condition=models.Q(('status', 'approved')), fields=['product', '-created_at'], name='review_approved_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['created_at'], name='review_pending_idx'),
+        ),
+        # Adding status rebuilds reviews_review on SQLite, which drops the
+        # comment search triggers.
+        migrations.RunPython(reviews.search.install_comment_index, migrations.RunPython.noop),
+    ]
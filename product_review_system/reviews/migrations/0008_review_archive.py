@@ -0,0 +1,92 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:34
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+import reviews.search
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0007_review_moderation'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedProductRating',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='archived_ratings', serialize=False, to='reviews.product', verbose_name='product')),
+                ('rating_1', models.PositiveIntegerField(default=0)),
+                ('rating_2', models.PositiveIntegerField(default=0)),
+                ('rating_3', models.PositiveIntegerField(default=0)),
+                ('rating_4', models.PositiveIntegerField(default=0)),
+                ('rating_5', models.PositiveIntegerField(default=0)),
+                ('review_count', models.PositiveIntegerField(default=0, verbose_name='review count')),
+                ('rating_sum', models.PositiveIntegerField(default=0, verbose_name='rating sum')),
+            ],
+            options={
+                'verbose_name': 'archived product rating',
+                'verbose_name_plural': 'archived product ratings',
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedReview',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('rating', models.PositiveSmallIntegerField(choices=[(1, '1 - Poor'), (2, '2 - Fair'), (3, '3 - Good'), (4, '4 - Very Good'), (5, '5 - Excellent')], verbose_name='rating')),
+                ('comment', models.TextField(blank=True, verbose_name='comment')),
+                ('helpful_count', models.PositiveIntegerField(default=0, verbose_name='helpful count')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('approved', 'Approved'), ('rejected', 'Rejected')], max_length=10, verbose_name='status')),
+                ('created_at', models.DateTimeField(verbose_name='created at')),
+                ('updated_at', models.DateTimeField(verbose_name='updated at')),
+                ('deleted_at', models.DateTimeField(blank=True, null=True, verbose_name='deleted at')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='archived at')),
+            ],
+            options={
+                'verbose_name': 'archived review',
+                'verbose_name_plural': 'archived reviews',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.RemoveConstraint(
+            model_name='review',
+            name='unique_product_user_review',
+        ),
+        migrations.RemoveIndex(
+            model_name='review',
+            name='review_approved_idx',
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='deleted at'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True), ('status', 'approved')), fields=['product', '-created_at'], name='review_approved_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='review',
+            constraint=models.UniqueConstraint(condition=models.Q(('deleted_at__isnull', True)), fields=('product', 'user'), name='unique_product_user_review', violation_error_message='You have already reviewed this product.'),
+        ),
+        migrations.AddField(
+            model_name='archivedreview',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_reviews', to='reviews.product', verbose_name='product'),
+        ),
+        migrations.AddField(
+            model_name='archivedreview',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_reviews', to=settings.AUTH_USER_MODEL, verbose_name='user'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedreview',
+            index=models.Index(fields=['product', '-created_at'], name='archived_review_product_idx'),
+        ),
+        # Replacing unique_product_user_review rebuilds reviews_review on
+        # SQLite, which drops the comment search triggers.
+        migrations.RunPython(reviews.search.install_comment_index, migrations.RunPython.noop),
+    ]
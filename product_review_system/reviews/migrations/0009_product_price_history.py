@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:36
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def seed_price_history(apps, schema_editor):
+    """Start each existing product's history with its current price."""
+    Product = apps.get_model('reviews', 'Product')
+    ProductPriceChange = apps.get_model('reviews', 'ProductPriceChange')
+    products = Product.objects.order_by('pk').values_list('pk', 'price', 'updated_at')
+    ProductPriceChange.objects.bulk_create(
+        (
+            ProductPriceChange(product_id=product_id, price=price, changed_at=updated_at)
+            for product_id, price, updated_at in products.iterator(chunk_size=1000)
+        ),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0008_review_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductPriceChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='price')),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='changed at')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_changes', to='reviews.product', verbose_name='product')),
+            ],
+            options={
+                'verbose_name': 'product price change',
+                'verbose_name_plural': 'product price changes',
+                'ordering': ['product', 'changed_at'],
+                'indexes': [models.Index(fields=['product', 'changed_at'], name='price_change_product_idx')],
+            },
+        ),
+        migrations.RunPython(seed_price_history, migrations.RunPython.noop),
+    ]
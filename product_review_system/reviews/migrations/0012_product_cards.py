@@ -0,0 +1,90 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:10
+
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+from rest_framework.renderers import JSONRenderer
+
+
+def render_product_cards(apps, schema_editor):
+    """
+    Render the card of each existing product, as ``ProductListSerializer``
+    would, from the same aggregates as ``ProductQuerySet.with_review_stats``.
+    """
+    Product = apps.get_model('reviews', 'Product')
+    ProductCard = apps.get_model('reviews', 'ProductCard')
+    DailyProductRating = apps.get_model('reviews', 'DailyProductRating')
+    db = schema_editor.connection.alias
+    products = Product.objects.using(db).order_by('pk')
+    if getattr(settings, 'REVIEW_SHARDS', None):
+        # Reviews live in other databases; the rollups include archived reviews.
+        stats = {
+            product_id: (count, total)
+            for product_id, count, total in DailyProductRating.objects.using(db).order_by()
+            .values_list('product_id').annotate(Sum('review_count'), Sum('rating_sum'))
+        }
+        rows = (
+            (product, *stats.get(product.pk, (0, 0)))
+            for product in products.iterator(chunk_size=1000)
+        )
+    else:
+        approved = Q(reviews__status='approved', reviews__deleted_at__isnull=True)
+        rows = (
+            (product, product._review_count, product._rating_sum)
+            for product in products.annotate(
+                _review_count=Count('reviews', filter=approved) + Coalesce('archived_ratings__review_count', 0),
+                _rating_sum=(
+                    Coalesce(Sum('reviews__rating', filter=approved), 0)
+                    + Coalesce('archived_ratings__rating_sum', 0)
+                ),
+            ).iterator(chunk_size=1000)
+        )
+    renderer = JSONRenderer()
+    ProductCard.objects.using(db).bulk_create(
+        (
+            ProductCard(
+                product_id=product.pk,
+                name=product.name,
+                created_at=product.created_at,
+                data=renderer.render({
+                    'id': product.pk,
+                    'name': product.name,
+                    'price': str(Decimal(product.price).quantize(Decimal('0.01'))),
+                    'average_rating': total / count if count else 0.0,
+                    'review_count': count,
+                }),
+            )
+            for product, count, total in rows
+        ),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0011_review_sharding'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductCard',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='card', serialize=False, to='reviews.product', verbose_name='product')),
+                ('name', models.CharField(max_length=255, verbose_name='name')),
+                ('created_at', models.DateTimeField(verbose_name='created at')),
+                ('data', models.BinaryField(verbose_name='data')),
+            ],
+            options={
+                'verbose_name': 'product card',
+                'verbose_name_plural': 'product cards',
+                'ordering': ['-created_at', '-product_id'],
+                'indexes': [models.Index(fields=['-created_at', '-product'], name='product_card_order_idx')],
+            },
+        ),
+        migrations.RunPython(render_product_cards, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:42
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0012_product_cards'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='review',
+            name='review_product_helpful_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='review',
+            name='review_pending_idx',
+        ),
+        migrations.AddIndex(
+            model_name='archivedreview',
+            index=models.Index(fields=['status', 'product', 'deleted_at'], name='archived_status_product_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['product', 'status', 'deleted_at', '-helpful_count', '-created_at'], name='review_product_helpful_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['product', 'status', 'deleted_at', 'created_at'], name='review_product_oldest_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['status', 'product', 'deleted_at'], name='review_status_product_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['status', 'deleted_at', 'created_at'], name='review_moderation_idx'),
+        ),
+    ]
@@ -1,10 +1,35 @@
 from django.db import models
-from django.db.models import Avg, F
+from django.db.models import Case, F, FloatField, OuterRef, Q, Subquery, Sum, When
+from django.db.models.functions import Cast, Coalesce
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+from .sharding import FanOut, next_review_id, review_databases, shard_for_product, sharding_enabled
+
 User = get_user_model()
 
+class ProductQuerySet(models.QuerySet):
+    def with_review_stats(self):
+        """
+        Annotate the rating aggregates read by average_rating and
+        review_count from the daily rating rollups, which count the live
+        approved reviews and the archived ones, instead of aggregating the
+        reviews themselves (which may also be in other databases).
+        """
+        rollups = DailyProductRating.objects.filter(product=OuterRef('pk')).order_by().values('product')
+        queryset = self.annotate(
+            _review_count=Coalesce(Subquery(rollups.annotate(total=Sum('review_count')).values('total')), 0),
+            _rating_sum=Coalesce(Subquery(rollups.annotate(total=Sum('rating_sum')).values('total')), 0),
+        )
+        return queryset.annotate(
+            _average_rating=Case(
+                When(_review_count=0, then=None),
+                default=Cast('_rating_sum', FloatField()) / F('_review_count'),
+                output_field=FloatField(),
+            ),
+        )
+
 class Product(models.Model):
     """Product model to store product information."""
     name = models.CharField(_('name'), max_length=255)
@@ -20,6 +45,8 @@ class Product(models.Model):
         verbose_name=_('created by')
     )
     
+    objects = ProductQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-created_at']
         verbose_name = _('product')
@@ -28,18 +55,184 @@ class Product(models.Model):
     def __str__(self):
         return self.name
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored price so only real changes are recorded in
+        # the price history.
+        instance._loaded_price = instance.__dict__.get('price')
+        return instance
+    
+    def _load_review_stats(self):
+        if '_review_count' not in self.__dict__:
+            self.__dict__.update(
+                Product.objects.with_review_stats()
+                .values('_review_count', '_average_rating')
+                .get(pk=self.pk)
+            )
+    
     @property
     def average_rating(self):
         """Calculate and return the average rating of the product."""
-        return self.reviews.aggregate(avg_rating=Avg('rating'))['avg_rating'] or 0
+        self._load_review_stats()
+        return self._average_rating or 0
     
     @property
     def review_count(self):
         """Return the total number of reviews for the product."""
-        return self.reviews.count()
+        self._load_review_stats()
+        return self._review_count
+
+class ProductPriceChange(models.Model):
+    """
+    Append-only price history of a product. A row is only written when the
+    price changes and holds the price in effect from ``changed_at`` until
+    the next row.
+    """
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='price_changes',
+        verbose_name=_('product')
+    )
+    price = models.DecimalField(_('price'), max_digits=10, decimal_places=2)
+    changed_at = models.DateTimeField(_('changed at'), default=timezone.now)
+    
+    class Meta:
+        ordering = ['product', 'changed_at']
+        verbose_name = _('product price change')
+        verbose_name_plural = _('product price changes')
+        indexes = [
+            models.Index(fields=['product', 'changed_at'], name='price_change_product_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.product_id}: {self.price} @ {self.changed_at}"
+
+class SimilarProduct(models.Model):
+    """
+    One of the top-K most similar products of a product, by cosine
+    similarity of their ratings from the same users. Built offline by the
+    build_similar_products command.
+    """
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='similar_products',
+        verbose_name=_('product')
+    )
+    rank = models.PositiveSmallIntegerField(_('rank'))
+    similar = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name=_('similar product')
+    )
+    score = models.FloatField(_('score'))
+    
+    class Meta:
+        ordering = ['product', 'rank']
+        verbose_name = _('similar product')
+        verbose_name_plural = _('similar products')
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'rank'], name='unique_similar_product_rank'),
+        ]
+    
+    def __str__(self):
+        return f"{self.product_id} #{self.rank}: {self.similar_id} ({self.score:.3f})"
+
+class SimilarityState(models.Model):
+    """
+    Fingerprint of a product's reviews when its similar products were last
+    built, so incremental runs can tell which products changed since.
+    """
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='similarity_state',
+        verbose_name=_('product')
+    )
+    fingerprint = models.CharField(_('fingerprint'), max_length=64)
+    built_at = models.DateTimeField(_('built at'), auto_now=True)
+    
+    class Meta:
+        verbose_name = _('similarity state')
+        verbose_name_plural = _('similarity states')
+    
+    def __str__(self):
+        return f"{self.product_id}: {self.fingerprint}"
+
+class ProductCard(models.Model):
+    """
+    A product's entry in the product list, rendered to JSON ahead of time
+    whenever the product or its reviews change (see ``reviews.cards``),
+    next to the columns the list is sorted and searched by.
+    """
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='card',
+        verbose_name=_('product')
+    )
+    name = models.CharField(_('name'), max_length=255)
+    created_at = models.DateTimeField(_('created at'))
+    data = models.BinaryField(_('data'))
+    
+    class Meta:
+        # Product.Meta.ordering, with the ID to break ties.
+        ordering = ['-created_at', '-product_id']
+        verbose_name = _('product card')
+        verbose_name_plural = _('product cards')
+        indexes = [
+            models.Index(fields=['-created_at', '-product'], name='product_card_order_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.product_id}: {self.name}"
+
+class ReviewQuerySet(models.QuerySet):
+    def approved(self):
+        """Reviews visible to the public."""
+        return self.filter(status=Review.Status.APPROVED)
+    
+    def for_product(self, product_id):
+        """Reviews of one product, read from that product's shard."""
+        return self.using(shard_for_product(product_id)).filter(product_id=product_id)
+    
+    def per_shard(self):
+        """Return this queryset bound to each review shard in turn."""
+        return [self.using(alias) for alias in review_databases()]
+    
+    def across_shards(self):
+        """Run this queryset on every shard, merging the results in order."""
+        if not sharding_enabled():
+            return self
+        return FanOut(self.per_shard())
+    
+    def select_related(self, *fields):
+        if sharding_enabled() and fields:
+            # Products and users live in the default database and cannot be
+            # joined from a shard; fetch them with a second query instead.
+            remote = [field for field in fields if field.split('__')[0] in ('product', 'user')]
+            local = [field for field in fields if field not in remote]
+            queryset = super().select_related(*local) if local else self
+            return queryset.prefetch_related(*remote) if remote else queryset
+        return super().select_related(*fields)
+
+class ReviewManager(models.Manager.from_queryset(ReviewQuerySet)):
+    """Default review manager; hides soft-deleted reviews."""
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
 
 class Review(models.Model):
     """Review model to store user reviews for products."""
+    class Status(models.TextChoices):
+        PENDING = 'pending', _('Pending')
+        APPROVED = 'approved', _('Approved')
+        REJECTED = 'rejected', _('Rejected')
+    
     RATING_CHOICES = [
         (1, '1 - Poor'),
         (2, '2 - Fair'),
@@ -48,15 +241,19 @@ class Review(models.Model):
         (5, '5 - Excellent'),
     ]
     
+    # Reviews may be stored in a shard without the product and user rows
+    # (see reviews.sharding), so these are not database-level constraints.
     product = models.ForeignKey(
         Product,
         on_delete=models.CASCADE,
+        db_constraint=False,
         related_name='reviews',
         verbose_name=_('product')
     )
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
+        db_constraint=False,
         related_name='reviews',
         verbose_name=_('user')
     )
@@ -66,16 +263,51 @@ class Review(models.Model):
         help_text=_('Rating from 1 (Poor) to 5 (Excellent)')
     )
     comment = models.TextField(_('comment'), blank=True)
+    helpful_count = models.PositiveIntegerField(
+        _('helpful count'),
+        default=0,
+        help_text=_('Helpful votes folded in from the vote counter shards')
+    )
+    status = models.CharField(
+        _('status'),
+        max_length=10,
+        choices=Status.choices,
+        default=Status.APPROVED,
+        help_text=_('Only approved reviews are shown publicly and counted in ratings')
+    )
     created_at = models.DateTimeField(_('created at'), auto_now_add=True)
     updated_at = models.DateTimeField(_('updated at'), auto_now=True)
+    deleted_at = models.DateTimeField(_('deleted at'), null=True, blank=True)
+    
+    objects = ReviewManager()
+    all_objects = ReviewQuerySet.as_manager()
     
     class Meta:
         ordering = ['-created_at']
         verbose_name = _('review')
         verbose_name_plural = _('reviews')
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='review_user_created_idx'),
+            models.Index(fields=['product', 'rating', 'created_at'], name='review_product_rating_idx'),
+            models.Index(
+                fields=['product', '-created_at'],
+                condition=Q(status='approved', deleted_at__isnull=True),
+                name='review_approved_idx'
+            ),
+            # The review list's other sort orders and the rollup rebuilds.
+            models.Index(
+                fields=['product', 'status', 'deleted_at', '-helpful_count', '-created_at'],
+                name='review_product_helpful_idx'
+            ),
+            models.Index(fields=['product', 'status', 'deleted_at', 'created_at'], name='review_product_oldest_idx'),
+            models.Index(fields=['status', 'product', 'deleted_at'], name='review_status_product_idx'),
+            # The moderation queue of every status, oldest first.
+            models.Index(fields=['status', 'deleted_at', 'created_at'], name='review_moderation_idx'),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['product', 'user'],
+                condition=Q(deleted_at__isnull=True),
                 name='unique_product_user_review',
                 violation_error_message=_('You have already reviewed this product.')
             ),
@@ -89,8 +321,193 @@ class Review(models.Model):
     def __str__(self):
         return f"{self.user.email}'s review for {self.product.name}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored rating, status and deletion so rollups can
+        # apply the delta on update.
+        instance._loaded_rating = instance.__dict__.get('rating')
+        instance._loaded_status = instance.__dict__.get('status')
+        instance._loaded_deleted_at = instance.__dict__.get('deleted_at')
+        return instance
+    
     def save(self, *args, **kwargs):
         """Override save to ensure only regular users can create reviews."""
-        if not hasattr(self, 'user') or not self.user.role == User.Role.REGULAR:
-            raise ValueError(_('Only regular users can create reviews.'))
+        # The author of an existing review cannot change, so only check the
+        # role on insert to avoid loading the user again on every update.
+        if self._state.adding:
+            if self.user_id is None or not self.user.role == User.Role.REGULAR:
+                raise ValueError(_('Only regular users can create reviews.'))
+            if sharding_enabled():
+                if self.pk is None:
+                    self.pk = next_review_id()
+                # Manager.create() passes the default database; a review
+                # always belongs in its product's shard.
+                kwargs['using'] = shard_for_product(self.product_id)
         super().save(*args, **kwargs)
+
+class DailyProductRating(models.Model):
+    """Per-product, per-day rollup of review counts and rating sums."""
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='daily_ratings',
+        verbose_name=_('product')
+    )
+    day = models.DateField(_('day'))
+    review_count = models.IntegerField(_('review count'), default=0)
+    rating_sum = models.IntegerField(_('rating sum'), default=0)
+    
+    class Meta:
+        ordering = ['product', 'day']
+        verbose_name = _('daily product rating')
+        verbose_name_plural = _('daily product ratings')
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'day'], name='unique_product_day_rating'),
+        ]
+    
+    def __str__(self):
+        return f"{self.product_id} @ {self.day}: {self.review_count} reviews"
+
+class ReviewVote(models.Model):
+    """A user's "this review was helpful" vote."""
+    review = models.ForeignKey(
+        Review,
+        on_delete=models.CASCADE,
+        related_name='votes',
+        verbose_name=_('review')
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        db_constraint=False,
+        related_name='review_votes',
+        verbose_name=_('user')
+    )
+    created_at = models.DateTimeField(_('created at'), auto_now_add=True)
+    
+    class Meta:
+        verbose_name = _('review vote')
+        verbose_name_plural = _('review votes')
+        constraints = [
+            models.UniqueConstraint(
+                fields=['review', 'user'],
+                name='unique_review_user_vote',
+                violation_error_message=_('You have already voted for this review.')
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id} found review {self.review_id} helpful"
+
+class HelpfulCounterShard(models.Model):
+    """
+    One of several counter rows holding helpful-vote deltas for a review that
+    have not been folded into ``Review.helpful_count`` yet.
+    
+    Votes increment a random shard, so concurrent votes on a popular review
+    do not all wait on the same row lock.
+    """
+    review = models.ForeignKey(
+        Review,
+        on_delete=models.CASCADE,
+        related_name='helpful_shards',
+        verbose_name=_('review')
+    )
+    shard = models.PositiveSmallIntegerField(_('shard'))
+    delta = models.IntegerField(_('delta'), default=0)
+    
+    class Meta:
+        verbose_name = _('helpful counter shard')
+        verbose_name_plural = _('helpful counter shards')
+        constraints = [
+            models.UniqueConstraint(fields=['review', 'shard'], name='unique_review_counter_shard'),
+        ]
+    
+    def __str__(self):
+        return f"review {self.review_id} shard {self.shard}: {self.delta:+d}"
+
+class ArchivedReview(models.Model):
+    """
+    Cold-storage copy of a review moved out of the Review table by the
+    archive_reviews command. Keeps the original review ID.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='archived_reviews',
+        verbose_name=_('product')
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='archived_reviews',
+        verbose_name=_('user')
+    )
+    rating = models.PositiveSmallIntegerField(_('rating'), choices=Review.RATING_CHOICES)
+    comment = models.TextField(_('comment'), blank=True)
+    helpful_count = models.PositiveIntegerField(_('helpful count'), default=0)
+    status = models.CharField(_('status'), max_length=10, choices=Review.Status.choices)
+    created_at = models.DateTimeField(_('created at'))
+    updated_at = models.DateTimeField(_('updated at'))
+    deleted_at = models.DateTimeField(_('deleted at'), null=True, blank=True)
+    archived_at = models.DateTimeField(_('archived at'), auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = _('archived review')
+        verbose_name_plural = _('archived reviews')
+        indexes = [
+            models.Index(fields=['product', '-created_at'], name='archived_review_product_idx'),
+            models.Index(fields=['status', 'product', 'deleted_at'], name='archived_status_product_idx'),
+        ]
+    
+    def __str__(self):
+        return f"archived review {self.pk} for product {self.product_id}"
+
+class IdBlock(models.Model):
+    """
+    Next free ID of a sharded table; processes reserve blocks of IDs from it
+    so rows created in different shards never share an ID.
+    """
+    name = models.CharField(_('name'), max_length=50, primary_key=True)
+    next_id = models.BigIntegerField(_('next ID'))
+    
+    class Meta:
+        verbose_name = _('ID block')
+        verbose_name_plural = _('ID blocks')
+    
+    def __str__(self):
+        return f"{self.name}: {self.next_id}"
+
+class ArchivedProductRating(models.Model):
+    """
+    Rating totals of a product's archived reviews, added to the live
+    aggregates so archiving does not change a product's ratings.
+    """
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='archived_ratings',
+        verbose_name=_('product')
+    )
+    rating_1 = models.PositiveIntegerField(default=0)
+    rating_2 = models.PositiveIntegerField(default=0)
+    rating_3 = models.PositiveIntegerField(default=0)
+    rating_4 = models.PositiveIntegerField(default=0)
+    rating_5 = models.PositiveIntegerField(default=0)
+    review_count = models.PositiveIntegerField(_('review count'), default=0)
+    rating_sum = models.PositiveIntegerField(_('rating sum'), default=0)
+    
+    class Meta:
+        verbose_name = _('archived product rating')
+        verbose_name_plural = _('archived product ratings')
+    
+    def __str__(self):
+        return f"{self.product_id}: {self.review_count} archived reviews"
+    
+    @property
+    def distribution(self):
+        return {i: getattr(self, f'rating_{i}') for i in range(1, 6)}
@@ -0,0 +1,49 @@
+"""
+Set-based review moderation.
+
+Each action runs as one UPDATE over the selected reviews; delete soft-deletes
+them, like the review API, so ``archive_reviews`` moves them to the archive.
+The per-review rollup and stream handlers are suppressed and the daily rating
+rollups of the affected products are rebuilt once for the whole batch
+instead.
+"""
+from functools import partial
+
+from django.db import transaction
+from django.utils import timezone
+
+from .cards import refresh_product_cards_on_commit
+from .events import broker
+from .models import Review
+from .pages import invalidate_product_page
+from .rollups import rebuild_daily_ratings
+from .signals import suppress_review_signals
+
+ACTION_STATUSES = {
+    'approve': Review.Status.APPROVED,
+    'reject': Review.Status.REJECTED,
+}
+ACTIONS = tuple(ACTION_STATUSES) + ('delete',)
+
+
+def moderate_reviews(queryset, action):
+    """
+    Apply ``action`` to every review in ``queryset`` (which must read from a
+    single shard, see ``ReviewQuerySet.per_shard``); return how many were
+    affected.
+    """
+    if action not in ACTIONS:
+        raise ValueError(f'Unknown moderation action {action!r}.')
+    with transaction.atomic(using=queryset.db), suppress_review_signals():
+        product_ids = list(queryset.order_by().values_list('product_id', flat=True).distinct())
+        if action == 'delete':
+            count = queryset.update(deleted_at=timezone.now())
+        else:
+            count = queryset.update(status=ACTION_STATUSES[action])
+        if product_ids:
+            rebuild_daily_ratings(product_ids)
+        for product_id in product_ids:
+            transaction.on_commit(partial(broker.publish, product_id), using=queryset.db)
+            transaction.on_commit(partial(invalidate_product_page, product_id), using=queryset.db)
+        refresh_product_cards_on_commit(product_ids, using=queryset.db)
+    return count
@@ -0,0 +1,91 @@
+"""
+The product page bundle served by ``products/<id>/page/``.
+
+``product_page`` builds what every viewer of a product page sees (the
+product, its rating statistics and the first page of reviews) from four
+queries and keeps it in the cache for ``PRODUCT_PAGE_CACHE_SECONDS``.
+Review and product writes, price syncs and helpful-vote folds drop the
+cached copy through ``invalidate_product_page``; the view adds the viewer's
+own state on top. Invalidation only reaches the processes sharing the cache
+backend, which is why the prod profile keeps the cache in the database.
+"""
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.urls import reverse
+from rest_framework.settings import api_settings
+
+from .models import Product, Review
+from .stats import product_stats, rating_counts
+
+
+def _cache_key(product_id):
+    return f'product-page:{product_id}'
+
+
+def invalidate_product_page(product_id):
+    """Drop the cached page of a product after one of its writes."""
+    cache.delete(_cache_key(product_id))
+
+
+def invalidate_product_pages_on_commit(product_ids, using=DEFAULT_DB_ALIAS):
+    """Drop the cached pages of ``product_ids`` once the current transaction of ``using`` commits."""
+    for product_id in set(product_ids):
+        transaction.on_commit(partial(invalidate_product_page, product_id), using=using)
+
+
+def product_page(product_id, request):
+    """
+    Return the shared part of a product's page, or None if there is no such
+    product.
+    """
+    # Imported here: the serializers import moderation, which imports this module.
+    from .serializers import ProductDetailSerializer, ReviewSerializer
+
+    key = _cache_key(product_id)
+    page = cache.get(key)
+    if page is not None:
+        return page
+    product = Product.objects.select_related('created_by').filter(pk=product_id).first()
+    if product is None:
+        return None
+
+    live, archived = rating_counts(product_id)
+    distribution = {rating: live[rating] + archived[rating] for rating in live}
+    stats = product_stats(product, distribution)
+    total = stats['total_reviews']
+    rating_sum = sum(rating * count for rating, count in distribution.items())
+    # Fill the aggregates the serializer reads instead of querying them again.
+    product.__dict__.update(_review_count=total, _average_rating=rating_sum / total if total else None)
+
+    # The first page of ReviewListView: newest approved live reviews.
+    page_size = api_settings.PAGE_SIZE
+    reviews = list(
+        Review.objects.approved().for_product(product_id)
+        .select_related('user')
+        .order_by('-created_at')[:page_size]
+    )
+    review_count = sum(live.values())
+    next_url = None
+    if review_count > page_size:
+        list_url = reverse('reviews:review-list', kwargs={'product_id': product_id})
+        next_url = request.build_absolute_uri(f'{list_url}?page=2')
+
+    page = {
+        'product': ProductDetailSerializer(product).data,
+        'stats': {
+            'total_reviews': stats['total_reviews'],
+            'average_rating': stats['average_rating'],
+            'rating_distribution': stats['rating_distribution'],
+        },
+        'reviews': {
+            'count': review_count,
+            'next': next_url,
+            'previous': None,
+            'results': ReviewSerializer(reviews, many=True).data,
+        },
+    }
+    cache.set(key, page, getattr(settings, 'PRODUCT_PAGE_CACHE_SECONDS', 60))
+    return page
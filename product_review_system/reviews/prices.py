@@ -0,0 +1,136 @@
+"""
+Product price history.
+
+Saving a product records a ProductPriceChange row when its price changed
+(see ``signals.record_price_change``). Bulk imports and the catalog price
+sync go through ``update_prices``, which compares against the stored prices
+and only updates and records the products whose price actually changed,
+with one UPDATE and one INSERT per batch.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from .cards import refresh_product_cards_on_commit
+from .models import Product, ProductPriceChange
+from .pages import invalidate_product_pages_on_commit
+
+CENT = Decimal('0.01')
+
+
+def as_price(value):
+    """Normalize a price to the two-decimal ``Decimal`` stored in the database."""
+    return Decimal(str(value)).quantize(CENT)
+
+
+def last_recorded_price(product_id):
+    """Return the latest price in a product's history, or ``None``."""
+    return (
+        ProductPriceChange.objects.filter(product_id=product_id)
+        .order_by('-changed_at')
+        .values_list('price', flat=True)
+        .first()
+    )
+
+
+def update_prices(prices, batch_size=1000):
+    """
+    Apply a ``{product_id: price}`` mapping.
+
+    Return ``(changed, missing)``: the number of products whose price changed
+    and the IDs that do not exist.
+    """
+    items = [(product_id, as_price(price)) for product_id, price in prices.items()]
+    changed_total = 0
+    missing = []
+    for start in range(0, len(items), batch_size):
+        batch = dict(items[start:start + batch_size])
+        with transaction.atomic():
+            now = timezone.now()
+            products = (
+                Product.objects.filter(pk__in=batch)
+                .select_for_update()
+                .only('pk', 'price', 'updated_at')
+                .in_bulk()
+            )
+            missing.extend(product_id for product_id in batch if product_id not in products)
+            changed = []
+            for product in products.values():
+                if product.price != batch[product.pk]:
+                    product.price = batch[product.pk]
+                    product.updated_at = now
+                    changed.append(product)
+            if changed:
+                Product.objects.bulk_update(changed, ['price', 'updated_at'])
+                ProductPriceChange.objects.bulk_create(
+                    ProductPriceChange(product_id=product.pk, price=product.price, changed_at=now)
+                    for product in changed
+                )
+                refresh_product_cards_on_commit(product.pk for product in changed)
+                invalidate_product_pages_on_commit(product.pk for product in changed)
+        changed_total += len(changed)
+    return changed_total, missing
+
+
+def _day_bounds(start, end):
+    tz = timezone.get_current_timezone()
+    return (
+        timezone.make_aware(datetime.combine(start, time.min), tz),
+        timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min), tz),
+    )
+
+
+def price_history(product_id, start, end, max_points):
+    """
+    Return the price series of a product between the ``start`` and ``end``
+    dates (inclusive), starting with the price in effect at ``start``.
+
+    Each point has the price at ``at`` and the lowest and highest price
+    since the previous point. If there are more than ``max_points`` changes,
+    the range is split into ``max_points`` equal buckets and each bucket is
+    reported by its closing price.
+    """
+    range_start, range_end = _day_bounds(start, end)
+    changes = ProductPriceChange.objects.filter(product_id=product_id)
+    opening = (
+        changes.filter(changed_at__lt=range_start)
+        .order_by('-changed_at')
+        .values_list('price', flat=True)
+        .first()
+    )
+    points = []
+    if opening is not None:
+        points.append((range_start, opening))
+    points.extend(
+        changes.filter(changed_at__gte=range_start, changed_at__lt=range_end)
+        .order_by('changed_at')
+        .values_list('changed_at', 'price')
+    )
+
+    if len(points) <= max_points:
+        return [
+            {'at': at, 'price': price, 'min_price': price, 'max_price': price}
+            for at, price in points
+        ]
+
+    step = (range_end - range_start) / max_points
+    buckets = {}
+    previous = None
+    for at, price in points:
+        index = min(int((at - range_start) / step), max_points - 1)
+        bucket = buckets.get(index)
+        if bucket is None:
+            # The price carried into the bucket also counts towards its range.
+            carried = [price] if previous is None else [price, previous]
+            bucket = buckets[index] = {'price': price, 'min_price': min(carried), 'max_price': max(carried)}
+        bucket['price'] = price
+        bucket['min_price'] = min(bucket['min_price'], price)
+        bucket['max_price'] = max(bucket['max_price'], price)
+        previous = price
+    range_end = min(range_end, timezone.now())
+    return [
+        {'at': min(range_start + step * (index + 1), range_end), **bucket}
+        for index, bucket in sorted(buckets.items())
+    ]
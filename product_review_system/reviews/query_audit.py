@@ -0,0 +1,404 @@
+"""
+Query plan audit of the API endpoints.
+
+``audit_endpoints`` sends requests to every endpoint of the reviews and users
+URLconfs (``AUDIT_REQUESTS`` lists the variants worth checking: searches,
+sort orders, writes), records the SQL each request runs and asks the
+database how it would execute it: ``EXPLAIN QUERY PLAN`` on SQLite,
+``EXPLAIN`` on PostgreSQL and MySQL. Plans that read a whole table, sort
+through a temporary B-tree or filesort, or make SQLite build an automatic
+index are reported, with an index that would serve the query when one can
+be derived from the columns it filters, joins and orders on.
+
+The audit_queries command runs it on a throwaway database filled by
+``seed_audit_data`` and compares the findings with a committed baseline.
+"""
+import hashlib
+import re
+from contextlib import ExitStack
+from decimal import Decimal
+
+from django.apps import apps
+from django.db import connections, transaction
+from django.urls import get_resolver, reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from users.models import User
+from .archive import archive_batch, archive_candidates
+from .models import Product, Review, SimilarProduct
+from .votes import cast_vote
+
+AUDIT_PASSWORD = 'Audit-pass-2468'
+AUDITED_URLCONFS = ('reviews.urls', 'users.urls')
+REVIEW = {'pk': '{review_id}'}
+
+# Requests sent to each endpoint, by URL name; endpoints not listed get one
+# GET. ``user`` is who sends it (``user``, ``author``, ``admin`` or None for
+# anonymous), ``kwargs`` override the URL arguments (``product_id`` and
+# ``pk`` default to the seeded product) and strings in ``kwargs``,
+# ``query`` and ``data`` are formatted with the values seed_audit_data
+# returns.
+AUDIT_REQUESTS = {
+    'reviews:product-list': [
+        {'user': None},
+        {'user': None, 'query': 'search=phone'},
+        {'method': 'post', 'user': 'admin', 'data': {'name': 'Audit product', 'description': 'New', 'price': '9.99'}},
+    ],
+    'reviews:product-batch': [{'query': 'ids={product_ids}'}],
+    # The anonymous request builds the cached page; the second adds the viewer's review.
+    'reviews:product-page': [{'user': None}, {}],
+    'reviews:product-detail': [
+        {'user': None},
+        {'method': 'patch', 'user': 'admin', 'data': {'price': '12.50'}},
+    ],
+    'reviews:review-list': [
+        {'user': None},
+        {'user': None, 'query': 'sort=helpful'},
+        {'user': None, 'query': 'sort=lowest&rating=2'},
+        {'user': None, 'query': 'min_rating=3&sort=oldest'},
+        {'user': None, 'query': 'q=battery'},
+        {'user': None, 'query': 'include_archived=true'},
+        {'method': 'post', 'data': {'rating': 4, 'comment': 'Audit review'}},
+    ],
+    'reviews:review-detail': [
+        {'kwargs': REVIEW},
+        {'method': 'patch', 'user': 'author', 'kwargs': REVIEW, 'data': {'rating': 3}},
+    ],
+    'reviews:review-helpful': [
+        {'method': 'post', 'kwargs': REVIEW},
+        {'method': 'delete', 'kwargs': REVIEW},
+    ],
+    'reviews:product-stats-trend': [{'query': 'bucket=week'}],
+    # Server-sent event streams never finish.
+    'reviews:product-stats-stream': [],
+    'reviews:products-stats-stream': [],
+    'reviews:moderation-queue': [
+        {'user': 'admin'},
+        {'user': 'admin', 'query': 'status=rejected'},
+    ],
+    'reviews:moderation-bulk': [
+        {'method': 'post', 'user': 'admin', 'data': {'action': 'approve', 'ids': '{pending_ids}'}},
+    ],
+    'users:register': [
+        {'method': 'post', 'user': None, 'data': {
+            'email': 'new@audit.local', 'password': AUDIT_PASSWORD, 'password2': AUDIT_PASSWORD,
+            'first_name': 'New', 'last_name': 'User',
+        }},
+    ],
+    'users:token_obtain_pair': [
+        {'method': 'post', 'user': None, 'data': {'email': '{email}', 'password': AUDIT_PASSWORD}},
+    ],
+    'users:token_refresh': [{'method': 'post', 'user': None, 'data': {'refresh': '{refresh}'}}],
+    'users:logout': [{'method': 'post', 'data': {'refresh': '{logout_refresh}'}}],
+    'users:profile-reviews-lookup': [{'query': 'product_ids={product_ids}'}],
+}
+
+# Plan lines worth reporting, by database vendor. ``table`` is the table or
+# alias read; findings without one concern the query's main table.
+PLAN_PATTERNS = {
+    'sqlite': [
+        ('scan', re.compile(r'^SCAN (?:TABLE )?(?P<table>\w+)(?: AS (?P<alias>\w+))?$')),
+        ('automatic-index', re.compile(r'^SEARCH (?:TABLE )?(?P<table>\w+).* USING AUTOMATIC ')),
+        ('temp-btree', re.compile(r'^USE TEMP B-TREE FOR ')),
+    ],
+    'postgresql': [
+        ('scan', re.compile(r'Seq Scan on (?P<table>\w+)(?: (?P<alias>\w+))?')),
+        ('filesort', re.compile(r'^\s*(?:->\s*)?(?:Incremental )?Sort\s')),
+    ],
+    'mysql': [
+        ('scan', re.compile(r'\btable=(?P<table>\w+) .*\btype=ALL\b')),
+        ('filesort', re.compile(r'\btable=(?P<table>\w+) .*Using filesort')),
+        ('temporary', re.compile(r'\btable=(?P<table>\w+) .*Using temporary')),
+    ],
+}
+SORT_KINDS = {'temp-btree', 'filesort', 'temporary'}
+PLANNED_STATEMENTS = ('SELECT', 'UPDATE', 'DELETE', 'WITH')
+NAME = r'[`"]?(\w+)[`"]?'
+
+
+def seed_audit_data(products=20, authors=8):
+    """
+    Fill an empty database with a small catalogue that gives every endpoint
+    something to read; return the users and values AUDIT_REQUESTS refer to.
+    """
+    admin = User.objects.create_superuser(email='admin@audit.local', password=AUDIT_PASSWORD)
+    user = User.objects.create_user(email='user@audit.local', password=AUDIT_PASSWORD)
+    reviewers = [User.objects.create_user(email=f'author{index}@audit.local') for index in range(authors)]
+    names = ('Phone', 'Laptop', 'Headphones', 'Camera')
+    catalogue = [
+        Product.objects.create(
+            name=f'{names[index % len(names)]} {index}',
+            description='Seeded for the query audit',
+            price=Decimal(10 + index),
+            created_by=admin
+        )
+        for index in range(products)
+    ]
+    statuses = [Review.Status.APPROVED] * 3 + [Review.Status.PENDING, Review.Status.REJECTED]
+    comments = ('Great battery life', 'Stopped working after a week', 'Does what it says')
+    for index, product in enumerate(catalogue):
+        for offset, author in enumerate(reviewers):
+            review = Review.objects.create(
+                product=product,
+                user=author,
+                rating=1 + (index + offset) % 5,
+                comment=comments[(index + offset) % len(comments)],
+                status=statuses[(index + offset) % len(statuses)]
+            )
+            if review.status == Review.Status.APPROVED and offset % 2:
+                cast_vote(review.pk, user.pk, using=review._state.db)
+        product.price += 1
+        product.save()
+
+    # Some reviews in the archive, for the include_archived and stats reads.
+    for queryset in Review.all_objects.filter(product__in=catalogue[1::3], user=reviewers[-1]).per_shard():
+        queryset.update(deleted_at=timezone.now())
+    for queryset in archive_candidates().per_shard():
+        archive_batch(queryset)
+
+    product = catalogue[0]
+    SimilarProduct.objects.bulk_create(
+        SimilarProduct(product=product, rank=rank, similar=similar, score=1 / rank)
+        for rank, similar in enumerate(catalogue[1:6], start=1)
+    )
+    review = Review.objects.for_product(product.pk).approved().exclude(user=reviewers[-1]).first()
+    pending = Review.objects.filter(status=Review.Status.PENDING).across_shards()
+    return {
+        'users': {'user': user, 'author': review.user, 'admin': admin},
+        'values': {
+            'product_id': product.pk,
+            'review_id': review.pk,
+            'product_ids': ','.join(str(item.pk) for item in catalogue[:10]),
+            'pending_ids': [item.pk for item in pending[:5]],
+            'email': user.email,
+            'refresh': str(RefreshToken.for_user(user)),
+            'logout_refresh': str(RefreshToken.for_user(user)),
+        },
+    }
+
+
+def _fill(value, values):
+    if isinstance(value, dict):
+        return {key: _fill(item, values) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_fill(item, values) for item in value]
+    if isinstance(value, str):
+        # A lone placeholder keeps the type of its value, e.g. a list of IDs.
+        match = re.fullmatch(r'\{(\w+)\}', value)
+        return values[match.group(1)] if match else value.format(**values)
+    return value
+
+
+def audited_endpoints():
+    """Return ``(url_name, converter_names)`` for every audited endpoint."""
+    endpoints = []
+    for urlconf in AUDITED_URLCONFS:
+        resolver = get_resolver(urlconf)
+        namespace = resolver.urlconf_module.app_name
+        for pattern in resolver.url_patterns:
+            endpoints.append((f'{namespace}:{pattern.name}', list(pattern.pattern.converters)))
+    return endpoints
+
+
+def explain(alias, sql, params):
+    """Return the plan of ``sql`` on database ``alias`` as lines of text."""
+    connection = connections[alias]
+    with transaction.atomic(using=alias), connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return [row[-1] for row in cursor.fetchall()]
+        if connection.vendor == 'postgresql':
+            # The seeded tables are small enough for a sequential scan or a
+            # sort to win anyway; only report the ones no index can avoid.
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('SET LOCAL enable_sort = off')
+            cursor.execute('EXPLAIN ' + sql, params)
+            return [row[0] for row in cursor.fetchall()]
+        cursor.execute('EXPLAIN ' + sql, params)
+        columns = [column[0].lower() for column in cursor.description]
+        return [
+            ' '.join(f'{name}={value}' for name, value in zip(columns, row) if value is not None)
+            for row in cursor.fetchall()
+        ]
+
+
+def _tables(sql):
+    """Map the tables and aliases read by ``sql`` to table names."""
+    tables = {}
+    for table, alias in re.findall(rf'(?:FROM|JOIN) {NAME}(?: (?:AS )?[`"]?([A-Z]\d+)\b)?', sql):
+        tables.setdefault(table, table)
+        if alias:
+            tables[alias] = table
+    return tables
+
+
+def _models_by_table():
+    return {model._meta.db_table: model for model in apps.get_models()}
+
+
+def _existing_indexes(model):
+    indexed = [[model._meta.pk.name]]
+    indexed += [[field.name] for field in model._meta.concrete_fields if field.db_index or field.unique]
+    indexed += [list(fields) for fields in model._meta.unique_together]
+    for index in model._meta.indexes:
+        indexed.append([field.lstrip('-') for field in index.fields])
+    for constraint in model._meta.constraints:
+        indexed.append(list(getattr(constraint, 'fields', ())))
+    return [fields for fields in indexed if fields]
+
+
+def _clause(sql, keyword):
+    # The last clause wins: it belongs to the outermost query.
+    if keyword not in sql:
+        return ''
+    return re.split(r' ORDER BY | HAVING | LIMIT | OFFSET |\)', sql.rsplit(keyword, 1)[1])[0]
+
+
+def _propose_index(sql, detail, kind, qualifier, model, joined):
+    """
+    Return ``(index, note)``: the fields of an index serving the reads of
+    ``qualifier`` in ``sql`` (equality filters, join columns when the table
+    is read inside a join, then the grouping, the ordering or the first
+    range column), or a note on why there is none.
+    """
+    columns = {field.column: field.name for field in model._meta.concrete_fields}
+    column = rf'[`"]{re.escape(qualifier)}[`"]\.{NAME}'
+    candidates = (
+        re.findall(rf'{column} = %s', sql)
+        + re.findall(rf'{column} IN \(', sql)
+        + (re.findall(rf'{column} = [`"]\w+[`"]\.', sql) + re.findall(rf'= {column}', sql) if joined else [])
+        + re.findall(rf'{column} IS NULL', sql)
+    )
+    if 'GROUP BY' in detail:
+        grouped = re.findall(column, _clause(sql, ' GROUP BY '))
+        if model._meta.pk.column in grouped:
+            return None, 'grouped by primary key over a join; only a stored aggregate avoids the sort'
+        candidates += grouped
+    elif 'ORDER BY' in sql and kind != 'automatic-index':
+        candidates += [
+            ('-' if direction == 'DESC' else '') + name
+            for name, direction in re.findall(rf'{column}(?: (ASC|DESC))?', _clause(sql, ' ORDER BY '))
+        ]
+    else:
+        candidates += re.findall(rf'{column} (?:<|>|BETWEEN )', sql)[:1]
+
+    fields = []
+    for candidate in candidates:
+        field = columns.get(candidate.lstrip('-'))
+        if field and field not in [name.lstrip('-') for name in fields]:
+            fields.append(('-' if candidate.startswith('-') else '') + field)
+
+    if not fields:
+        if re.search(rf'{column} LIKE ', sql):
+            return None, 'LIKE with a leading wildcard cannot use a B-tree index; consider a full-text index'
+        return None, 'no filter, grouping or ordering an index could serve'
+    plain = [name.lstrip('-') for name in fields]
+    if plain[0] == model._meta.pk.name:
+        return None, 'rows are read by primary key; the sort is over the few rows found'
+    for existing in _existing_indexes(model):
+        if existing[:len(plain)] == plain:
+            return None, f'an index on {", ".join(existing)} exists but the planner did not use it'
+    digest = hashlib.md5(','.join(fields).encode()).hexdigest()[:6]
+    name = f'{model._meta.model_name[:8]}_{plain[0][:10]}_{digest}_idx'
+    return {'model': model.__name__, 'fields': fields, 'name': name}, None
+
+
+def analyze_plan(vendor, sql, plan):
+    """Return the findings in the plan ``plan`` of ``sql``."""
+    tables = _tables(sql)
+    main = next(iter(tables.values()), None)
+    models = _models_by_table()
+    findings = []
+    for line in plan:
+        for kind, pattern in PLAN_PATTERNS[vendor]:
+            match = pattern.search(line)
+            if not match:
+                continue
+            groups = match.groupdict()
+            qualifier = groups.get('alias') or groups.get('table') or main
+            table = tables.get(qualifier, qualifier)
+            model = models.get(table)
+            if model is None:
+                # Subqueries, compound selects and full-text tables.
+                continue
+            if kind in SORT_KINDS and qualifier == main:
+                # Django only aliases the main table in subqueries.
+                qualifier = next((alias for alias, name in tables.items() if name == main), main)
+            joined = kind == 'scan' and qualifier != next(iter(tables))
+            index, note = _propose_index(sql, line, kind, qualifier, model, joined)
+            findings.append({
+                'kind': kind,
+                'table': table,
+                'detail': line.strip(),
+                'sql': sql,
+                'index': index,
+                'note': note,
+            })
+    return findings
+
+
+def finding_key(endpoint, finding):
+    """Identify a finding in the baseline independently of the seeded IDs."""
+    key = f"{endpoint} {finding['kind']} {finding['table']}"
+    if finding['index']:
+        key += f" [{', '.join(finding['index']['fields'])}]"
+    return key
+
+
+def audit_endpoints(context):
+    """
+    Send the audit requests and explain the queries they run.
+
+    Return one result per request: the endpoint, the request line, the
+    response status, the number of distinct queries and their findings.
+    """
+    results = []
+    for endpoint, converters in audited_endpoints():
+        for spec in AUDIT_REQUESTS.get(endpoint, [{}]):
+            spec = _fill(spec, context['values'])
+            kwargs = {name: context['values']['product_id'] for name in converters}
+            kwargs.update({name: int(value) for name, value in spec.get('kwargs', {}).items()})
+            url = reverse(endpoint, kwargs=kwargs)
+            if spec.get('query'):
+                url += '?' + spec['query']
+
+            client = APIClient()
+            role = spec.get('user', 'user')
+            if role:
+                client.force_authenticate(context['users'][role])
+            method = spec.get('method', 'get')
+            queries = []
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(_recorder(alias, queries)))
+                if 'data' in spec:
+                    response = getattr(client, method)(url, spec['data'], format='json')
+                else:
+                    response = getattr(client, method)(url)
+
+            findings = []
+            seen = set()
+            for alias, sql, params in queries:
+                if sql in seen:
+                    continue
+                seen.add(sql)
+                vendor = connections[alias].vendor
+                findings += analyze_plan(vendor, sql, explain(alias, sql, params))
+            results.append({
+                'endpoint': endpoint,
+                'request': f'{method.upper()} {url}',
+                'status': response.status_code,
+                'queries': len(seen),
+                'findings': findings,
+            })
+    return results
+
+
+def _recorder(alias, queries):
+    def record(execute, sql, params, many, context):
+        if not many and sql.lstrip().upper().startswith(PLANNED_STATEMENTS):
+            queries.append((alias, sql, params))
+        return execute(sql, params, many, context)
+    return record
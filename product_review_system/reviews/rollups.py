@@ -0,0 +1,81 @@
+"""
+Maintenance of the DailyProductRating rollup table.
+
+Only approved, not soft-deleted reviews are counted, including those moved
+to the ArchivedReview table. Review writes apply their delta to the
+row for the day the review was created; ``rebuild_daily_ratings`` recomputes rows from the Review table for
+backfills and to repair drift caused by writes that bypass model signals
+(``QuerySet.update``/``delete``, raw SQL).
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import ArchivedReview, DailyProductRating, Review
+
+
+def review_day(review):
+    """Return the rollup day a review belongs to."""
+    return timezone.localdate(review.created_at)
+
+
+def apply_rating_delta(product_id, day, count_delta, rating_delta):
+    """Add the given deltas to a product's rollup row for ``day``."""
+    if not count_delta and not rating_delta:
+        return
+    rows = DailyProductRating.objects.filter(product_id=product_id, day=day)
+    with transaction.atomic():
+        updated = rows.update(
+            review_count=F('review_count') + count_delta,
+            rating_sum=F('rating_sum') + rating_delta,
+        )
+        if updated:
+            return
+        try:
+            with transaction.atomic():
+                DailyProductRating.objects.create(
+                    product_id=product_id,
+                    day=day,
+                    review_count=count_delta,
+                    rating_sum=rating_delta,
+                )
+        except IntegrityError:
+            # A concurrent writer created the row first.
+            rows.update(
+                review_count=F('review_count') + count_delta,
+                rating_sum=F('rating_sum') + rating_delta,
+            )
+
+
+def daily_totals(queryset):
+    """Group reviews into ``(product_id, day, review_count, rating_sum)`` rows."""
+    return (
+        queryset.annotate(day=TruncDate('created_at'))
+        .order_by()
+        .values_list('product_id', 'day')
+        .annotate(review_count=Count('id'), rating_sum=Sum('rating'))
+    )
+
+
+def rebuild_daily_ratings(product_ids, batch_size=1000):
+    """Recompute the rollup rows of the given products from their approved reviews."""
+    totals = {}
+    live = Review.objects.approved().filter(product_id__in=product_ids).per_shard()
+    archived = ArchivedReview.objects.filter(
+        product_id__in=product_ids, status=Review.Status.APPROVED, deleted_at__isnull=True
+    )
+    for queryset in (*live, archived):
+        for product_id, day, review_count, rating_sum in daily_totals(queryset).iterator():
+            count, total = totals.get((product_id, day), (0, 0))
+            totals[product_id, day] = (count + review_count, total + rating_sum)
+    
+    with transaction.atomic():
+        DailyProductRating.objects.filter(product_id__in=product_ids).delete()
+        DailyProductRating.objects.bulk_create(
+            (
+                DailyProductRating(product_id=product_id, day=day, review_count=count, rating_sum=total)
+                for (product_id, day), (count, total) in totals.items()
+            ),
+            batch_size=batch_size,
+        )
@@ -0,0 +1,95 @@
+"""
+Full-text search over review comments.
+
+SQLite keeps an FTS5 index (``reviews_review_fts``) in sync with
+``reviews_review`` through triggers; PostgreSQL uses a GIN index on
+``to_tsvector('english', comment)``. Other backends fall back to a
+case-insensitive substring match.
+
+Migrations that make SQLite rebuild ``reviews_review`` drop its triggers, so
+they must run ``install_comment_index`` again afterwards.
+"""
+from django.db import connections
+from django.db.models import BooleanField
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'reviews_review_fts'
+
+SQLITE_INSTALL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    "comment, content='reviews_review', content_rowid='id')",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+    f"CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON reviews_review BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, comment) VALUES (new.id, new.comment); END",
+    f"CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON reviews_review BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, comment) VALUES ('delete', old.id, old.comment); END",
+    f"CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF comment ON reviews_review BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, comment) VALUES ('delete', old.id, old.comment); "
+    f"INSERT INTO {FTS_TABLE}(rowid, comment) VALUES (new.id, new.comment); END",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+SQLITE_UNINSTALL = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+POSTGRES_INSTALL = [
+    "CREATE INDEX IF NOT EXISTS review_comment_fts_idx ON reviews_review "
+    "USING GIN (to_tsvector('english', comment))",
+]
+
+POSTGRES_UNINSTALL = [
+    "DROP INDEX IF EXISTS review_comment_fts_idx",
+]
+
+
+def _run(schema_editor, statements):
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def install_comment_index(apps, schema_editor):
+    """Migration operation creating (or repairing) the comment search index."""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        _run(schema_editor, SQLITE_INSTALL)
+    elif vendor == 'postgresql':
+        _run(schema_editor, POSTGRES_INSTALL)
+
+
+def uninstall_comment_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        _run(schema_editor, SQLITE_UNINSTALL)
+    elif vendor == 'postgresql':
+        _run(schema_editor, POSTGRES_UNINSTALL)
+
+
+def _fts5_query(text):
+    # Quote every term so user input cannot use FTS5 query syntax.
+    return ' '.join('"%s"' % term.replace('"', '""') for term in text.split())
+
+
+def search_comments(queryset, text):
+    """Filter a Review queryset to reviews whose comment matches ``text``."""
+    text = text.strip()
+    if not text:
+        return queryset
+    vendor = connections[queryset.db].vendor
+    if vendor == 'sqlite':
+        return queryset.filter(id__in=RawSQL(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s",
+            [_fts5_query(text)]
+        ))
+    if vendor == 'postgresql':
+        return queryset.alias(comment_match=RawSQL(
+            "to_tsvector('english', reviews_review.comment) @@ plainto_tsquery('english', %s)",
+            [text],
+            output_field=BooleanField()
+        )).filter(comment_match=True)
+    return queryset.filter(comment__icontains=text)
@@ -2,6 +2,7 @@ from rest_framework import serializers
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils.translation import gettext_lazy as _
 from .models import Product, Review
+from .moderation import ACTIONS
 from users.serializers import UserSerializer
 
 class ProductListSerializer(serializers.ModelSerializer):
@@ -59,9 +60,9 @@ class ReviewSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Review
-        fields = ('id', 'product', 'user', 'rating', 'comment', 
+        fields = ('id', 'product', 'user', 'rating', 'comment', 'helpful_count', 'status',
                  'created_at', 'updated_at', 'can_edit')
-        read_only_fields = ('id', 'product', 'user', 'created_at', 'updated_at')
+        read_only_fields = ('id', 'product', 'user', 'helpful_count', 'status', 'created_at', 'updated_at')
     
     def get_can_edit(self, obj):
         """
@@ -70,9 +71,31 @@ class ReviewSerializer(serializers.ModelSerializer):
         """
         request = self.context.get('request')
         if request and hasattr(request, 'user'):
-            return obj.user == request.user
+            return obj.user_id == request.user.pk
         return False
 
+class ProductSummarySerializer(serializers.ModelSerializer):
+    """Serializer for the product summary embedded in a user's reviews."""
+    
+    class Meta:
+        model = Product
+        fields = ('id', 'name', 'price')
+        read_only_fields = fields
+
+class SimilarProductSerializer(serializers.Serializer):
+    """Serializer for a product's "customers also liked" entries."""
+    product = ProductSummarySerializer(source='similar', read_only=True)
+    score = serializers.FloatField(read_only=True)
+
+class UserReviewSerializer(serializers.ModelSerializer):
+    """Serializer for the authenticated user's own reviews."""
+    product = ProductSummarySerializer(read_only=True)
+    
+    class Meta:
+        model = Review
+        fields = ('id', 'product', 'rating', 'comment', 'status', 'created_at', 'updated_at')
+        read_only_fields = fields
+
 class ProductWithReviewsSerializer(ProductDetailSerializer):
     """Serializer for product details with reviews."""
     reviews = serializers.SerializerMethodField()
@@ -85,7 +108,7 @@ class ProductWithReviewsSerializer(ProductDetailSerializer):
         from rest_framework.pagination import PageNumberPagination
         from rest_framework.request import Request
         
-        reviews = obj.reviews.all().order_by('-created_at')
+        reviews = obj.reviews.approved().order_by('-created_at')
         
         # Get the request from the context
         request = self.context.get('request')
@@ -108,6 +131,31 @@ class ProductWithReviewsSerializer(ProductDetailSerializer):
         response = paginator.get_paginated_response(serializer.data)
         return response.data
 
+class ModerationActionSerializer(serializers.Serializer):
+    """Serializer for a bulk moderation request."""
+    action = serializers.ChoiceField(choices=ACTIONS)
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        min_length=1,
+        max_length=5000,
+        help_text='IDs of the reviews to moderate'
+    )
+
+class PriceHistoryPointSerializer(serializers.Serializer):
+    """Serializer for one point of a product's price history."""
+    at = serializers.DateTimeField()
+    price = serializers.DecimalField(max_digits=10, decimal_places=2)
+    min_price = serializers.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        help_text='Lowest price since the previous point'
+    )
+    max_price = serializers.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        help_text='Highest price since the previous point'
+    )
+
 class CreateProductSerializer(serializers.ModelSerializer):
     """Serializer for creating a new product."""
     price = serializers.DecimalField(
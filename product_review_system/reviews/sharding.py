@@ -0,0 +1,208 @@
+"""
+Horizontal sharding of reviews by product.
+
+With ``REVIEW_SHARDS`` set to a list of database aliases, each product's
+reviews, with their helpful votes and counter shards, live in the alias
+picked by a hash of the product ID; products, users and everything else stay
+in the default database. Without it every review is in the default database
+and the helpers below simply return it.
+
+Per-product reads go through ``Review.objects.for_product()`` (or a
+product's ``reviews`` manager), writes are routed by ``ReviewShardRouter``
+from the instance, and cross-product reads use ``across_shards()``, which
+runs the query on every shard and merges the results. Review IDs are
+allocated in blocks from the default database so they stay unique across
+shards, and ``reshard_reviews`` moves reviews after the shard list changes.
+"""
+import functools
+import heapq
+import threading
+import zlib
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
+
+SHARDED_MODELS = {'reviews.review', 'reviews.reviewvote', 'reviews.helpfulcountershard'}
+
+
+def review_databases():
+    """Return the aliases reviews are stored in."""
+    return tuple(getattr(settings, 'REVIEW_SHARDS', None) or (DEFAULT_DB_ALIAS,))
+
+
+def sharding_enabled():
+    return bool(getattr(settings, 'REVIEW_SHARDS', None))
+
+
+def shard_for_product(product_id, databases=None):
+    """Return the alias holding the reviews of ``product_id``."""
+    databases = databases or review_databases()
+    return databases[zlib.crc32(str(int(product_id)).encode()) % len(databases)]
+
+
+class ReviewShardRouter:
+    """
+    Route reviews, votes and counter shards to the shard of their product,
+    and every other model to the default database, when sharding is on.
+    """
+    def _db_for_model(self, model, **hints):
+        if not sharding_enabled():
+            return None
+        if model._meta.label_lower not in SHARDED_MODELS:
+            return DEFAULT_DB_ALIAS
+        instance = hints.get('instance')
+        if instance is None:
+            return None
+        if instance._meta.label_lower == 'reviews.product':
+            # Related managers, e.g. product.reviews.
+            return shard_for_product(instance.pk)
+        if instance._state.db in review_databases():
+            return instance._state.db
+        if getattr(instance, 'product_id', None) is not None:
+            return shard_for_product(instance.product_id)
+        review = instance._state.fields_cache.get('review')
+        if review is not None:
+            return review._state.db or shard_for_product(review.product_id)
+        return None
+
+    db_for_read = _db_for_model
+    db_for_write = _db_for_model
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Reviews reference products and users in the default database.
+        if sharding_enabled() and {obj1._meta.label_lower, obj2._meta.label_lower} & SHARDED_MODELS:
+            return True
+        return None
+
+
+class FanOut:
+    """
+    The same query run on several databases, read as one result merged in
+    the query's ordering.
+
+    Supports what the paginators need: ``filter``/``exclude``/``order_by``
+    are applied to every part, ``count()`` sums the parts and a slice
+    ``[start:stop]`` reads at most ``stop`` rows from each part.
+    """
+    def __init__(self, querysets):
+        self.querysets = list(querysets)
+        self.model = self.querysets[0].model
+
+    def _chain(self, method, *args, **kwargs):
+        return FanOut(getattr(queryset, method)(*args, **kwargs) for queryset in self.querysets)
+
+    def filter(self, *args, **kwargs):
+        return self._chain('filter', *args, **kwargs)
+
+    def exclude(self, *args, **kwargs):
+        return self._chain('exclude', *args, **kwargs)
+
+    def order_by(self, *fields):
+        return self._chain('order_by', *fields)
+
+    def select_related(self, *fields):
+        return self._chain('select_related', *fields)
+
+    def prefetch_related(self, *lookups):
+        return self._chain('prefetch_related', *lookups)
+
+    @property
+    def ordered(self):
+        return all(queryset.ordered for queryset in self.querysets)
+
+    def count(self):
+        return sum(queryset.count() for queryset in self.querysets)
+
+    def __len__(self):
+        return self.count()
+
+    def _ordering(self):
+        query = self.querysets[0].query
+        return list(query.order_by or (query.default_ordering and self.model._meta.ordering) or ['pk'])
+
+    def _merge(self, parts):
+        ordering = self._ordering()
+
+        def value(row, field):
+            for name in field.lstrip('-').split('__'):
+                if name == 'pk' and not isinstance(row, dict):
+                    name = row._meta.pk.attname
+                row = row[name] if isinstance(row, dict) else getattr(row, name)
+            return row
+
+        def compare(a, b):
+            for field in ordering:
+                left, right = value(a, field), value(b, field)
+                if left == right:
+                    continue
+                if left is None or right is None:
+                    result = -1 if right is None else 1
+                else:
+                    result = -1 if left < right else 1
+                return -result if field.startswith('-') else result
+            return 0
+
+        return heapq.merge(*parts, key=functools.cmp_to_key(compare))
+
+    def __iter__(self):
+        return self._merge(self.querysets)
+
+    def __getitem__(self, k):
+        if isinstance(k, int):
+            return self[k:k + 1][0]
+        if k.stop is None:
+            return list(self)[k]
+        return list(self._merge([queryset[:k.stop] for queryset in self.querysets]))[k]
+
+
+_id_blocks = {}
+_id_lock = threading.Lock()
+
+
+def _reserve_ids(size):
+    from .models import ArchivedReview, IdBlock, Review
+
+    while True:
+        try:
+            with transaction.atomic(using=DEFAULT_DB_ALIAS):
+                block = IdBlock.objects.select_for_update().filter(name='review').first()
+                if block is None:
+                    # First allocation: start above every existing review ID.
+                    existing = [
+                        Review.all_objects.using(alias).order_by('-pk').values_list('pk', flat=True).first()
+                        for alias in review_databases()
+                    ]
+                    existing.append(ArchivedReview.objects.order_by('-pk').values_list('pk', flat=True).first())
+                    block = IdBlock.objects.create(name='review', next_id=max(filter(None, existing), default=0) + 1)
+                start = block.next_id
+                block.next_id = start + size
+                block.save(update_fields=['next_id'])
+            return [start, start + size]
+        except IntegrityError:
+            # Another process created the block row first.
+            continue
+
+
+def advance_review_ids(last_id):
+    """Make sure review IDs allocated from now on are above ``last_id``."""
+    from .models import IdBlock
+
+    with transaction.atomic(using=DEFAULT_DB_ALIAS):
+        block = IdBlock.objects.select_for_update().filter(name='review').first()
+        if block is None:
+            IdBlock.objects.create(name='review', next_id=last_id + 1)
+        elif block.next_id <= last_id:
+            block.next_id = last_id + 1
+            block.save(update_fields=['next_id'])
+
+
+def next_review_id():
+    """Return a review ID that is unique across all shards."""
+    size = getattr(settings, 'REVIEW_ID_BLOCK_SIZE', 1000)
+    with _id_lock:
+        block = _id_blocks.get('review')
+        if block is None or block[0] >= block[1]:
+            block = _id_blocks['review'] = _reserve_ids(size)
+        review_id = block[0]
+        block[0] += 1
+    return review_id
@@ -0,0 +1,159 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .cards import create_product_card, refresh_product_cards_on_commit
+from .events import broker
+from .pages import invalidate_product_page
+from .models import Product, ProductPriceChange, Review, ReviewVote, User
+from .prices import as_price, last_recorded_price
+from .rollups import apply_rating_delta, review_day
+from .sharding import review_databases, shard_for_product, sharding_enabled
+
+_suppressed = ContextVar('reviews_signals_suppressed', default=False)
+
+
+@contextmanager
+def suppress_review_signals():
+    """
+    Skip the per-review handlers below, for bulk operations that rebuild
+    rollups and publish changes once per batch themselves.
+    """
+    token = _suppressed.set(True)
+    try:
+        yield
+    finally:
+        _suppressed.reset(token)
+
+
+def _rollup_contribution(status, rating, deleted_at):
+    """Return the (count, rating sum) a review adds to its rollup row."""
+    if status != Review.Status.APPROVED or rating is None or deleted_at is not None:
+        return 0, 0
+    return 1, rating
+
+
+@receiver(post_save, sender=Review, dispatch_uid='reviews_publish_review_saved')
+@receiver(post_delete, sender=Review, dispatch_uid='reviews_publish_review_deleted')
+def publish_review_change(sender, instance, using, **kwargs):
+    """Notify stats streams once the review change has been committed to its shard."""
+    if _suppressed.get():
+        return
+    product_id = instance.product_id
+    transaction.on_commit(lambda: broker.publish(product_id), using=using)
+    transaction.on_commit(lambda: invalidate_product_page(product_id), using=using)
+
+
+@receiver(post_save, sender=Review, dispatch_uid='reviews_rollup_review_saved')
+def rollup_review_saved(sender, instance, created, **kwargs):
+    """Apply a created, re-rated, re-moderated or soft-deleted review to the daily rating rollup."""
+    if _suppressed.get():
+        return
+    count, rating_sum = _rollup_contribution(instance.status, instance.rating, instance.deleted_at)
+    if not created:
+        old_status = getattr(instance, '_loaded_status', None)
+        # Without the stored values the delta is unknown; leave the row to
+        # the backfill_rating_rollups command.
+        if old_status is None:
+            count = rating_sum = 0
+        else:
+            old_count, old_sum = _rollup_contribution(
+                old_status,
+                getattr(instance, '_loaded_rating', None),
+                getattr(instance, '_loaded_deleted_at', None)
+            )
+            count, rating_sum = count - old_count, rating_sum - old_sum
+    apply_rating_delta(instance.product_id, review_day(instance), count, rating_sum)
+    instance._loaded_rating = instance.rating
+    instance._loaded_status = instance.status
+    instance._loaded_deleted_at = instance.deleted_at
+
+
+@receiver(post_delete, sender=Review, dispatch_uid='reviews_rollup_review_deleted')
+def rollup_review_deleted(sender, instance, **kwargs):
+    """Remove a deleted review from the daily rating rollup."""
+    if _suppressed.get():
+        return
+    if hasattr(instance, '_loaded_status'):
+        count, rating_sum = _rollup_contribution(
+            instance._loaded_status, instance._loaded_rating, instance._loaded_deleted_at
+        )
+    else:
+        count, rating_sum = _rollup_contribution(instance.status, instance.rating, instance.deleted_at)
+    apply_rating_delta(instance.product_id, review_day(instance), -count, -rating_sum)
+
+
+# Connected after the rollup handlers: with sharding on, cards are built from the rollups.
+@receiver(post_save, sender=Review, dispatch_uid='reviews_refresh_card_review_saved')
+@receiver(post_delete, sender=Review, dispatch_uid='reviews_refresh_card_review_deleted')
+def refresh_card_on_review_change(sender, instance, using, **kwargs):
+    """Render the product's list card again once the review change has been committed to its shard."""
+    if _suppressed.get():
+        return
+    refresh_product_cards_on_commit([instance.product_id], using=using)
+
+
+@receiver(post_save, sender=Product, dispatch_uid='reviews_record_price_change')
+def record_price_change(sender, instance, created, update_fields=None, **kwargs):
+    """Append to the price history when a product is created or its price changes."""
+    if update_fields is not None and 'price' not in update_fields:
+        return
+    price = as_price(instance.price)
+    if created:
+        previous = None
+    elif hasattr(instance, '_loaded_price'):
+        previous = instance._loaded_price
+    else:
+        previous = last_recorded_price(instance.pk)
+    if previous is None or as_price(previous) != price:
+        ProductPriceChange.objects.create(product=instance, price=price, changed_at=instance.updated_at)
+    instance._loaded_price = price
+
+
+@receiver(post_save, sender=Product, dispatch_uid='reviews_invalidate_product_page_saved')
+@receiver(post_delete, sender=Product, dispatch_uid='reviews_invalidate_product_page_deleted')
+def invalidate_product_page_on_change(sender, instance, using, **kwargs):
+    """Drop the cached product page once the product change has been committed."""
+    product_id = instance.pk
+    transaction.on_commit(lambda: invalidate_product_page(product_id), using=using)
+
+
+@receiver(post_save, sender=Product, dispatch_uid='reviews_refresh_product_card')
+def refresh_product_card(sender, instance, created, using, **kwargs):
+    """
+    Store a new product's list card with it, or render the card of a changed
+    product again once the change has been committed.
+    """
+    if created:
+        create_product_card(instance, using=using)
+    else:
+        refresh_product_cards_on_commit([instance.pk], using=using)
+
+
+@receiver(pre_delete, sender=Product, dispatch_uid='reviews_delete_sharded_product_reviews')
+def delete_sharded_product_reviews(sender, instance, using, **kwargs):
+    """
+    Delete a product's reviews from its shard; the ORM cascade only looks in
+    the database the product is deleted from.
+    """
+    if not sharding_enabled():
+        return
+    alias = shard_for_product(instance.pk)
+    if alias != using:
+        # The product's rollup rows are deleted with it.
+        with suppress_review_signals():
+            Review.all_objects.using(alias).filter(product_id=instance.pk).delete()
+
+
+@receiver(pre_delete, sender=User, dispatch_uid='reviews_delete_sharded_user_reviews')
+def delete_sharded_user_reviews(sender, instance, using, **kwargs):
+    """Delete a user's reviews and votes from every shard."""
+    if not sharding_enabled():
+        return
+    for alias in review_databases():
+        if alias != using:
+            Review.all_objects.using(alias).filter(user_id=instance.pk).delete()
+            ReviewVote.objects.using(alias).filter(user_id=instance.pk).delete()
@@ -0,0 +1,169 @@
+"""
+Offline item-item similarity ("customers also liked").
+
+``build_similar_products`` loads the approved live and archived reviews as a
+sparse users x products rating matrix and scores product pairs by the cosine
+similarity of their rating columns, keeping the top-K neighbours per product
+that share at least ``min_common`` reviewers. The result is stored in
+SimilarProduct, so serving a product's list is a single indexed read.
+
+Incremental runs only rebuild the lists that can have changed: products
+whose review fingerprint differs from the one stored in SimilarityState, the
+products co-reviewed with them and the products currently listing them.
+
+NumPy and SciPy are imported on first use so the web processes, which only
+read SimilarProduct, do not pay for loading them.
+"""
+import hashlib
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+
+from .models import ArchivedReview, Product, Review, SimilarityState, SimilarProduct
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def _approved_archived():
+    return ArchivedReview.objects.filter(status=Review.Status.APPROVED, deleted_at__isnull=True)
+
+
+def review_fingerprints():
+    """Return ``{product_id: fingerprint}`` for every product with approved reviews."""
+    totals = {}
+    for queryset in (*Review.objects.approved().per_shard(), _approved_archived()):
+        rows = (
+            queryset.order_by()
+            .values_list('product_id')
+            .annotate(Count('id'), Sum('rating'), Max('id'), Max('updated_at'))
+        )
+        for product_id, count, rating_sum, last_id, last_updated in rows:
+            previous = totals.get(product_id, (0, 0, 0, EPOCH))
+            totals[product_id] = (
+                previous[0] + count,
+                previous[1] + rating_sum,
+                max(previous[2], last_id),
+                max(previous[3], last_updated),
+            )
+    return {
+        product_id: hashlib.md5(
+            f'{count}:{rating_sum}:{last_id}:{last_updated.isoformat()}'.encode()
+        ).hexdigest()
+        for product_id, (count, rating_sum, last_id, last_updated) in totals.items()
+    }
+
+
+def _rating_matrix():
+    import numpy as np
+    from scipy import sparse
+
+    fields = ('user_id', 'product_id', 'rating')
+    querysets = (*Review.objects.approved().per_shard(), _approved_archived())
+    data = np.fromiter(
+        (
+            value
+            for queryset in querysets
+            for row in queryset.order_by().values_list(*fields).iterator(chunk_size=10000)
+            for value in row
+        ),
+        dtype=np.int64
+    ).reshape(-1, 3)
+    user_ids, user_index = np.unique(data[:, 0], return_inverse=True)
+    product_ids, product_index = np.unique(data[:, 1], return_inverse=True)
+    ratings = sparse.csc_matrix(
+        (data[:, 2].astype(np.float32), (user_index, product_index)),
+        shape=(len(user_ids), len(product_ids))
+    )
+    return product_ids, ratings
+
+
+def build_similar_products(top_k=10, min_common=2, full=False, batch_size=500):
+    """
+    Rebuild the stored similar products; all of them if ``full``, otherwise
+    only those affected by review changes since the last run.
+
+    Return ``(rebuilt, changed)``: the number of product lists rewritten and
+    of products whose reviews changed.
+    """
+    import numpy as np
+    from scipy import sparse
+
+    fingerprints = review_fingerprints()
+    stored = dict(SimilarityState.objects.values_list('product_id', 'fingerprint'))
+    if full:
+        changed = set(fingerprints) | set(stored)
+    else:
+        changed = {
+            product_id for product_id in set(fingerprints) | set(stored)
+            if fingerprints.get(product_id) != stored.get(product_id)
+        }
+    if not changed:
+        return 0, 0
+
+    product_ids, ratings = _rating_matrix()
+    column = {product_id: index for index, product_id in enumerate(product_ids.tolist())}
+    norms = np.sqrt(np.asarray(ratings.multiply(ratings).sum(axis=0))).ravel()
+    norms[norms == 0] = 1
+    normalized = (ratings @ sparse.diags(1 / norms)).tocsc()
+    reviewed = (ratings > 0).astype(np.float32).tocsc()
+
+    if full:
+        targets = set(product_ids.tolist()) | changed
+    else:
+        # Lists of co-reviewed products and of products listing a changed
+        # one can change too.
+        changed_columns = [column[product_id] for product_id in changed if product_id in column]
+        co_reviewed = (reviewed[:, changed_columns].T @ reviewed).tocoo().col if changed_columns else []
+        targets = changed | set(product_ids[np.unique(co_reviewed)].tolist()) | set(
+            SimilarProduct.objects.filter(similar_id__in=changed).values_list('product_id', flat=True)
+        )
+    targets = sorted(targets)
+
+    for start in range(0, len(targets), batch_size):
+        batch = targets[start:start + batch_size]
+        columns = [column[product_id] for product_id in batch if product_id in column]
+        scores = (normalized[:, columns].T @ normalized).tocsr()
+        common = (reviewed[:, columns].T @ reviewed).tocsr()
+        # Ratings are positive, so both products have the same sparsity
+        # pattern: a pair has a score exactly when it shares a reviewer.
+        scores.sort_indices()
+        common.sort_indices()
+        neighbours = []
+        for row, index in enumerate(columns):
+            product_id = int(product_ids[index])
+            span = slice(scores.indptr[row], scores.indptr[row + 1])
+            candidates, values = scores.indices[span], scores.data[span]
+            keep = (common.data[span] >= min_common) & (candidates != index)
+            candidates, values = candidates[keep], values[keep]
+            if len(values) > top_k:
+                best = np.argpartition(-values, top_k)[:top_k]
+                candidates, values = candidates[best], values[best]
+            order = np.lexsort((product_ids[candidates], -values))
+            neighbours.extend(
+                SimilarProduct(
+                    product_id=product_id,
+                    rank=rank,
+                    similar_id=int(product_ids[candidates[position]]),
+                    score=round(float(values[position]), 6)
+                )
+                for rank, position in enumerate(order, start=1)
+            )
+        with transaction.atomic():
+            SimilarProduct.objects.filter(product_id__in=batch).delete()
+            SimilarProduct.objects.bulk_create(neighbours, batch_size=1000)
+
+    existing = set(Product.objects.filter(pk__in=changed).values_list('pk', flat=True))
+    with transaction.atomic():
+        SimilarityState.objects.filter(product_id__in=changed - set(fingerprints)).delete()
+        SimilarityState.objects.bulk_create(
+            [
+                SimilarityState(product_id=product_id, fingerprint=fingerprints[product_id])
+                for product_id in changed & set(fingerprints) & existing
+            ],
+            update_conflicts=True,
+            unique_fields=['product'],
+            update_fields=['fingerprint', 'built_at'],
+            batch_size=1000
+        )
+    return len(targets), len(changed)
@@ -0,0 +1,81 @@
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+
+from .models import ArchivedProductRating, DailyProductRating, Review
+
+TREND_BUCKETS = {
+    'day': F('day'),
+    'week': TruncWeek('day'),
+    'month': TruncMonth('day'),
+}
+
+
+def rating_counts(product_id):
+    """
+    Return ``(live, archived)`` ``{rating: count}`` mappings for a product:
+    one grouped query over live approved reviews and the archived totals.
+    """
+    archived = ArchivedProductRating.objects.filter(product_id=product_id).first()
+    archived_counts = archived.distribution if archived else {i: 0 for i in range(1, 6)}
+    live_counts = {i: 0 for i in range(1, 6)}
+    rows = (
+        Review.objects.approved().for_product(product_id)
+        .order_by()
+        .values_list('rating')
+        .annotate(count=Count('id'))
+    )
+    for rating, count in rows:
+        live_counts[rating] += count
+    return live_counts, archived_counts
+
+
+def rating_distribution(product_id):
+    """
+    Return a ``{rating: count}`` mapping for a product over live reviews
+    plus the product's archived totals.
+    """
+    live, archived = rating_counts(product_id)
+    return {rating: live[rating] + archived[rating] for rating in live}
+
+
+def product_stats(product, distribution=None):
+    """
+    Build the review statistics payload served for a product, from
+    ``distribution`` if the caller already has it.
+    """
+    if distribution is None:
+        distribution = rating_distribution(product.pk)
+    total_reviews = sum(distribution.values())
+    rating_sum = sum(rating * count for rating, count in distribution.items())
+    average_rating = rating_sum / total_reviews if total_reviews else 0
+    
+    return {
+        'product_id': product.pk,
+        'product_name': product.name,
+        'total_reviews': total_reviews,
+        'average_rating': round(average_rating, 1),
+        'rating_distribution': distribution,
+    }
+
+
+def rating_trend(product_id, bucket, start, end):
+    """
+    Return review counts and average ratings per ``bucket`` between ``start``
+    and ``end`` (inclusive), read from the daily rollup table.
+    """
+    rows = (
+        DailyProductRating.objects.filter(product_id=product_id, day__range=(start, end))
+        .annotate(period=TREND_BUCKETS[bucket])
+        .order_by('period')
+        .values('period')
+        .annotate(review_count=Sum('review_count'), rating_sum=Sum('rating_sum'))
+    )
+    return [
+        {
+            'period': row['period'],
+            'review_count': row['review_count'],
+            'average_rating': round(row['rating_sum'] / row['review_count'], 2) if row['review_count'] else 0,
+        }
+        for row in rows
+        if row['review_count']
+    ]
@@ -1,3 +1,301 @@
-from django.test import TestCase
+import asyncio
+import json
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, post_save
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from users.models import User
+
+from .models import ArchivedReview, Product, Review
+from .moderation import moderate_reviews
+from .views import product_stats_stream
+
+TRANSACTION_STATEMENTS = ('BEGIN', 'COMMIT', 'SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK')
+
+
+class ReviewWriteQueriesTests(TestCase):
+    """
+    Statements run by the review write paths, without the transaction
+    control statements and the on-commit callbacks (stats streams, page
+    cache, product cards) that TestCase never runs.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(email='admin@example.com', password='secret')
+        cls.author = User.objects.create_user(email='author@example.com', password='secret')
+        cls.other = User.objects.create_user(email='other@example.com', password='secret')
+        cls.product = Product.objects.create(name='Widget', price='9.99', created_by=cls.admin)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def review_url(self, review=None):
+        url = f'/api/products/{self.product.pk}/reviews/'
+        return f'{url}{review.pk}/' if review else url
+
+    def statements(self, request):
+        with CaptureQueriesContext(connection) as queries:
+            response = request()
+        statements = [
+            query['sql'].split(None, 1)[0] for query in queries.captured_queries
+            if not query['sql'].startswith(TRANSACTION_STATEMENTS)
+        ]
+        return response, statements
+
+    def create_review(self, user=None):
+        return Review.objects.create(product=self.product, user=user or self.author, rating=4, comment='Solid widget')
+
+    def test_create(self):
+        response, statements = self.statements(lambda: self.client.post(
+            self.review_url(), {'rating': 5, 'comment': 'Great widget'}, format='json'
+        ))
+        self.assertEqual(response.status_code, 201)
+        # Product and archive check, the review INSERT, then the rollup upsert (the first
+        # review of the day inserts its row).
+        self.assertEqual(statements, ['SELECT', 'INSERT', 'UPDATE', 'INSERT'])
+
+    def test_create_duplicate(self):
+        self.create_review()
+        response, statements = self.statements(lambda: self.client.post(
+            self.review_url(), {'rating': 5, 'comment': 'Great widget'}, format='json'
+        ))
+        self.assertEqual(response.status_code, 400)
+        # The unique constraint rejects the INSERT; nothing else runs.
+        self.assertEqual(statements, ['SELECT', 'INSERT'])
+
+    def test_create_after_archived_review(self):
+        now = timezone.now()
+        ArchivedReview.objects.create(
+            id=1000, product=self.product, user=self.author, rating=4, status=Review.Status.APPROVED,
+            created_at=now, updated_at=now
+        )
+        response, statements = self.statements(lambda: self.client.post(
+            self.review_url(), {'rating': 5, 'comment': 'Great widget'}, format='json'
+        ))
+        self.assertEqual(response.status_code, 400)
+        # The archived review is found by the product check.
+        self.assertEqual(statements, ['SELECT'])
+
+    def test_create_missing_product(self):
+        response, statements = self.statements(lambda: self.client.post(
+            '/api/products/999999/reviews/', {'rating': 5, 'comment': 'Great widget'}, format='json'
+        ))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(statements, ['SELECT'])
+
+    def test_update(self):
+        review = self.create_review()
+        response, statements = self.statements(lambda: self.client.patch(
+            self.review_url(review), {'rating': 2}, format='json'
+        ))
+        self.assertEqual(response.status_code, 200)
+        # Load (with the author joined), UPDATE, rollup delta.
+        self.assertEqual(statements, ['SELECT', 'UPDATE', 'UPDATE'])
+
+    def test_update_by_other_user(self):
+        review = self.create_review()
+        self.client.force_authenticate(self.other)
+        response, statements = self.statements(lambda: self.client.patch(
+            self.review_url(review), {'rating': 2}, format='json'
+        ))
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(statements, ['SELECT'])
+
+    def test_delete(self):
+        review = self.create_review()
+        response, statements = self.statements(lambda: self.client.delete(self.review_url(review)))
+        self.assertEqual(response.status_code, 204)
+        # Load, soft delete, rollup delta.
+        self.assertEqual(statements, ['SELECT', 'UPDATE', 'UPDATE'])
+
+    def test_delete_by_other_user(self):
+        review = self.create_review()
+        self.client.force_authenticate(self.other)
+        response, statements = self.statements(lambda: self.client.delete(self.review_url(review)))
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(statements, ['SELECT'])
+
+
+class ReviewSoftDeleteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(email='author@example.com', password='secret')
+        cls.voter = User.objects.create_user(email='voter@example.com', password='secret')
+        cls.product = Product.objects.create(name='Widget', price='9.99')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.review = Review.objects.create(product=self.product, user=self.author, rating=4, comment='Solid widget')
+        self.url = f'/api/products/{self.product.pk}/reviews/{self.review.pk}/'
+
+    def test_deleted_review_is_kept_but_hidden(self):
+        self.client.force_authenticate(self.author)
+        self.assertEqual(self.client.delete(self.url).status_code, 204)
+
+        self.assertIsNotNone(Review.all_objects.get(pk=self.review.pk).deleted_at)
+        self.assertFalse(Review.objects.filter(pk=self.review.pk).exists())
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        response = self.client.get(f'/api/products/{self.product.pk}/reviews/')
+        self.assertEqual(response.data['count'], 0)
+        self.assertEqual(self.client.get(f'/api/products/{self.product.pk}/').data['review_count'], 0)
+
+    def test_deleted_review_can_be_written_again(self):
+        self.client.force_authenticate(self.author)
+        self.client.delete(self.url)
+        response = self.client.post(
+            f'/api/products/{self.product.pk}/reviews/', {'rating': 2, 'comment': 'Broke'}, format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+
+    def test_cannot_vote_for_deleted_review(self):
+        Review.all_objects.filter(pk=self.review.pk).update(deleted_at=timezone.now())
+        self.client.force_authenticate(self.voter)
+        self.assertEqual(self.client.post(f'{self.url}helpful/').status_code, 404)
+
+
+class ModerationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(email='admin@example.com', password='secret')
+        cls.product = Product.objects.create(name='Widget', price='9.99')
+        cls.reviews = [
+            Review.objects.create(
+                product=cls.product,
+                user=User.objects.create_user(email=f'user{i}@example.com', password='secret'),
+                rating=i + 1,
+                comment='Pending review',
+                status=Review.Status.PENDING,
+            )
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def queue(self, status=None):
+        response = self.client.get('/api/moderation/reviews/', {'status': status} if status else {})
+        self.assertEqual(response.status_code, 200)
+        return [review['id'] for review in response.data['results']]
+
+    def moderate(self, action, reviews):
+        return self.client.post(
+            '/api/moderation/reviews/bulk/', {'action': action, 'ids': [review.pk for review in reviews]},
+            format='json'
+        )
+
+    def public_count(self):
+        return self.client.get(f'/api/products/{self.product.pk}/reviews/').data['count']
+
+    def test_queue_lists_pending_reviews_oldest_first(self):
+        self.assertEqual(self.queue(), [review.pk for review in self.reviews])
+        self.assertEqual(self.queue('approved'), [])
+
+    def test_queue_rejects_unknown_status(self):
+        response = self.client.get('/api/moderation/reviews/', {'status': 'spam'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_queue_requires_admin(self):
+        self.client.force_authenticate(User.objects.get(email='user0@example.com'))
+        self.assertEqual(self.client.get('/api/moderation/reviews/').status_code, 403)
+
+    def test_approve_publishes_and_counts(self):
+        response = self.moderate('approve', self.reviews[:2])
+        self.assertEqual(response.data, {'action': 'approve', 'count': 2})
+        self.assertEqual(self.queue(), [self.reviews[2].pk])
+        self.assertEqual(self.queue('approved'), [review.pk for review in self.reviews[:2]])
+        self.assertEqual(self.public_count(), 2)
+        product = self.client.get(f'/api/products/{self.product.pk}/').data
+        self.assertEqual((product['review_count'], product['average_rating']), (2, 1.5))
+
+    def test_reject_after_approve_removes_from_ratings(self):
+        self.moderate('approve', self.reviews)
+        self.moderate('reject', self.reviews[:1])
+        self.assertEqual(self.queue('rejected'), [self.reviews[0].pk])
+        self.assertEqual(self.public_count(), 2)
+        self.assertEqual(self.client.get(f'/api/products/{self.product.pk}/').data['review_count'], 2)
+
+    def test_delete_soft_deletes(self):
+        self.moderate('approve', self.reviews)
+        response = self.moderate('delete', self.reviews[:1])
+        self.assertEqual(response.data['count'], 1)
+        self.assertIsNotNone(Review.all_objects.get(pk=self.reviews[0].pk).deleted_at)
+        self.assertEqual(self.queue('approved'), [review.pk for review in self.reviews[1:]])
+        self.assertEqual(self.client.get(f'/api/products/{self.product.pk}/').data['review_count'], 2)
+
+
+@override_settings(REVIEW_STREAM={'HEARTBEAT_SECONDS': 5, 'COALESCE_SECONDS': 0})
+class StatsStreamTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(email='author@example.com', password='secret')
+        cls.product = Product.objects.create(name='Widget', price='9.99')
+
+    def post_review(self):
+        client = APIClient()
+        client.force_authenticate(self.author)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post(
+                f'/api/products/{self.product.pk}/reviews/', {'rating': 5, 'comment': 'Great'}, format='json'
+            )
+        self.assertEqual(response.status_code, 201)
+
+    def read_events(self, count, between=None):
+        async def read():
+            request = RequestFactory().get(f'/api/products/{self.product.pk}/stats/stream/')
+            response = await product_stats_stream(request, product_id=self.product.pk)
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            events = aiter(response.streaming_content)
+            messages = [await asyncio.wait_for(anext(events), 5)]
+            if between:
+                await sync_to_async(between)()
+            while len(messages) < count:
+                messages.append(await asyncio.wait_for(anext(events), 5))
+            await events.aclose()
+            return [
+                json.loads(message.decode().split('data: ', 1)[1]) for message in messages
+            ]
+        return async_to_sync(read)()
+
+    def test_stats_on_connect(self):
+        [stats] = self.read_events(1)
+        self.assertEqual(stats['total_reviews'], 0)
+
+    def test_review_create_emits_stats(self):
+        before, after = self.read_events(2, between=self.post_review)
+        self.assertEqual(before['total_reviews'], 0)
+        self.assertEqual(after['total_reviews'], 1)
+        self.assertEqual(after['average_rating'], 5.0)
+
+
+class ShardCallbackTests(TestCase):
+    """On-commit callbacks go to the database the review was written to."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(email='author@example.com', password='secret')
+        cls.product = Product.objects.create(name='Widget', price='9.99')
+
+    def test_review_callbacks_use_the_write_database(self):
+        review = Review.objects.create(product=self.product, user=self.author, rating=4, comment='Solid widget')
+        with mock.patch('django.db.transaction.on_commit') as on_commit:
+            post_save.send(sender=Review, instance=review, created=False, using='reviews_1')
+            post_delete.send(sender=Review, instance=review, using='reviews_1')
+        self.assertTrue(on_commit.call_args_list)
+        self.assertEqual({call.kwargs['using'] for call in on_commit.call_args_list}, {'reviews_1'})
+
+    def test_moderation_callbacks_use_the_queryset_database(self):
+        review = Review.objects.create(product=self.product, user=self.author, rating=4, comment='Solid widget')
+        with self.captureOnCommitCallbacks() as callbacks, \
+                mock.patch('django.db.transaction.on_commit', wraps=transaction.on_commit) as on_commit:
+            moderate_reviews(Review.objects.filter(pk=review.pk), 'reject')
+        self.assertEqual(len(callbacks), 3)
+        self.assertEqual({call.kwargs['using'] for call in on_commit.call_args_list}, {'default'})
@@ -10,8 +10,18 @@ router = DefaultRouter()
 urlpatterns = [
     # Product endpoints
     path('products/', views.ProductListView.as_view(), name='product-list'),
+    path('products/batch/', views.ProductBatchView.as_view(), name='product-batch'),
     path('products/<int:pk>/', views.ProductDetailView.as_view(), name='product-detail'),
+    path('products/<int:pk>/page/', views.ProductPageView.as_view(), name='product-page'),
+    path('products/<int:product_id>/price-history/', views.ProductPriceHistoryView.as_view(), name='product-price-history'),
+    path('products/<int:product_id>/similar/', views.ProductSimilarView.as_view(), name='product-similar'),
     path('products/<int:product_id>/reviews/', views.ReviewListView.as_view(), name='review-list'),
     path('products/<int:product_id>/reviews/<int:pk>/', views.ReviewDetailView.as_view(), name='review-detail'),
+    path('products/<int:product_id>/reviews/<int:pk>/helpful/', views.ReviewHelpfulVoteView.as_view(), name='review-helpful'),
     path('products/<int:product_id>/stats/', views.ProductReviewsStatsView.as_view(), name='product-stats'),
+    path('products/<int:product_id>/stats/trend/', views.ProductRatingTrendView.as_view(), name='product-stats-trend'),
+    path('products/<int:product_id>/stats/stream/', views.product_stats_stream, name='product-stats-stream'),
+    path('moderation/reviews/', views.ModerationQueueView.as_view(), name='moderation-queue'),
+    path('moderation/reviews/bulk/', views.ModerationActionView.as_view(), name='moderation-bulk'),
+    path('products/stats/stream/', views.product_stats_stream, name='products-stats-stream'),
 ]
@@ -0,0 +1,23 @@
+def parse_id_list(value):
+    """
+    Parse product IDs from a comma-separated string or a list, dropping
+    duplicates but keeping the requested order. Raises ValueError on
+    anything that is not a positive integer.
+    """
+    if isinstance(value, str):
+        value = [item for item in value.split(',') if item.strip()]
+    elif not isinstance(value, (list, tuple)):
+        raise ValueError('Expected a list of IDs.')
+    ids = []
+    for item in value:
+        # int() would also accept floats (truncating 1.7 to 1) and bools.
+        if isinstance(item, str) and item.strip().isascii() and item.strip().isdigit():
+            pk = int(item)
+        elif isinstance(item, int) and not isinstance(item, bool):
+            pk = item
+        else:
+            raise ValueError('Expected a list of IDs.')
+        if pk < 1:
+            raise ValueError('IDs must be positive.')
+        ids.append(pk)
+    return list(dict.fromkeys(ids))
@@ -1,18 +1,44 @@
+import json
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
 from rest_framework import generics, status, permissions
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, Q, prefetch_related_objects
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.dateparse import parse_date
 from django.utils.translation import gettext_lazy as _
 from django.shortcuts import get_object_or_404
 
-from .models import Product, Review
+from .models import ArchivedReview, Product, Review, SimilarProduct
 from .serializers import (
     ProductListSerializer,
     ProductDetailSerializer,
     ProductWithReviewsSerializer,
     ReviewSerializer,
-    CreateProductSerializer
+    CreateProductSerializer,
+    ModerationActionSerializer,
+    PriceHistoryPointSerializer,
+    SimilarProductSerializer
 )
+from .cards import product_list_page
+from .events import broker
+from .moderation import moderate_reviews
+from .pages import product_page
+from .prices import price_history
+from .search import search_comments
+from .sharding import FanOut, shard_for_product
+from .stats import TREND_BUCKETS, product_stats, rating_trend
+from .utils import parse_id_list
+from .votes import cast_vote, retract_vote
 from users.models import User
 
 class ProductListView(generics.ListCreateAPIView):
@@ -25,13 +51,22 @@ class ProductListView(generics.ListCreateAPIView):
         return ProductListSerializer
     
     def get_queryset(self):
-        # Allow filtering by search query parameter
-        queryset = Product.objects.all()
+        # Allow filtering by search query parameter. Meta.ordering is not
+        # applied to the aggregate query; use the product cards' order.
+        queryset = Product.objects.with_review_stats().order_by('-created_at', '-pk')
         search_query = self.request.query_params.get('search', None)
         if search_query:
             queryset = queryset.filter(name__icontains=search_query)
         return queryset
     
+    def list(self, request, *args, **kwargs):
+        # JSON pages are joined from the prebuilt product cards; other
+        # formats (the browsable API) serialize the products as usual.
+        if type(request.accepted_renderer) is not JSONRenderer:
+            return super().list(request, *args, **kwargs)
+        body = product_list_page(self.paginator, request, request.query_params.get('search'))
+        return HttpResponse(body, content_type='application/json')
+    
     def get_permissions(self):
         if self.request.method == 'POST':
             return [permissions.IsAuthenticated(), permissions.IsAdminUser()]
@@ -63,24 +98,218 @@ class ProductDetailView(generics.RetrieveUpdateDestroyAPIView):
             return product
         return product
 
+class ProductPageView(APIView):
+    """
+    API endpoint that returns everything a product page shows in one
+    response: the product, its rating statistics, the first page of reviews
+    and, for a signed-in viewer, their own review.
+    
+    The shared part is cached server-side and anonymous responses may be
+    cached by browsers and proxies for ``PRODUCT_PAGE_CACHE_SECONDS``.
+    """
+    permission_classes = [permissions.AllowAny]
+    
+    def get(self, request, pk):
+        page = product_page(pk, request)
+        if page is None:
+            raise NotFound(_("Product not found."))
+        
+        viewer = request.user if request.user.is_authenticated else None
+        if viewer is None:
+            response = Response({**page, 'viewer_review': None})
+            patch_cache_control(response, public=True, max_age=getattr(settings, 'PRODUCT_PAGE_CACHE_SECONDS', 60))
+        else:
+            # A user has at most one live review per product, so skip the
+            # ordering first() would add.
+            own_review = next(iter(
+                Review.objects.for_product(pk).filter(user=viewer).select_related('user').order_by()[:1]
+            ), None)
+            reviews = dict(page['reviews'])
+            reviews['results'] = [
+                {**review, 'can_edit': review['user']['id'] == viewer.pk} for review in reviews['results']
+            ]
+            response = Response({
+                **page,
+                'reviews': reviews,
+                'viewer_review': ReviewSerializer(own_review, context={'request': request}).data if own_review else None,
+            })
+            patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ('Authorization',))
+        return response
+
+class ProductBatchView(APIView):
+    """
+    API endpoint that returns product summaries for many products at once,
+    either as ``?ids=1,2,3`` or as a POST body ``{"ids": [1, 2, 3]}``.
+    
+    Results keep the requested order; IDs that do not exist are listed in
+    ``missing`` instead of failing the request.
+    """
+    permission_classes = [permissions.AllowAny]
+    
+    def get(self, request):
+        return self._batch_response(request.query_params.get('ids', ''))
+    
+    def post(self, request):
+        if not isinstance(request.data, dict):
+            raise ValidationError({"detail": _('Expected an object such as {"ids": [1, 2, 3]}.')})
+        return self._batch_response(request.data.get('ids', []))
+    
+    def _batch_response(self, raw_ids):
+        try:
+            product_ids = parse_id_list(raw_ids)
+        except (TypeError, ValueError):
+            raise ValidationError({"ids": _("Expected a list of product IDs.")})
+        if not product_ids:
+            raise ValidationError({"ids": _("At least one product ID is required.")})
+        max_size = getattr(settings, 'PRODUCT_BATCH_MAX_SIZE', 100)
+        if len(product_ids) > max_size:
+            raise ValidationError({"ids": _("At most %(max)d product IDs are allowed.") % {'max': max_size}})
+        
+        products = Product.objects.with_review_stats().order_by().in_bulk(product_ids)
+        found = [products[pk] for pk in product_ids if pk in products]
+        return Response({
+            'results': ProductListSerializer(found, many=True, context={'request': self.request}).data,
+            'missing': [pk for pk in product_ids if pk not in products]
+        })
+
+class ProductSimilarView(APIView):
+    """
+    API endpoint that lists the products most similar to a product
+    ("customers also liked"), as built by the build_similar_products command.
+    """
+    permission_classes = [permissions.AllowAny]
+    
+    def get(self, request, product_id):
+        similar = list(
+            SimilarProduct.objects.filter(product_id=product_id)
+            .select_related('similar')
+            .order_by('rank')
+        )
+        # An empty list is only ambiguous for products without neighbours.
+        if not similar and not Product.objects.filter(pk=product_id).exists():
+            raise NotFound(_("Product not found."))
+        return Response({
+            'product_id': product_id,
+            'results': SimilarProductSerializer(similar, many=True).data
+        })
+
 class ReviewListView(generics.ListCreateAPIView):
     """
     API endpoint that allows listing all reviews for a product or creating a new review.
+    
+    The list accepts ``?rating=`` (exact), ``?min_rating=``, ``?q=`` (search
+    in comments) and ``?sort=newest|oldest|highest|lowest|helpful``, and
+    includes archived reviews with ``?include_archived=true``.
     """
     serializer_class = ReviewSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    sort_orderings = {
+        'newest': ('-created_at',),
+        'oldest': ('created_at',),
+        'highest': ('-rating', '-created_at'),
+        'lowest': ('rating', '-created_at'),
+        'helpful': ('-helpful_count', '-created_at'),
+    }
     
     def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):
+            return Review.objects.none()
         product_id = self.kwargs['product_id']
-        return Review.objects.filter(product_id=product_id).order_by('-created_at')
+        queryset = Review.objects.for_product(product_id).select_related('user')
+        if self.request.method != 'GET':
+            return queryset
+        
+        queryset = self._filter_reviews(queryset.approved(), search_comments)
+        return queryset.order_by(*self._get_ordering())
+    
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get('include_archived', '').lower() not in ('1', 'true', 'yes'):
+            return super().list(request, *args, **kwargs)
+        
+        # Archived reviews live in their own table, so page over a UNION of
+        # both (merged in Python when the reviews are in a shard) and rebuild
+        # Review instances for the serializer.
+        product_id = self.kwargs['product_id']
+        live = self._filter_reviews(
+            Review.objects.approved().for_product(product_id),
+            search_comments
+        )
+        archived = self._filter_reviews(
+            ArchivedReview.objects.filter(
+                product_id=product_id, status=Review.Status.APPROVED, deleted_at__isnull=True
+            ),
+            lambda queryset, text: queryset.filter(comment__icontains=text)
+        )
+        fields = ('id', 'product_id', 'user_id', 'rating', 'comment', 'helpful_count',
+                  'status', 'created_at', 'updated_at')
+        parts = [live.order_by().values(*fields), archived.order_by().values(*fields)]
+        if live.db == archived.db:
+            queryset = parts[0].union(parts[1], all=True)
+        else:
+            queryset = FanOut(parts)
+        page = self.paginate_queryset(queryset.order_by(*self._get_ordering()))
+        reviews = [Review(**row) for row in page]
+        prefetch_related_objects(reviews, 'user')
+        serializer = self.get_serializer(reviews, many=True)
+        return self.get_paginated_response(serializer.data)
+    
+    def _filter_reviews(self, queryset, search):
+        params = self.request.query_params
+        rating = self._rating_param(params, 'rating')
+        if rating is not None:
+            queryset = queryset.filter(rating=rating)
+        min_rating = self._rating_param(params, 'min_rating')
+        if min_rating is not None:
+            queryset = queryset.filter(rating__gte=min_rating)
+        
+        search_query = params.get('q')
+        if search_query:
+            queryset = search(queryset, search_query)
+        return queryset
+    
+    def _get_ordering(self):
+        sort = self.request.query_params.get('sort', 'newest')
+        if sort not in self.sort_orderings:
+            raise ValidationError({"sort": _("Must be one of: %(choices)s.") % {
+                'choices': ', '.join(self.sort_orderings)
+            }})
+        return self.sort_orderings[sort]
+    
+    @staticmethod
+    def _rating_param(params, name):
+        value = params.get(name)
+        if value in (None, ''):
+            return None
+        if value not in ('1', '2', '3', '4', '5'):
+            raise ValidationError({name: _("Must be an integer between 1 and 5.")})
+        return int(value)
     
     def perform_create(self, serializer):
-        product = get_object_or_404(Product, pk=self.kwargs['product_id'])
-        # Check if user has already reviewed this product
-        if Review.objects.filter(product=product, user=self.request.user).exists():
+        product_id = self.kwargs['product_id']
+        # The product may live in another database than its reviews, so it is
+        # checked up front, together with the user's archived review of it
+        # (the archive sits next to the products); duplicates among live
+        # reviews are left to the unique_product_user_review constraint.
+        archived = ArchivedReview.objects.filter(
+            product_id=product_id, user_id=self.request.user.pk, deleted_at__isnull=True
+        )
+        already_archived = (
+            Product.objects.filter(pk=product_id).values_list(Exists(archived), flat=True).first()
+        )
+        if already_archived is None:
+            raise NotFound(_("Product not found."))
+        if already_archived:
+            raise ValidationError({"detail": _("You have already reviewed this product.")})
+        try:
+            with transaction.atomic(using=shard_for_product(product_id)):
+                serializer.save(
+                    user=self.request.user,
+                    product_id=product_id,
+                    status=Review.Status.PENDING if settings.REVIEWS_REQUIRE_APPROVAL else Review.Status.APPROVED
+                )
+        except IntegrityError:
             raise ValidationError({"detail": _("You have already reviewed this product.")})
-        
-        serializer.save(user=self.request.user, product=product)
 
 class ReviewDetailView(generics.RetrieveUpdateDestroyAPIView):
     """
@@ -90,27 +319,103 @@ class ReviewDetailView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     
     def get_queryset(self):
-        return Review.objects.filter(product_id=self.kwargs['product_id'])
+        if getattr(self, 'swagger_fake_view', False):
+            return Review.objects.none()
+        queryset = Review.objects.for_product(self.kwargs['product_id']).select_related('user')
+        if self.request.method == 'GET':
+            # Unapproved reviews are only visible to their author.
+            queryset = queryset.filter(Q(status=Review.Status.APPROVED) | Q(user_id=self.request.user.pk))
+        return queryset
     
     def get_object(self):
-        review = get_object_or_404(
-            Review,
-            pk=self.kwargs['pk'],
-            product_id=self.kwargs['product_id']
-        )
+        review = get_object_or_404(self.get_queryset(), pk=self.kwargs['pk'])
         return review
     
     def perform_update(self, serializer):
         # Only allow the review author to update their own review
-        if serializer.instance.user != self.request.user:
+        if serializer.instance.user_id != self.request.user.pk:
             raise PermissionDenied({"detail": _("You do not have permission to edit this review.")})
         serializer.save()
     
     def perform_destroy(self, instance):
         # Only allow the review author to delete their own review
-        if instance.user != self.request.user:
+        if instance.user_id != self.request.user.pk:
             raise PermissionDenied({"detail": _("You do not have permission to delete this review.")})
-        instance.delete()
+        # Soft delete; the archive_reviews command moves the row out later.
+        instance.deleted_at = timezone.now()
+        instance.save(update_fields=['deleted_at'])
+
+class ReviewHelpfulVoteView(APIView):
+    """
+    API endpoint that lets users mark a review as helpful (POST) or take the
+    vote back (DELETE). Users cannot vote for their own reviews.
+    
+    Votes reach ``helpful_count`` once the ``fold_helpful_votes`` command runs.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def _get_review_author(self):
+        author_id = (
+            Review.objects.for_product(self.kwargs['product_id']).approved().filter(pk=self.kwargs['pk'])
+            .values_list('user_id', flat=True)
+            .first()
+        )
+        if author_id is None:
+            raise NotFound(_("Review not found."))
+        return author_id
+    
+    def post(self, request, product_id, pk):
+        if self._get_review_author() == request.user.pk:
+            raise ValidationError({"detail": _("You cannot vote for your own review.")})
+        created = cast_vote(pk, request.user.pk, using=shard_for_product(product_id))
+        return Response(
+            {'review_id': pk, 'voted': True},
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
+    
+    def delete(self, request, product_id, pk):
+        self._get_review_author()
+        if not retract_vote(pk, request.user.pk, using=shard_for_product(product_id)):
+            raise NotFound(_("You have not voted for this review."))
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+class ModerationQueueView(generics.ListAPIView):
+    """
+    API endpoint that lists reviews awaiting moderation, oldest first.
+    Use ``?status=pending|approved|rejected`` to browse other states.
+    """
+    serializer_class = ReviewSerializer
+    permission_classes = [permissions.IsAuthenticated, permissions.IsAdminUser]
+    
+    def get_queryset(self):
+        status_filter = self.request.query_params.get('status', Review.Status.PENDING)
+        if status_filter not in Review.Status.values:
+            raise ValidationError({"status": _("Must be one of: %(choices)s.") % {
+                'choices': ', '.join(Review.Status.values)
+            }})
+        return (
+            Review.objects.filter(status=status_filter)
+            .select_related('user')
+            .order_by('created_at')
+            .across_shards()
+        )
+
+class ModerationActionView(APIView):
+    """
+    API endpoint that approves, rejects or deletes many reviews at once,
+    e.g. ``{"action": "reject", "ids": [1, 2, 3]}``.
+    """
+    permission_classes = [permissions.IsAuthenticated, permissions.IsAdminUser]
+    
+    def post(self, request):
+        serializer = ModerationActionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        action = serializer.validated_data['action']
+        count = sum(
+            moderate_reviews(queryset, action)
+            for queryset in Review.objects.filter(pk__in=serializer.validated_data['ids']).per_shard()
+        )
+        return Response({'action': action, 'count': count})
 
 class ProductReviewsStatsView(APIView):
     """
@@ -120,21 +425,166 @@ class ProductReviewsStatsView(APIView):
     
     def get(self, request, product_id):
         product = get_object_or_404(Product, pk=product_id)
+        return Response(product_stats(product))
+
+class ProductRatingTrendView(APIView):
+    """
+    API endpoint that provides review counts and average ratings over time,
+    e.g. ``?bucket=week&from=2025-01-01&to=2025-12-31``.
+    
+    Defaults to daily buckets over the last 365 days.
+    """
+    permission_classes = [permissions.AllowAny]
+    
+    def get(self, request, product_id):
+        if not Product.objects.filter(pk=product_id).exists():
+            raise NotFound(_("Product not found."))
         
-        # Get review statistics
-        reviews = product.reviews.all()
-        total_reviews = reviews.count()
-        average_rating = reviews.aggregate(avg_rating=models.Avg('rating'))['avg_rating'] or 0
+        bucket = request.query_params.get('bucket', 'day')
+        if bucket not in TREND_BUCKETS:
+            raise ValidationError({"bucket": _("Must be one of: day, week, month.")})
         
-        # Get rating distribution
-        rating_distribution = {i: 0 for i in range(1, 6)}
-        for review in reviews:
-            rating_distribution[review.rating] += 1
+        start, end = _date_range_params(request)
+        return Response({
+            'product_id': product_id,
+            'bucket': bucket,
+            'from': start,
+            'to': end,
+            'results': rating_trend(product_id, bucket, start, end)
+        })
+
+class ProductPriceHistoryView(APIView):
+    """
+    API endpoint that provides the price history of a product, e.g.
+    ``?from=2024-01-01&to=2025-12-31&max_points=200``.
+    
+    Defaults to the last 365 days. Ranges with more price changes than
+    ``max_points`` are downsampled into equal time buckets.
+    """
+    permission_classes = [permissions.AllowAny]
+    
+    def get(self, request, product_id):
+        if not Product.objects.filter(pk=product_id).exists():
+            raise NotFound(_("Product not found."))
+        
+        start, end = _date_range_params(request)
+        limit = getattr(settings, 'PRICE_HISTORY_MAX_POINTS', 500)
+        max_points = request.query_params.get('max_points', limit)
+        try:
+            max_points = int(max_points)
+        except (TypeError, ValueError):
+            max_points = 0
+        if not 1 <= max_points <= limit:
+            raise ValidationError({"max_points": _("Must be an integer between 1 and %(max)d.") % {'max': limit}})
         
         return Response({
             'product_id': product_id,
-            'product_name': product.name,
-            'total_reviews': total_reviews,
-            'average_rating': round(average_rating, 1),
-            'rating_distribution': rating_distribution
+            'from': start,
+            'to': end,
+            'results': PriceHistoryPointSerializer(price_history(product_id, start, end, max_points), many=True).data
         })
+
+def _date_param(request, name):
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    try:
+        parsed = parse_date(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValidationError({name: _("Expected a date in YYYY-MM-DD format.")})
+    return parsed
+
+def _date_range_params(request):
+    """Read ``?from=`` and ``?to=``, defaulting to the last 365 days."""
+    end = _date_param(request, 'to') or timezone.localdate()
+    start = _date_param(request, 'from') or end - timedelta(days=364)
+    if start > end:
+        raise ValidationError({"from": _("Must not be after 'to'.")})
+    return start, end
+
+REVIEW_STREAM_DEFAULTS = {
+    'MAX_SUBSCRIBERS': 5000,
+    'MAX_PRODUCTS': 50,
+    'HEARTBEAT_SECONDS': 15,
+    'COALESCE_SECONDS': 0.5,
+}
+
+def _stream_setting(name):
+    return getattr(settings, 'REVIEW_STREAM', {}).get(name, REVIEW_STREAM_DEFAULTS[name])
+
+def _sse_message(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n"
+
+async def _current_stats(product):
+    version, payload = broker.get_cached(product.pk)
+    if payload is None:
+        payload = await sync_to_async(product_stats)(product)
+        broker.set_cached(product.pk, version, payload)
+    return payload
+
+async def _stats_events(products):
+    subscription = broker.subscribe(products)
+    try:
+        for product in products.values():
+            yield _sse_message('stats', await _current_stats(product))
+        while True:
+            changed = await subscription.wait(
+                _stream_setting('HEARTBEAT_SECONDS'),
+                _stream_setting('COALESCE_SECONDS')
+            )
+            if not changed:
+                # Comment lines keep idle connections open through proxies.
+                yield ': keep-alive\n\n'
+                continue
+            for product_id in changed:
+                yield _sse_message('stats', await _current_stats(products[product_id]))
+    finally:
+        broker.unsubscribe(subscription)
+
+async def product_stats_stream(request, product_id=None):
+    """
+    Server-Sent Events stream of product review statistics.
+
+    Emits a ``stats`` event for each product on connect and again whenever
+    one of its reviews is created, updated or deleted. Serves a single
+    product at ``products/<id>/stats/stream/`` or a set of products at
+    ``products/stats/stream/?ids=1,2,3``.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'detail': _('Method not allowed.')}, status=status.HTTP_405_METHOD_NOT_ALLOWED)
+    
+    if product_id is not None:
+        product_ids = [product_id]
+    else:
+        try:
+            product_ids = parse_id_list(request.GET.get('ids', ''))
+        except ValueError:
+            return JsonResponse(
+                {'ids': [_('Expected a comma-separated list of product IDs.')]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(product_ids) > _stream_setting('MAX_PRODUCTS'):
+            return JsonResponse(
+                {'ids': [_('Too many product IDs requested.')]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+    
+    products = {
+        product.pk: product
+        async for product in Product.objects.filter(pk__in=product_ids).only('id', 'name')
+    }
+    if not products:
+        return JsonResponse({'detail': _('Product not found.')}, status=status.HTTP_404_NOT_FOUND)
+    if broker.subscriber_count >= _stream_setting('MAX_SUBSCRIBERS'):
+        return JsonResponse(
+            {'detail': _('Too many open streams, try again later.')},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+    
+    return StreamingHttpResponse(
+        _stats_events(products),
+        content_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
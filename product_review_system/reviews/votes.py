@@ -0,0 +1,139 @@
+"""
+Helpful-vote bookkeeping.
+
+Votes are recorded one row per (review, user) and their +1/-1 deltas land in
+a randomly chosen HelpfulCounterShard of the review, so concurrent voters
+spread over ``HELPFUL_COUNTER_SHARDS`` rows instead of queueing on the
+Review row. ``fold_helpful_counts`` (run periodically through the
+``fold_helpful_votes`` command) moves the accumulated deltas into
+``Review.helpful_count`` and drops the cached pages of the products
+concerned.
+"""
+import random
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+
+from .models import HelpfulCounterShard, Review, ReviewVote
+from .pages import invalidate_product_pages_on_commit
+from .sharding import review_databases
+
+
+def _shard_count():
+    return getattr(settings, 'HELPFUL_COUNTER_SHARDS', 16)
+
+
+def _add_to_shard(review_id, delta, using):
+    shard = random.randrange(_shard_count())
+    rows = HelpfulCounterShard.objects.using(using).filter(review_id=review_id, shard=shard)
+    if rows.update(delta=F('delta') + delta):
+        return
+    try:
+        with transaction.atomic(using=using):
+            HelpfulCounterShard.objects.using(using).create(review_id=review_id, shard=shard, delta=delta)
+    except IntegrityError:
+        # A concurrent voter created the shard first.
+        rows.update(delta=F('delta') + delta)
+
+
+def cast_vote(review_id, user_id, using=DEFAULT_DB_ALIAS):
+    """
+    Record a helpful vote in the ``using`` database (the review's shard);
+    return False if the user had already voted.
+    """
+    try:
+        with transaction.atomic(using=using):
+            ReviewVote.objects.using(using).create(review_id=review_id, user_id=user_id)
+            _add_to_shard(review_id, 1, using)
+    except IntegrityError:
+        return False
+    return True
+
+
+def retract_vote(review_id, user_id, using=DEFAULT_DB_ALIAS):
+    """Remove a helpful vote; return False if there was none."""
+    with transaction.atomic(using=using):
+        deleted, _ = ReviewVote.objects.using(using).filter(review_id=review_id, user_id=user_id).delete()
+        if deleted:
+            _add_to_shard(review_id, -1, using)
+    return bool(deleted)
+
+
+def pending_helpful_deltas(review_ids, using=DEFAULT_DB_ALIAS):
+    """
+    Return ``{review_id: delta}`` of the votes not folded yet into the given
+    reviews' helpful_count, locking their shard rows until the transaction
+    ends.
+    """
+    totals = defaultdict(int)
+    rows = (
+        HelpfulCounterShard.objects.using(using)
+        .filter(review_id__in=review_ids)
+        .exclude(delta=0)
+        .select_for_update()
+        .order_by('pk')
+        .values_list('review_id', 'delta')
+    )
+    for review_id, delta in rows:
+        totals[review_id] += delta
+    return totals
+
+
+def fold_helpful_counts(batch_size=500):
+    """
+    Fold pending shard deltas into Review.helpful_count, ``batch_size``
+    reviews per transaction. All shards of a review are read together under
+    a row lock, and each shard is decremented by exactly the amount read, so
+    votes landing while the fold runs are kept for the next run and
+    concurrent folds never count the same deltas twice. Returns the number of
+    reviews updated.
+    """
+    return sum(_fold_database(alias, batch_size) for alias in review_databases())
+
+
+def _fold_database(using, batch_size):
+    updated = 0
+    last_review_id = 0
+    pending = HelpfulCounterShard.objects.using(using).exclude(delta=0)
+    while True:
+        review_ids = list(
+            pending.filter(review_id__gt=last_review_id)
+            .order_by('review_id')
+            .values_list('review_id', flat=True)
+            .distinct()[:batch_size]
+        )
+        if not review_ids:
+            return updated
+        last_review_id = review_ids[-1]
+        
+        with transaction.atomic(using=using):
+            # Lock the shard rows so a concurrent fold waits, then sees them
+            # already folded, instead of adding the same deltas again.
+            shards = list(
+                pending.filter(review_id__in=review_ids)
+                .select_for_update()
+                .order_by('pk')
+                .values_list('pk', 'review_id', 'delta')
+            )
+            if not shards:
+                continue
+            totals = defaultdict(int)
+            for _, review_id, delta in shards:
+                totals[review_id] += delta
+            
+            Review.objects.using(using).filter(pk__in=totals).update(helpful_count=Case(
+                *(When(pk=review_id, then=F('helpful_count') + Value(total)) for review_id, total in totals.items()),
+                output_field=IntegerField()
+            ))
+            HelpfulCounterShard.objects.using(using).filter(pk__in=[pk for pk, _, _ in shards]).update(delta=Case(
+                *(When(pk=pk, then=F('delta') - Value(delta)) for pk, _, delta in shards),
+                output_field=IntegerField()
+            ))
+            # The product pages show the reviews' helpful counts.
+            invalidate_product_pages_on_commit(
+                Review.objects.using(using).filter(pk__in=totals).values_list('product_id', flat=True),
+                using=using
+            )
+        updated += len(totals)
@@ -0,0 +1,167 @@
+"""
+Bulk user provisioning.
+
+``read_users`` streams user rows from CSV or JSON Lines input and
+``prepare_batch`` validates a batch of them and drops the emails that
+already exist, with one query per batch. Passwords are given either in
+plain text (``password``), hashed by ``hash_passwords`` in worker
+processes because each hash costs tens of milliseconds on purpose, or as
+an existing Django hash (``password_hash``) imported as is. Rows with
+neither get an unusable password. The import_users command ties these
+together and inserts each batch with ``insert_users``: one bulk_create,
+retried row by row so that a conflict only rejects its own row.
+"""
+import csv
+import json
+
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import DataError, IntegrityError, transaction
+
+from .models import User
+
+FORMATS = ('csv', 'jsonl')
+ROLES = set(User.Role.values)
+
+
+def read_users(stream, fmt):
+    """Yield ``(line, row)`` for every user row of ``stream``."""
+    if fmt == 'csv':
+        yield from enumerate(csv.DictReader(stream), start=2)
+        return
+    for line, text in enumerate(stream, start=1):
+        if not text.strip():
+            continue
+        try:
+            row = json.loads(text)
+        except ValueError:
+            row = None
+        yield line, row if isinstance(row, dict) else {'_invalid': True}
+
+
+def _text(row, name):
+    """Return the string value of ``row[name]``, or None when it is empty or missing."""
+    value = row.get(name)
+    if value is None or value == '':
+        return None
+    if not isinstance(value, str):
+        raise ValueError(f'{name} must be a string')
+    return value
+
+
+def _check_length(name, value):
+    max_length = User._meta.get_field(name).max_length
+    if len(value) > max_length:
+        raise ValueError(f'{name} longer than {max_length} characters')
+    return value
+
+
+def _clean(row):
+    """Return the User fields of ``row``; raise ValueError if it is invalid."""
+    if row.get('_invalid'):
+        raise ValueError('not a JSON object')
+    email = _check_length('email', User.objects.normalize_email((_text(row, 'email') or '').strip()))
+    try:
+        validate_email(email)
+    except ValidationError:
+        raise ValueError('invalid email')
+    role = (_text(row, 'role') or User.Role.REGULAR).strip()
+    if role not in ROLES:
+        raise ValueError(f"invalid role '{role}'")
+    password = _text(row, 'password')
+    password_hash = _text(row, 'password_hash')
+    if password_hash is not None:
+        try:
+            identify_hasher(password_hash)
+        except ValueError:
+            raise ValueError('unrecognized password hash')
+    if password_hash is not None and password is not None:
+        raise ValueError('both password and password_hash given')
+    return {
+        'email': email,
+        'first_name': _check_length('first_name', (_text(row, 'first_name') or '').strip()),
+        'last_name': _check_length('last_name', (_text(row, 'last_name') or '').strip()),
+        'role': role,
+        'is_staff': role == User.Role.ADMIN,
+        'password': password_hash,
+    }, password
+
+
+def prepare_batch(rows, seen):
+    """
+    Validate a batch of ``(line, row)`` and drop emails already in the
+    database or earlier in the input (``seen``, updated in place).
+
+    Return ``(users, passwords, failures)``: ``(line, fields)`` of the users
+    to insert, the plain-text password of each (None when a hash was given
+    or there is no password) and ``(line, email, reason)`` for every
+    rejected row.
+    """
+    users, passwords, failures = [], [], []
+    for line, row in rows:
+        try:
+            fields, password = _clean(row)
+        except ValueError as error:
+            email = row.get('email')
+            failures.append((line, email.strip() if isinstance(email, str) else '', str(error)))
+            continue
+        if fields['email'] in seen:
+            failures.append((line, fields['email'], 'duplicate email in input'))
+            continue
+        seen.add(fields['email'])
+        users.append((line, fields))
+        passwords.append(password)
+
+    existing = set(
+        User.objects.filter(email__in=[fields['email'] for _, fields in users]).values_list('email', flat=True)
+    )
+    kept_users, kept_passwords = [], []
+    for (line, fields), password in zip(users, passwords):
+        if fields['email'] in existing:
+            failures.append((line, fields['email'], 'email already exists'))
+            continue
+        kept_users.append((line, fields))
+        kept_passwords.append(password)
+    return kept_users, kept_passwords, failures
+
+
+def hash_passwords(passwords):
+    """Hash plain-text passwords; None stays None. Runs in worker processes."""
+    return [None if password is None else make_password(password) for password in passwords]
+
+
+def build_users(users, hashed):
+    """Return ``(line, User)`` pairs of unsaved users from prepared fields and hashed passwords."""
+    instances = []
+    for (line, fields), password in zip(users, hashed):
+        fields = dict(fields)
+        # An imported hash wins; rows without any password cannot log in.
+        fields['password'] = fields['password'] or password or make_password(None)
+        instances.append((line, User(**fields)))
+    return instances
+
+
+def insert_users(users, batch_size):
+    """
+    Insert the ``(line, User)`` pairs of a batch with one bulk_create; if
+    that fails, because an email was taken concurrently or the database
+    rejects a value, insert them one by one. Return ``(line, email, reason)``
+    for every row that could not be inserted.
+    """
+    try:
+        with transaction.atomic():
+            User.objects.bulk_create([user for _, user in users], batch_size=batch_size)
+        return []
+    except (IntegrityError, DataError):
+        pass
+    failures = []
+    for line, user in users:
+        try:
+            with transaction.atomic():
+                User.objects.bulk_create([user])
+        except IntegrityError:
+            failures.append((line, user.email, 'email already exists'))
+        except DataError as error:
+            failures.append((line, user.email, str(error).strip()))
+    return failures
@@ -13,4 +13,6 @@ urlpatterns = [
     
     # User profile endpoints
     path('profile/', views.UserProfileView.as_view(), name='profile'),
+    path('profile/reviews/', views.UserReviewListView.as_view(), name='profile-reviews'),
+    path('profile/reviews/lookup/', views.UserReviewLookupView.as_view(), name='profile-reviews-lookup'),
 ]
@@ -1,4 +1,8 @@
+from collections import defaultdict
+
 from rest_framework import status, generics, permissions
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.views import TokenObtainPairView
@@ -11,6 +15,10 @@ from .serializers import (
     UserSerializer,
     CustomTokenObtainPairSerializer
 )
+from reviews.models import Review
+from reviews.serializers import UserReviewSerializer
+from reviews.sharding import shard_for_product
+from reviews.utils import parse_id_list
 
 User = get_user_model()
 
@@ -46,6 +54,54 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
     def get_object(self):
         return self.request.user
 
+class UserReviewPagination(CursorPagination):
+    """Cursor pagination over the review_user_created_idx index."""
+    ordering = '-created_at'
+    page_size = 10
+
+class UserReviewListView(generics.ListAPIView):
+    """
+    API endpoint that lists the authenticated user's reviews, newest first.
+    """
+    serializer_class = UserReviewSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = UserReviewPagination
+
+    def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):
+            return Review.objects.none()
+        return Review.objects.filter(user=self.request.user).select_related('product').across_shards()
+
+class UserReviewLookupView(APIView):
+    """
+    API endpoint that reports which of the given products the authenticated
+    user has reviewed, e.g. ``?product_ids=1,2,3``.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    max_product_ids = 100
+
+    def get(self, request):
+        raw_ids = request.query_params.get('product_ids', '')
+        try:
+            product_ids = parse_id_list(raw_ids)
+        except ValueError:
+            raise ValidationError({"product_ids": _("Expected a comma-separated list of product IDs.")})
+        if len(product_ids) > self.max_product_ids:
+            raise ValidationError({
+                "product_ids": _("At most %(max)d product IDs are allowed.") % {'max': self.max_product_ids}
+            })
+
+        by_shard = defaultdict(list)
+        for product_id in product_ids:
+            by_shard[shard_for_product(product_id)].append(product_id)
+        reviewed = {}
+        for alias, shard_product_ids in by_shard.items():
+            reviewed.update(
+                Review.objects.using(alias).filter(user=request.user, product_id__in=shard_product_ids)
+                .values_list('product_id', 'id')
+            )
+        return Response({str(pk): reviewed.get(pk) for pk in product_ids})
+
 class CustomTokenObtainPairView(TokenObtainPairView):
     """
     Custom token obtain pair view that includes user details in the response.